@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+
+# Measures how long MotorController.emergency_stop() takes from the call until the outputs are off, in the states the
+# robot can be in when it's called, including from inside a signal handler.
+# Run with: python benchmarks/estop_latency.py [--hardware]
+
+import argparse
+import contextlib
+import io
+import os
+import signal
+import sys
+from time import perf_counter
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from spoolbot import emulator
+from spoolbot.__main__ import SpoolBot
+
+RUNS = 2000
+
+# Commands to run before each stop, so it happens in the middle of something.
+STATES = [
+    ("idle", []),
+    ("driving", ["drive_forward", "spool_clockwise"]),
+    ("mid ramp", ["drive_forward", "update", "drive_backward", "update"]),
+]
+
+
+def make_controller(batch_writes, hardware):
+    """Returns a motor controller and the emulated chip it writes to, or 'None' for the chip on real hardware."""
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        if hardware:
+            return SpoolBot.init_motor_controller("s-curve", batch_writes=batch_writes), None
+        mc = emulator.make_controller(clock=perf_counter, motion_profile="s-curve", batch_writes=batch_writes)
+
+    return mc, mc._motor_hat.chip
+
+
+def time_stop(mc, chip, commands, from_signal):
+    """Runs 'commands', then stops. Returns the seconds from the call, or from raising the signal, until the write
+       that turned the outputs off."""
+
+    for command in commands:
+        getattr(mc, command)()
+
+    if chip is not None:
+        chip.clear_log()
+
+    start = perf_counter()
+    if from_signal:
+        os.kill(os.getpid(), signal.SIGUSR2)
+        elapsed = None
+    else:
+        elapsed = mc.emergency_stop()
+
+    if chip is not None:
+        return chip.log[-1][0] - start
+    if from_signal:
+        # Without the emulator's log, all that's known is when the handler finished.
+        return perf_counter() - start
+
+    return elapsed
+
+
+def measure(batch_writes, hardware, commands, from_signal):
+    """Returns the sorted stop times of RUNS stops."""
+
+    mc, chip = make_controller(batch_writes, hardware)
+    signal.signal(signal.SIGUSR2, lambda signum, frame: mc.emergency_stop())
+    try:
+        times = sorted(time_stop(mc, chip, commands, from_signal) for i in range(RUNS))
+    finally:
+        signal.signal(signal.SIGUSR2, signal.SIG_DFL)
+        mc.release_all()
+
+    return times
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="Times the emergency stop from call to outputs off.")
+    parser.add_argument("--hardware", action="store_true", help="stop the real MotorHAT instead of the emulator")
+    options = parser.parse_args(args)
+
+    print("{:<24}{:>9}{:>12}{:>12}{:>12}".format("state", "batched", "median us", "p99 us", "worst us"))
+    for from_signal in (False, True):
+        for name, commands in STATES:
+            label = name + (" (signal)" if from_signal else "")
+            for batch_writes in (False, True):
+                times = measure(batch_writes, options.hardware, commands, from_signal)
+                print("{:<24}{:>9}{:>12.1f}{:>12.1f}{:>12.1f}".format(
+                    label, "yes" if batch_writes else "no", times[len(times) // 2] * 1000000,
+                    times[int(len(times) * 0.99)] * 1000000, times[-1] * 1000000))
+
+
+if __name__ == "__main__":
+    main()
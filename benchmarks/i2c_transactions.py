@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+
+# Counts the I2C transactions sent to the MotorHAT for one control frame, with and without batched writes.
+# Run with: python benchmarks/i2c_transactions.py
+
+import contextlib
+import io
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from spoolbot import emulator
+
+
+# Each frame is a list of MotorController methods, called in the same order the input loop would call them.
+FRAMES = [
+    ("forward", ["drive_forward"]),
+    ("forward -> backward", ["drive_forward", "drive_backward"]),
+    ("forward -> pivot left", ["drive_forward", "drive_pivot_left"]),
+    ("spool cw + forward", ["spool_clockwise", "drive_forward"]),
+    ("stop all", ["drive_forward", "spool_clockwise", "stop_all"]),
+    ("emergency stop", ["drive_forward", "spool_clockwise", "emergency_stop"]),
+]
+
+
+def count_frame(commands, batch_writes):
+    """Returns the number of transactions the last command in 'commands' took."""
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        mc = emulator.make_controller(batch_writes=batch_writes)
+        hat = mc._motor_hat
+
+        for command in commands[:-1]:
+            getattr(mc, command)()
+
+        before = hat.chip.transactions
+        getattr(mc, commands[-1])()
+
+    return hat.chip.transactions - before
+
+
+def main():
+    print("{:<24}{:>10}{:>10}".format("frame", "unbatched", "batched"))
+    for name, commands in FRAMES:
+        print("{:<24}{:>10}{:>10}".format(name, count_frame(commands, False), count_frame(commands, True)))
+
+
+if __name__ == "__main__":
+    main()
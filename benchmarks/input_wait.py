@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+
+# Compares how much CPU the DS4 control loop uses while idle and how long a button press takes to reach the motors,
+# between polling pygame every frame, sleeping in pygame.event.wait(), and sleeping on an event device.
+# Run with: python benchmarks/input_wait.py [--seconds N] [--presses N]
+#
+# Presses are made from another thread at random times. The pygame modes get them as keyboard events posted to
+# pygame's queue, and the evdev mode gets L1 reports written into a pipe. Both toggle the spool, which is written
+# straight away, so the press's latency is the time until the emulated MotorHAT logs the next write. Wakes are the
+# control loop's passes. SDL's own checks for events while it sits in pygame.event.wait() only show up in the CPU time.
+
+import argparse
+import bisect
+import contextlib
+import io
+import os
+import random
+import sys
+import threading
+from time import perf_counter, sleep, thread_time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+from spoolbot import ds4input
+from spoolbot import emulator
+from spoolbot import evdevinput
+
+MODES = ["poll", "pygame-wait", "evdev"]
+HOLD = 0.05  # How long each press is held, in seconds
+
+
+class BenchmarkDone(Exception):
+    """Raised from the event source's poll() to end the control loop."""
+
+
+class TimedEvents:
+    """Wraps an event source, counts how often the loop looks at it and how much CPU the loop uses between its first
+       look and the end of the run."""
+
+    def __init__(self, source, done):
+        self._source = source
+        self._done = done
+        self.polls = 0
+        self.started = None
+        self.cpu = None
+        self.wall = None
+
+    def __getattr__(self, name):
+        return getattr(self._source, name)
+
+    def poll(self):
+        if self.started is None:
+            self.started = (perf_counter(), thread_time())
+        if self._done.is_set():
+            self.wall = perf_counter() - self.started[0]
+            self.cpu = thread_time() - self.started[1]
+            raise BenchmarkDone()
+
+        self.polls += 1
+        return self._source.poll()
+
+
+def make_source(mode):
+    """Returns the event source for 'mode', and functions that press, release and wake it from another thread."""
+
+    if mode == "evdev":
+        read_fd, write_fd = os.pipe()
+        source = evdevinput.EvdevEvents(read_fd)
+
+        def send(*events):
+            data = b"".join(evdevinput.EVENT.pack(0, 0, *event) for event in events)
+            os.write(write_fd, data + evdevinput.EVENT.pack(0, 0, evdevinput.EV_SYN, evdevinput.SYN_REPORT, 0))
+
+        def close():
+            source.close()
+            os.close(write_fd)
+
+        return (source, lambda: send((evdevinput.EV_KEY, evdevinput.BTN_TL, 1)),
+                lambda: send((evdevinput.EV_KEY, evdevinput.BTN_TL, 0)), lambda: send(), close)
+
+    source = ds4input.PygameEvents(wait_for_input=mode == "pygame-wait", axes=False)
+    pygame = ds4input.pygame
+    pygame.event.clear()
+
+    def post(kind):
+        pygame.event.post(pygame.event.Event(kind, key=pygame.K_q))
+
+    return (source, lambda: post(pygame.KEYDOWN), lambda: post(pygame.KEYUP),
+            lambda: pygame.event.post(pygame.event.Event(pygame.USEREVENT)), lambda: None)
+
+
+def press_buttons(press, release, wake, done, seconds, presses, press_times):
+    """Presses and releases the spool button 'presses' times at random moments over 'seconds', then ends the run."""
+
+    generator = random.Random(25)
+    started = perf_counter()
+    for at in sorted(generator.uniform(0.2, seconds - 0.2) for i in range(presses)):
+        sleep(max(started + at - perf_counter(), 0.0))
+        press_times.append(perf_counter())
+        press()
+        sleep(HOLD)
+        release()
+
+    sleep(max(started + seconds - perf_counter(), 0.0))
+    done.set()
+    wake()
+
+
+def measure(mode, seconds, presses):
+    """Runs the control loop in 'mode' for 'seconds'. Returns the event source's wrapper and the sorted press
+       latencies."""
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        mc = emulator.make_controller(clock=perf_counter)
+    hat = mc._motor_hat
+
+    source, press, release, wake, close = make_source(mode)
+    done = threading.Event()
+    timed = TimedEvents(source, done)
+    remote = ds4input.DS4Controller(mc, event_source=timed)
+    press_times = []
+    presser = threading.Thread(target=press_buttons, args=(press, release, wake, done, seconds, presses, press_times))
+
+    remote.start_scanning()
+    hat.chip.clear_log()
+    presser.start()
+    try:
+        remote.scan_events()
+    except BenchmarkDone:
+        pass
+    finally:
+        presser.join()
+        close()
+        mc.release_all()
+
+    # Each press's latency is the time until the first write after it.
+    writes = [entry[0] for entry in hat.chip.log]
+    latencies = []
+    for pressed in press_times:
+        index = bisect.bisect_left(writes, pressed)
+        if index < len(writes):
+            latencies.append(writes[index] - pressed)
+
+    return timed, sorted(latencies)
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="Compares the DS4 loop's CPU use and input latency when polling and "
+                                                 "when waiting for input.")
+    parser.add_argument("--seconds", type=float, default=10.0, help="how long each mode runs (default: %(default)s)")
+    parser.add_argument("--presses", type=int, default=20,
+                        help="button presses made in each run (default: %(default)s)")
+    options = parser.parse_args(args)
+
+    print("{:<14}{:>10}{:>8}{:>12}{:>12}{:>12}".format("mode", "wakes/s", "CPU %", "median ms", "p99 ms",
+                                                       "worst ms"))
+    for mode in MODES:
+        timed, latencies = measure(mode, options.seconds, options.presses)
+        print("{:<14}{:>10.0f}{:>8.2f}{:>12.2f}{:>12.2f}{:>12.2f}".format(
+            mode, timed.polls / timed.wall, timed.cpu / timed.wall * 100, latencies[len(latencies) // 2] * 1000,
+            latencies[int(len(latencies) * 0.99)] * 1000, latencies[-1] * 1000))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+
+# Times StickMixer.mix() for a few stick positions and compares it with the length of a control frame.
+# Run with: python benchmarks/stick_mix.py [--runs N]
+
+import argparse
+import contextlib
+import io
+import os
+import sys
+from time import perf_counter
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from spoolbot import constants
+from spoolbot import emulator
+from spoolbot import mixer
+
+POSITIONS = [
+    ("centered", (0.0, 0.0)),
+    ("full forward", (0.0, -1.0)),
+    ("forward right", (0.3, -0.7)),
+    ("full right", (1.0, 0.0)),
+]
+
+
+def time_mix(stick_mixer, x, y, runs):
+    """Returns the mean seconds one mix of ('x', 'y') took over 'runs' calls."""
+
+    start = perf_counter()
+    for i in range(runs):
+        stick_mixer.mix(x, y)
+    return (perf_counter() - start) / runs
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="Times the stick mixer against the control frame.")
+    parser.add_argument("--runs", type=int, default=20000, help="mixes timed per position (default: %(default)s)")
+    options = parser.parse_args(args)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        mc = emulator.make_controller()
+    stick_mixer = mixer.StickMixer(mc)
+    frame = 1.0 / constants.LOOP_RATE
+
+    print("{:<16}{:>10}{:>12}".format("position", "us/mix", "% of frame"))
+    for name, (x, y) in POSITIONS:
+        per_mix = time_mix(stick_mixer, x, y, options.runs)
+        print("{:<16}{:>10.2f}{:>12.3f}".format(name, per_mix * 1e6, per_mix / frame * 100))
+
+
+if __name__ == "__main__":
+    main()
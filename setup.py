@@ -4,6 +4,7 @@ setup(
     name='SpoolBot',
     version='12.08.18',
     packages=['spoolbot'],
+    python_requires='>=3.5',
     url='',
     license='GPL3',
     author='Brenden Davidson',
@@ -1,18 +1,17 @@
-from Adafruit_MotorHAT import Adafruit_MotorHAT
-import constants
 import atexit
-
-_MOTOR_HAT = Adafruit_MotorHAT(constants.HAT_ADDRESS)
+import sys
 
 
 # Set up a function to auto-disable the motors when the script stops
 def turn_off_motors():
+    # Nothing needs to be turned off if no motor controller was ever loaded.
+    motorcontrol = sys.modules.get(__name__ + ".motorcontrol")
+
     try:
-        _MOTOR_HAT.getMotor(1).run(Adafruit_MotorHAT.RELEASE)
-        _MOTOR_HAT.getMotor(2).run(Adafruit_MotorHAT.RELEASE)
-        _MOTOR_HAT.getMotor(3).run(Adafruit_MotorHAT.RELEASE)
-        _MOTOR_HAT.getMotor(4).run(Adafruit_MotorHAT.RELEASE)
-    except TypeError:
+        if motorcontrol is not None:
+            for motor_controller in list(motorcontrol.controllers):
+                motor_controller.emergency_stop()
+    except (TypeError, OSError):
         print("Motor controller not initialized.")
     finally:
         print("Have a great day! :)")
@@ -1,38 +1,216 @@
 #!/usr/env/bin python3
 
-import motorcontrol
-import ds4input
+import argparse
+import atexit
+import signal
+from . import constants
+from . import motorcontrol
+from . import ds4input
+from . import evdevinput
+from . import journal
+from . import latency
+from . import motorwriter
+from . import profiler
+from . import realtime
+from . import recorder
+from . import runtime
+from . import scheduler
+from . import telemetry
+from . import watchdog
 
 
 class SpoolBot:
     """Manages all of the functionality for setting up and operating the robot."""
 
-    def __init__(self):
-        """Sets up the SpoolBot"""
+    def __init__(self, latency_report=False, use_asyncio=True, stick_drive=False,
+                 motion_profile=constants.MOTION_PROFILE, record_path=None, journal_path=None, phase_timing=False,
+                 use_watchdog=True, rt_mode=False, input_backend=constants.INPUT_BACKEND):
+        """Sets up the SpoolBot. With 'use_asyncio' on, input, control, motor output and telemetry run as separate
+           asyncio tasks. Otherwise, the remote's own loop runs everything in turn. 'stick_drive' turns on
+           proportional driving with the DS4's left stick. 'motion_profile' names how the drive motors speed up and
+           slow down. With a 'record_path', every tick is written to a flight recording there. With a
+           'journal_path', every input event is written to a journal there that can be replayed later. With
+           'phase_timing' on, every loop phase and motor command is timed. With 'use_watchdog' on, the motors are cut
+           whenever the control loop or its input misses a deadline. With 'rt_mode' on, the control loop is pinned
+           to a CPU, runs at real-time priority and only collects garbage in its spare time. 'input_backend' is
+           "pygame", "pygame-wait" to sleep in pygame until input comes, or "evdev" to read the DS4's event device
+           directly."""
 
-        self._motor_controller = self.init_motor_controller()
-        self._remote = self.init_remote_control(self._motor_controller)
+        self._runtime = None
+        self._latency_report = latency_report
+        self._profiler = None
+        self._motor_controller = self.init_motor_controller(motion_profile)
+        if phase_timing:
+            # The motor controller has to be timed before the remote saves any of its methods.
+            self._profiler = profiler.PhaseProfiler()
+            self._profiler.attach(self._motor_controller, "motors")
+        # Only the writer thread talks to the MotorHAT once the robot is running.
+        self._motor_writer = motorwriter.MotorWriter(self._motor_controller)
+        self._watchdog = None
+        if use_watchdog:
+            self._watchdog = watchdog.Watchdog(self._motor_controller, motor_writer=self._motor_writer)
+        self._telemetry = telemetry.TelemetryView(self._motor_controller, watchdog=self._watchdog)
+        # The remote's loop and the runtime's input task share one scheduler, whichever of them runs.
+        self._scheduler = scheduler.LoopScheduler()
+        self._remote = self.init_remote_control(self._motor_controller, self._telemetry, self._motor_writer,
+                                                stick_drive, self._scheduler, input_backend)
+        self._remote.watchdog = self._watchdog
 
-        self._remote.scan_events()
+        if use_asyncio:
+            self._runtime = runtime.Runtime(self._remote, self._motor_controller, telemetry=self._telemetry,
+                                            loop_scheduler=self._scheduler, motor_writer=self._motor_writer)
+
+        self._realtime = None
+        if rt_mode:
+            self._realtime = realtime.RealtimeMode()
+            self._realtime.attach(self._scheduler)
+            self._telemetry.realtime = self._realtime
+
+        if record_path is not None:
+            self._remote.recorder = recorder.FlightRecorder(record_path)
+            atexit.register(self._remote.recorder.close)
+
+        if journal_path is not None:
+            self._remote.journal = journal.JournalWriter(journal_path, self._remote.journal_header())
+            atexit.register(self._remote.journal.close)
+
+        if phase_timing:
+            self._profiler.attach(self._remote, "input")
+
+        if latency_report:
+            self._motor_controller.latency = latency.LatencyTracker()
+
+        if latency_report or phase_timing or rt_mode:
+            self.enable_reports()
+
+    def run(self):
+        """Runs the robot. Doesn't return until the robot is stopped."""
+
+        # SIGTERM would otherwise end the process without running atexit, leaving the motors running.
+        signal.signal(signal.SIGTERM, self.terminate)
+
+        if self._realtime is not None:
+            # Startup is over. The watchdog and motor writer inherit the CPU and priority, and the telemetry view's
+            # thread steps back out of them.
+            self._realtime.enter()
+
+        if self._watchdog is not None:
+            self._watchdog.start()
+
+        try:
+            if self._runtime is not None:
+                self._runtime.run()
+                return
+
+            self._motor_writer.start()
+            self._telemetry.start()
+            try:
+                self._remote.scan_events()
+            finally:
+                self._telemetry.stop()
+                self._motor_writer.stop()
+        finally:
+            if self._watchdog is not None:
+                self._watchdog.stop()
+
+    def terminate(self, signum, frame):
+        """Cuts every motor, then exits the normal way so the atexit handlers still run."""
+
+        self._motor_controller.emergency_stop()
+        raise SystemExit(128 + signum)
 
     @staticmethod
-    def init_motor_controller():
-        """Sets up the motor controller, motors, and returns the motor controller object."""
+    def init_motor_controller(motion_profile=constants.MOTION_PROFILE, **kwargs):
+        """Sets up the motor controller, motors, and returns the motor controller object. Any other keyword
+           arguments, like 'motor_hat' or 'clock', are passed on to the MotorController."""
 
-        mc = motorcontrol.MotorController()
+        # The telemetry view shows motor state, so the controller doesn't need to print it.
+        mc = motorcontrol.MotorController(verbose=False, motion_profile=motion_profile, **kwargs)
         mc.add_drive_motor(name="lefty")
         mc.add_drive_motor(name="righty", side="right", index=4)
         mc.add_spool_motor()
 
         return mc
 
+    def enable_reports(self):
+        """Prints the turned on reports at exit, and whenever the process gets SIGUSR1."""
+
+        atexit.register(self.print_reports)
+        signal.signal(signal.SIGUSR1, lambda signum, frame: self.print_reports())
+
+    def print_reports(self):
+        """Prints the latency report, the phase timings and the real-time mode summary, whichever are turned on."""
+
+        if self._latency_report:
+            self.print_latency_report()
+        if self._profiler is not None:
+            print(self._profiler.report())
+        if self._realtime is not None:
+            print(self._realtime.report())
+            stats = self._scheduler.get_stats()
+            print("Control frames: " + str(stats["ticks"]) + " run, " + str(stats["overruns"]) + " late, " +
+                  "worst wake-up {:.2f} ms late".format(stats["max_jitter"] * 1000))
+
+    def print_latency_report(self):
+        """Prints the input to motor latency histogram, how long each runtime task took, and the motor writer's
+           counters."""
+
+        print(self._motor_controller.latency.report())
+        if self._runtime is not None:
+            print(self._runtime.report())
+        else:
+            stats = self._motor_writer.get_stats()
+            print("Motor commands: " + str(stats["submitted"]) + " sent, " + str(stats["coalesced"]) + " coalesced")
+
     @staticmethod
-    def init_remote_control(motor_controller):
+    def init_remote_control(motor_controller, telemetry_view=None, motor_writer=None, stick_drive=False,
+                            loop_scheduler=None, input_backend=constants.INPUT_BACKEND):
         """Sets up the remote control object."""
 
-        return ds4input.DS4Controller(motor_controller)
+        event_source = None
+        if input_backend == "evdev":
+            event_source = evdevinput.EvdevEvents.open()
+        elif input_backend == "pygame-wait":
+            event_source = ds4input.PygameEvents(wait_for_input=True, axes=stick_drive)
+
+        return ds4input.DS4Controller(motor_controller, loop_scheduler=loop_scheduler, telemetry=telemetry_view,
+                                      motor_writer=motor_writer, stick_drive=stick_drive, event_source=event_source)
+
+
+def parse_args(args=None):
+    """Reads the command line options."""
+
+    parser = argparse.ArgumentParser(prog="spoolbot", description="Sets up and runs the Spool Bot.")
+    parser.add_argument("--latency-report", action="store_true",
+                        help="track input to motor latency and print a histogram at exit or on SIGUSR1")
+    parser.add_argument("--phase-timing", action="store_true",
+                        help="time every loop phase and motor command, and print min/mean/p99 at exit or on SIGUSR1")
+    parser.add_argument("--profile", choices=["stopping", "trapezoid", "s-curve"], default=constants.MOTION_PROFILE,
+                        help="how the drive motors speed up and slow down (default: %(default)s)")
+    parser.add_argument("--input", choices=["pygame", "pygame-wait", "evdev"], default=constants.INPUT_BACKEND,
+                        help="read the DS4 through pygame, through pygame sleeping until input comes, or straight "
+                             "from its Linux event device (default: %(default)s)")
+    parser.add_argument("--stick", action="store_true",
+                        help="drive proportionally with the left stick when no D-pad button is held")
+    parser.add_argument("--record", metavar="FILE",
+                        help="keep a flight recording of the last few minutes of ticks in FILE")
+    parser.add_argument("--journal", metavar="FILE",
+                        help="write every input event to FILE, for replaying with 'python3 -m spoolbot.journal'")
+    parser.add_argument("--no-watchdog", action="store_true",
+                        help="don't cut the motors when the control loop or its input stops responding")
+    parser.add_argument("--rt", action="store_true",
+                        help="pin the control loop to a CPU, ask for SCHED_FIFO and only collect garbage in spare time")
+    parser.add_argument("--single-loop", action="store_true",
+                        help="run input, control and motor output in one loop instead of separate asyncio tasks")
+
+    return parser.parse_args(args)
 
 
 if __name__ == "__main__":
+    options = parse_args()
     print("\n\nSetting up and starting Spool Bot...\n")
-    spoolbot = SpoolBot()
+    spoolbot = SpoolBot(latency_report=options.latency_report, use_asyncio=not options.single_loop,
+                        stick_drive=options.stick, motion_profile=options.profile, record_path=options.record,
+                        journal_path=options.journal, phase_timing=options.phase_timing,
+                        use_watchdog=not options.no_watchdog, rt_mode=options.rt, input_backend=options.input)
+    spoolbot.run()
@@ -0,0 +1,28 @@
+#!/usr/bin/env python3
+
+# Virtual clock for running the control pipeline faster than real time.
+# Version info found in constants file.
+
+# The scheduler, the motor controller, the remotes and the emulated MotorHAT all take a clock in place of
+# time.monotonic(). Giving them one of these, along with its sleep() in place of time.sleep(), makes every wait finish
+# at once while every timestamp still comes out as if the waits had really happened.
+
+
+class VirtualClock:
+    """A clock that only moves when something sleeps on it. Call it to read the time."""
+
+    def __init__(self, start=0.0):
+        """'start' is the time the clock reads before anything has slept."""
+
+        self.now = start
+
+    def __call__(self):
+        """Returns the current virtual time in seconds."""
+
+        return self.now
+
+    def sleep(self, seconds):
+        """Moves the clock forward by 'seconds' without waiting."""
+
+        if seconds > 0:
+            self.now += seconds
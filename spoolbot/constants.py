@@ -1,20 +1,30 @@
 #!/usr/bin/env python3
 
-from Adafruit_MotorHAT import Adafruit_MotorHAT
-
 VERSION = "12.08.18"
 
-FORWARD = Adafruit_MotorHAT.FORWARD
-BACKWARD = Adafruit_MotorHAT.BACKWARD
-RELEASE = Adafruit_MotorHAT.RELEASE
+# Adafruit_MotorHAT motor commands. They're copied here so reading them doesn't import the Adafruit library.
+FORWARD = 1
+BACKWARD = 2
+BRAKE = 3
+RELEASE = 4
 
 HAT_ADDRESS = 0x60
+# Largest block write sent to the PCA9685. Adafruit_PureIO writes blocks straight to /dev/i2c-*, so it isn't held to the
+# 32 byte SMBus limit, and 64 bytes lets every motor channel go out in one transaction. Use 32 with other SMBus drivers.
+I2C_MAX_BLOCK = 64
 
 # Motor speed values
 FWD_SPEED = 225
 BWD_SPEED = 175
 SPOOL_SPEED = 255
 STOPPING_FACTOR = 0.70
+STOPPING_INTERVAL = 0.25  # Seconds between each step of a ramp-down
+STOPPING_CUTOFF = 2  # Speeds at or below this are treated as stopped
+
+# Motion profile used by the drive motors: "stopping", "trapezoid" or "s-curve"
+MOTION_PROFILE = "s-curve"
+DRIVE_ACCEL = 900.0  # Most the speed may change per second, so 0 to full speed takes about a quarter second
+DRIVE_JERK = 7200.0  # Most the acceleration may change per second, for the s-curve profile
 
 TURN_OUTER = 175
 TURN_INNER = 125
@@ -30,10 +40,40 @@ PIN_RIGHT = 23
 BTN_PINS = {PIN_CW: "btn_cw", PIN_CCW: "btn_ccw", PIN_FWD: "btn_fwd", PIN_BWD: "btn_bwd", PIN_LEFT: "btn_left",
             PIN_RIGHT: "btn_right"}
 
-CYCLE_WAIT = 0.016666  # 1/60th of a second
+# Control loop timing
+LOOP_RATE = 60  # Passes per second
+LOOP_DROP_FRAMES = True  # Skip missed frames instead of running them back to back
+LOOP_MAX_CATCH_UP = 3  # Most late frames run back to back when not dropping frames
 
 PYGAME_SCREEN = [1, 1]
 
+# DS4 input backend: "pygame", "pygame-wait" to sleep in pygame until input comes, or "evdev" to read the
+# controller's Linux event device directly
+INPUT_BACKEND = "pygame"
+EVDEV_NAME = "Wireless Controller"  # The DS4's event device is the one whose name ends with this
+
+# Debounce settle windows. A button has to hold a new level this many seconds before it counts
+BUTTON_SETTLE = 0.02  # Tactile switches on the GPIO pins
+DS4_SETTLE = 0.0  # The DS4 and the keyboard debounce their own buttons
+
+# Watchdog deadlines, in milliseconds. Missing either one cuts every motor
+WATCHDOG_TICK_MS = 100  # Longest the control loop may take to finish a pass, or the motor writer to apply a command
+WATCHDOG_INPUT_MS = 250  # Longest the remote may go without a fresh input sample
+
+# Real-time mode (--rt)
+RT_CPU = None  # CPU the control loop is pinned to. 'None' picks the last one, away from the kernel's usual interrupts
+RT_PRIORITY = 50  # SCHED_FIFO priority, from 1 to 99
+RT_GC_THRESHOLD = 700  # Allocations before a young garbage collection is run in the loop's spare time
+RT_GC_SLACK = 0.004  # Seconds a pass has to have left before its deadline to run a collection
+
+TELEMETRY_RATE = 10  # Most times per second the telemetry view redraws
+
+RECORDER_CAPACITY = 36000  # Ticks kept by the flight recorder. 10 minutes at 60 ticks per second
+
+# Latency histogram settings
+LATENCY_SUB_BUCKET_BITS = 5  # Each power of two is split into 16 buckets, for about 6% precision
+LATENCY_MAX_VALUE = 10.0  # Seconds. Anything longer is counted as this
+
 # DS4 button values
 BTN_CW = 4
 BTN_CCW = 5
@@ -44,4 +84,10 @@ BTN_LFT = (-1, 0)
 BTN_RGT = (1, 0)
 
 BTN_NUMS = {BTN_CW: "btn_cw", BTN_CCW: "btn_ccw", BTN_UP: "btn_fwd", BTN_DWN: "btn_bwd", BTN_LFT: "btn_left",
-            BTN_RGT: "btn_right"}
\ No newline at end of file
+            BTN_RGT: "btn_right"}
+
+# DS4 left stick, for proportional driving
+STICK_AXIS_X = 0  # Right is positive
+STICK_AXIS_Y = 1  # Down is positive
+STICK_DEADZONE = 0.08  # Stick values closer to the middle than this count as centered
+STICK_EXPO = 0.35  # 0 is a straight line. Higher values give finer control near the middle of the stick
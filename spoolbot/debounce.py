@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+
+# Software debounce for packed button bits.
+# Version info found in constants file.
+
+# A switch contact bounces for a few milliseconds when it closes or opens, so the level read from it flips back and
+# forth before it settles. A Debouncer only accepts a button's new level once it has held steady for that button's
+# settle window. Everything runs on the timestamps it's given, so it works the same whether it's fed every GPIO edge
+# or polled once a frame at any rate.
+
+
+class Debouncer:
+    """Debounces an integer of button bits. Each bit is a button with its own settle window."""
+
+    def __init__(self, settle=0.0, windows=None):
+        """'settle' is how many seconds a button has to hold a new level before it counts. 'windows' maps single
+           bits to their own settle times, for buttons that need longer or shorter."""
+
+        self.settle = settle
+        self.windows = dict(windows) if windows is not None else {}
+
+        # The debounced bits, and the edges the last update() found
+        self.stable = 0
+        self.pressed = 0
+        self.released = 0
+
+        # The last raw bits seen, and when each bit last changed
+        self._raw = 0
+        self._changed_at = {}
+
+    def window(self, bit):
+        """Returns the settle time for one bit."""
+
+        return self.windows.get(bit, self.settle)
+
+    def update(self, raw, now):
+        """Takes a sample of the raw bits at time 'now' and returns the debounced bits. The buttons that went down
+           and up on this sample are left in 'pressed' and 'released'."""
+
+        moved = raw ^ self._raw
+        while moved:
+            bit = moved & -moved
+            self._changed_at[bit] = now
+            moved ^= bit
+        self._raw = raw
+
+        settled = 0
+        differs = raw ^ self.stable
+        while differs:
+            bit = differs & -differs
+            if now - self._changed_at[bit] >= self.window(bit):
+                settled |= bit
+            differs ^= bit
+
+        self.pressed = settled & raw
+        self.released = settled & ~raw
+        self.stable ^= settled
+        return self.stable
+
+    def next_settle(self):
+        """Returns the time at which the next waiting change will count, or 'None' if nothing is waiting."""
+
+        soonest = None
+        differs = self._raw ^ self.stable
+        while differs:
+            bit = differs & -differs
+            settle_at = self._changed_at[bit] + self.window(bit)
+            if soonest is None or settle_at < soonest:
+                soonest = settle_at
+            differs ^= bit
+
+        return soonest
+
+    def reset(self, bits=0):
+        """Forgets any waiting changes and takes 'bits' as the settled state."""
+
+        self.stable = bits
+        self._raw = bits
+        self.pressed = 0
+        self.released = 0
+        self._changed_at.clear()
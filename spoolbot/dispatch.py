@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+
+# Input to motor command dispatch shared by the DS4 and button remotes.
+# Version info found in constants file.
+
+# Every control button gets a bit, and the front ends pack whatever is held into one integer. The movement bits index a
+# table that is built once at startup and holds the direction name and the ready-made command for every drive motor,
+# so a frame needs one lookup instead of building and comparing direction strings.
+
+from . import constants
+
+FORWARD = constants.FORWARD
+BACKWARD = constants.BACKWARD
+RELEASE = constants.RELEASE
+
+# Bits for each button name used in constants.BTN_PINS and constants.BTN_NUMS
+BTN_FWD = 1
+BTN_BWD = 2
+BTN_LEFT = 4
+BTN_RIGHT = 8
+BTN_CW = 16
+BTN_CCW = 32
+
+BUTTON_BITS = {"btn_fwd": BTN_FWD, "btn_bwd": BTN_BWD, "btn_left": BTN_LEFT, "btn_right": BTN_RIGHT,
+               "btn_cw": BTN_CW, "btn_ccw": BTN_CCW}
+
+MOVE_MASK = BTN_FWD | BTN_BWD | BTN_LEFT | BTN_RIGHT
+SPOOL_MASK = BTN_CW | BTN_CCW
+
+# Valid movement button combinations. Anything else stops the robot.
+DIRECTIONS = {BTN_FWD: "fwd", BTN_BWD: "bwd", BTN_LEFT: "left", BTN_RIGHT: "right",
+              BTN_FWD | BTN_LEFT: "fwd_left", BTN_FWD | BTN_RIGHT: "fwd_right",
+              BTN_BWD | BTN_LEFT: "bwd_left", BTN_BWD | BTN_RIGHT: "bwd_right"}
+
+
+def compile_button_map(button_names):
+    """Turns a {button id: button name} table, like constants.BTN_NUMS, into {button id: bit}. Button ids that
+       aren't plain buttons, such as D-pad hat values, are left out."""
+
+    bits = {}
+    for button, name in button_names.items():
+        if not isinstance(button, tuple) and name in BUTTON_BITS:
+            bits[button] = BUTTON_BITS[name]
+
+    return bits
+
+
+def compile_hat_map(button_names):
+    """Builds {hat value: bits} for every D-pad position from the single direction hat values in a button table.
+       Diagonals get the bits of both of their directions."""
+
+    axis_bits = {}
+    for button, name in button_names.items():
+        if isinstance(button, tuple) and name in BUTTON_BITS:
+            axis_bits[button] = BUTTON_BITS[name]
+
+    hat_bits = {}
+    for x in (-1, 0, 1):
+        for y in (-1, 0, 1):
+            hat_bits[(x, y)] = axis_bits.get((x, 0), 0) | axis_bits.get((0, y), 0)
+
+    return hat_bits
+
+
+def direction_for(bits):
+    """Returns the direction name for a set of input bits."""
+
+    return DIRECTIONS.get(bits & MOVE_MASK, "stop")
+
+
+def next_spin(spool_spin, bits, pressed=None):
+    """Returns the new spool direction. One spool button starts the spool that way if it's stopped, and stops it
+       otherwise. Both buttons together always stop it. 'pressed' holds the buttons that just went down, and only
+       those change the spool, so a held button doesn't keep flipping it. Without it, every held button counts as
+       just pressed."""
+
+    if pressed is not None and not pressed & SPOOL_MASK:
+        return spool_spin
+
+    spool_bits = bits & SPOOL_MASK
+
+    if spool_bits == SPOOL_MASK:
+        return "stop"
+    elif spool_bits == BTN_CW:
+        return "cw" if spool_spin == "stop" else "stop"
+    elif spool_bits == BTN_CCW:
+        return "ccw" if spool_spin == "stop" else "stop"
+
+    return spool_spin
+
+
+class DispatchTable:
+    """Maps packed input bits straight to the per-motor command for every drive motor."""
+
+    def __init__(self, motor_controller):
+        """Builds the table for the drive motors that have already been added to 'motor_controller'."""
+
+        self._motor_controller = motor_controller
+        self._entries = None
+        self.spool_actions = {"stop": motor_controller.spool_stop, "cw": motor_controller.spool_clockwise,
+                              "ccw": motor_controller.spool_counterclockwise}
+        self.rebuild()
+
+    def _side_commands(self, direction):
+        """Returns (left state, left speed, right state, right speed) for a direction. These match the
+           MotorController drive methods."""
+
+        fwd = self._motor_controller.fwd_speed
+        bwd = self._motor_controller.bwd_speed
+
+        if direction == "fwd":
+            return FORWARD, fwd, FORWARD, fwd
+        elif direction == "bwd":
+            return BACKWARD, bwd, BACKWARD, bwd
+        elif direction == "left":
+            # Same as drive_pivot_left
+            return BACKWARD, bwd, FORWARD, bwd
+        elif direction == "right":
+            # Same as drive_pivot_right
+            return FORWARD, bwd, BACKWARD, bwd
+        elif direction == "fwd_left":
+            return FORWARD, bwd, FORWARD, fwd
+        elif direction == "fwd_right":
+            return FORWARD, fwd, FORWARD, bwd
+        elif direction == "bwd_left":
+            return BACKWARD, bwd, BACKWARD, fwd
+        elif direction == "bwd_right":
+            return BACKWARD, fwd, BACKWARD, bwd
+
+        return RELEASE, 0, RELEASE, 0
+
+    def rebuild(self):
+        """Recomputes every entry. Call this after adding drive motors or changing speeds or trim."""
+
+        drive_motors = []
+        for motor in self._motor_controller.drive_motors.values():
+            if motor is None:
+                continue
+            if motor.side != "left" and motor.side != "right":
+                print(motor.name + " was not set as 'left' or 'right'. Omitting...")
+                continue
+            drive_motors.append(motor)
+
+        entries = []
+        for bits in range(MOVE_MASK + 1):
+            direction = direction_for(bits)
+            left_state, left_speed, right_state, right_speed = self._side_commands(direction)
+
+            vector = []
+            for motor in drive_motors:
+                if motor.side == "left":
+                    state, speed = left_state, left_speed
+                else:
+                    state, speed = right_state, right_speed
+
+                if state != RELEASE:
+                    speed += motor.trim
+                vector.append((motor, state, speed))
+
+            entries.append((direction, tuple(vector)))
+
+        self._entries = entries
+
+    def lookup(self, bits):
+        """Returns (direction name, command vector) for a set of input bits. The vector holds a (motor, state,
+           speed) tuple for every drive motor and goes to MotorController.apply_vector()."""
+
+        return self._entries[bits & MOVE_MASK]
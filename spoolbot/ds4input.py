@@ -7,15 +7,149 @@
 # 4 buttons control robot movement. Input from these 4 buttons can be combined to control more advanced movement such as
 # turning left or right while also moving forward or backward.
 
-import constants
-import pygame
+from . import constants
+from . import debounce
+from . import dispatch
+from . import scheduler
+import math
 import os
-from time import sleep
-from pprint import pprint
+from time import monotonic
 
-# set SDL to use the dummy NULL video driver,
-#   so it doesn't need a windowing system.
-os.environ["SDL_VIDEODRIVER"] = "dummy"
+# pygame is imported by load_pygame() when the first controller is made, so importing this module stays quick.
+pygame = None
+
+# Keyboard keys that map to controls, the names shown for them in the telemetry view, and the buttons they stand in for.
+# Filled in by load_pygame().
+_CONTROL_KEYS = []
+
+# Whether pygame.event.wait() takes a timeout, which it only does from pygame 2. Set by load_pygame().
+_WAIT_TIMEOUT = False
+
+
+def load_pygame():
+    """Imports pygame and sets up the keyboard key table the first time it's called. Returns the pygame module."""
+
+    global pygame, _WAIT_TIMEOUT
+
+    if pygame is None:
+        # set SDL to use the dummy NULL video driver,
+        #   so it doesn't need a windowing system.
+        os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+        import pygame as pygame_module
+
+        pygame = pygame_module
+        _WAIT_TIMEOUT = pygame.version.vernum[0] >= 2
+        _CONTROL_KEYS[:] = [(pygame.K_UP, "up", "btn_fwd"), (pygame.K_DOWN, "down", "btn_bwd"),
+                            (pygame.K_LEFT, "left", "btn_left"), (pygame.K_RIGHT, "right", "btn_right"),
+                            (pygame.K_q, "q", "btn_cw"), (pygame.K_e, "e", "btn_ccw")]
+
+    return pygame
+
+
+class PygameEvents:
+    """Reads the DS4 and the keyboard through pygame, and hands their events to DS4Controller as plain tuples.
+
+       Every event is a (kind, code, value) tuple. The kinds are "axis" (axis number, position), "button_down" and
+       "button_up" (button number, 1 or 0), "hat" (hat number, (x, y)), "key_down" and "key_up" (pygame key code, 1
+       or 0), and "removed" (joystick instance, 0) when the controller goes away. journal.ReplaySource hands out the
+       same tuples, so a recorded session can stand in for this."""
+
+    def __init__(self, wait_for_input=False, axes=True):
+        """Starts the pygame subsystems that get used and opens the first joystick, if there is one. With
+           'wait_for_input' on, the control loop sleeps in wait() until an event comes in instead of polling every
+           frame. That needs pygame 2, and raises RuntimeError on pygame 1. With 'axes' off, stick movements are
+           dropped by SDL, so a stick that isn't used for driving doesn't wake the loop."""
+
+        # Only start the pygame subsystems that get used. pygame.init() would also start audio, fonts and the rest,
+        # which only slows down startup. The display has to be up for the event queue and the keyboard to work.
+        load_pygame()
+        if wait_for_input and not _WAIT_TIMEOUT:
+            raise RuntimeError("Waiting for input needs pygame 2.0.0 or newer, and pygame " + pygame.version.ver +
+                               " is installed. Use --input pygame to poll for it instead.")
+        self.control_keys = _CONTROL_KEYS
+        self.event_driven = wait_for_input
+        pygame.display.init()
+        self._display_surf = pygame.display.set_mode(constants.PYGAME_SCREEN, pygame.HWSURFACE | pygame.DOUBLEBUF)
+        if axes:
+            pygame.event.set_allowed(pygame.JOYAXISMOTION)
+        else:
+            pygame.event.set_blocked(pygame.JOYAXISMOTION)
+
+        # The event wait() woke up for, which poll() hands out first
+        self._pending = None
+        # pygame 1 has no event for a controller going away, and never sends one.
+        self._removed_type = getattr(pygame, "JOYDEVICEREMOVED", None)
+
+        self.controller_present = True
+        self.button_count = 0
+        self.hat_count = 0
+        try:
+            pygame.joystick.init()
+            self._controller = pygame.joystick.Joystick(0)
+            self._controller.init()
+            self.button_count = self._controller.get_numbuttons()
+            self.hat_count = self._controller.get_numhats()
+        except:
+            self.controller_present = False
+
+    def poll(self):
+        """Returns every waiting event as a list of (kind, code, value) tuples."""
+
+        waiting = pygame.event.get()
+        if self._pending is not None:
+            waiting.insert(0, self._pending)
+            self._pending = None
+
+        events = []
+        for event in waiting:
+            if event.type == pygame.JOYAXISMOTION:
+                events.append(("axis", event.axis, event.value))
+            elif event.type == pygame.JOYBUTTONDOWN:
+                events.append(("button_down", event.button, 1))
+            elif event.type == pygame.JOYBUTTONUP:
+                events.append(("button_up", event.button, 0))
+            elif event.type == pygame.JOYHATMOTION:
+                events.append(("hat", event.hat, tuple(event.value)))
+            elif event.type == pygame.KEYDOWN:
+                events.append(("key_down", event.key, 1))
+            elif event.type == pygame.KEYUP:
+                events.append(("key_up", event.key, 0))
+            elif event.type == self._removed_type:
+                events.append(("removed", event.instance_id, 0))
+
+        return events
+
+    def wait(self, timeout=None):
+        """Sleeps until an event comes in or 'timeout' seconds pass. Returns 'True' if one came in. The event is kept
+           for the next poll(), which takes it along with everything else waiting."""
+
+        if self._pending is not None:
+            return True
+
+        if timeout is not None and timeout <= 0.0:
+            # pygame.event.wait(0) would wait forever.
+            return bool(pygame.event.peek())
+
+        if timeout is None:
+            event = pygame.event.wait()
+        else:
+            # Rounded up, so the loop doesn't wake a little early and spin until the time is up.
+            event = pygame.event.wait(int(math.ceil(timeout * 1000)))
+
+        if event.type == pygame.NOEVENT:
+            return False
+
+        self._pending = event
+        return True
+
+    def alive(self):
+        """Returns 'True' while the controller found at the start is still connected, or if there wasn't one and the
+           keyboard is the only input. Only pygame 2 keeps the joystick count up to date as controllers come and go."""
+
+        if not self.controller_present:
+            return True
+
+        return pygame.joystick.get_count() > 0
 
 
 # class Button:
@@ -94,28 +228,81 @@ os.environ["SDL_VIDEODRIVER"] = "dummy"
 class DS4Controller:
     """Class representing the DualShock 4 controller."""
 
-    def __init__(self, motor_controller):
-        """Initialize the controller."""
+    # Loop phases a profiler.PhaseProfiler can time
+    PROFILED_PHASES = ("poll_events", "determine_spin", "move_spool", "determine_direction", "run_movement", "decide",
+                       "publish_telemetry", "record_tick")
+
+    def __init__(self, motor_controller, loop_scheduler=None, telemetry=None, button_names=constants.BTN_NUMS,
+                 motor_writer=None, stick_drive=False, event_source=None, clock=monotonic, settle=constants.DS4_SETTLE):
+        """Initialize the controller. 'telemetry' is an optional TelemetryView that is sent a snapshot every frame.
+           'button_names' maps DS4 button numbers and D-pad values to control names, and can be used to remap them.
+           With a started MotorWriter as 'motor_writer', scan_events() hands it the motor commands instead of
+           writing them itself. With 'stick_drive' on, the left stick drives the robot proportionally whenever no
+           movement button is held. 'event_source' is where input comes from, and defaults to a PygameEvents. When
+           its 'event_driven' is on, like evdevinput.EvdevEvents', scan_events() sleeps in its wait() until input
+           comes instead of polling every frame. 'clock' stands in for time.monotonic() when input is stamped. A
+           control has to hold a new state for 'settle' seconds before it counts."""
 
         self._motor_controller = motor_controller
+        self._motor_writer = motor_writer
+        self._telemetry = telemetry
+
+        # A recorder.FlightRecorder that gets a record every tick, when one is set.
+        self.recorder = None
+        # A journal.JournalWriter that gets every input event, when one is set.
+        self.journal = None
+        # A watchdog.Watchdog that's told about every input sample and finished pass, when one is set.
+        self.watchdog = None
+
+        # Held controls are packed into bits. Buttons, the D-pad and the keyboard each keep their own share.
+        self._dispatch = dispatch.DispatchTable(motor_controller)
+        self._drive_vector = ()
+        self._button_map = dispatch.compile_button_map(button_names)
+        self._hat_map = dispatch.compile_hat_map(button_names)
+        self._button_bits = 0
+        self._hat_bits = 0
+        self._key_bits = 0
+
+        # Turns the raw bits into debounced '_input_bits'. Set its 'windows' to give controls their own settle time.
+        self.debouncer = debounce.Debouncer(settle)
+        self._input_bits = 0
+        # The bits the spool decision last saw, for telling when a spool button goes down
+        self._spin_bits = 0
+
+        self._mixer = None
+        if stick_drive:
+            # numpy is only loaded when the stick is used.
+            from . import mixer
+            self._mixer = mixer.StickMixer(motor_controller)
+        self._scheduler = loop_scheduler if loop_scheduler is not None else scheduler.LoopScheduler()
         self._spool_spin = "stop"
         self._spool_buttons = []
         self._move_buttons = []
         self._direction = "stop"
         self._active_buttons = []
         self._stop_lockout = False
-        self._controller_present = True
-
-        pygame.init()
-        self._display_surf = pygame.display.set_mode(constants.PYGAME_SCREEN, pygame.HWSURFACE | pygame.DOUBLEBUF)
-        try:
-            pygame.joystick.init()
-            self._controller = pygame.joystick.Joystick(0)
-            self._controller.init()
-        except:
-            self._controller_present = False
 
-        self._keys = None
+        self._events = event_source if event_source is not None else PygameEvents()
+        # The event source says which keys it sends. Ones that don't say, like a journal replay, send pygame's.
+        control_keys = getattr(self._events, "control_keys", None)
+        if control_keys is None:
+            load_pygame()
+            control_keys = _CONTROL_KEYS
+        self._control_keys = control_keys
+        self._event_driven = getattr(self._events, "event_driven", False)
+        # Sources that can tell whether the controller is still connected have an alive() check. For the rest, only
+        # events show that input is still coming in.
+        self._source_alive = getattr(self._events, "alive", None)
+        self._controller_present = self._events.controller_present
+        # Set when the controller goes away. Input samples stop counting as fresh, so a watchdog stops the robot.
+        self._controller_lost = False
+        self._clock = clock
+
+        self._held_keys = set()
+        self._pressed_keys = ()
+
+        # time.monotonic() stamp of the oldest input that hasn't been acted on yet.
+        self._input_time = None
 
         self._axis_data = None
         self._button_data = None
@@ -174,143 +361,126 @@ class DS4Controller:
     def determine_spin(self):
         """Determines the direction the spool should be moving based on button presses."""
 
-        pressed_btns = []
-        if self._controller_present:
-            for button, pressed in self._button_data.items():
-                if pressed:
-                    pressed_btns.append(button)
-        elif len(self._keys) < 2:
-            return
-        else:
-            if self._keys[pygame.K_q] and self._keys[pygame.K_e]:
-                pressed_btns = [1, 2]
-            elif self._keys[pygame.K_q] or self._keys[pygame.K_e]:
-                pressed_btns = [1]
-
-        if len(pressed_btns) == 1:
-            # One button is being pressed.
-
-            button = pressed_btns[0]
-            if self._spool_spin is "stop":
-                # Spool can be spun in either direction.
-                if button == constants.BTN_CW or self._keys[pygame.K_q]:
-                    self._spool_spin = "cw"
-                elif button == constants.BTN_CCW or self._keys[pygame.K_e]:
-                    self._spool_spin = "ccw"
-            else:
-                # Spool needs to be stopped first.
-                self._spool_spin = "stop"
+        self._spool_spin = self.next_spin(self.input_bits())
+
+    def next_spin(self, bits):
+        """Returns the new spool direction for a set of input bits. Only a spool button that went down since the last
+           decision changes it."""
 
-        elif len(pressed_btns) == 2:
-            # Two buttons are being pressed
-            # Stop the spool
-            self._spool_spin = "stop"
+        pressed = bits & ~self._spin_bits
+        self._spin_bits = bits
+        return dispatch.next_spin(self._spool_spin, bits, pressed)
 
     def move_spool(self):
         """Rotates the spool based on the direction determined by which button was activated."""
 
         self.determine_spin()
 
-        spool_dir = self._spool_spin
-
-        if spool_dir is "stop":
-            # Stop movement
-            self._motor_controller.spool_stop()
-        elif spool_dir is "cw":
-            # Move spool clockwise.
-            self._motor_controller.spool_clockwise()
-        elif spool_dir is "ccw":
-            # Move spool counter-clockwise
-            self._motor_controller.spool_counterclockwise()
+        self._dispatch.spool_actions[self._spool_spin]()
 
     # SPOOL MOVEMENT SECTION END
 
     # GROUND MOVEMENT SECTION BEGIN
 
     def determine_direction(self):
-        """Sets the direction based on which buttons are being held."""
-        # Valid Inputs:
-        # forward = fwd
-        # backward = bwd
-        # left = left
-        # right = right
-        # forward + left = fwd_left
-        # forward + right = fwd_right
-        # backward + left = bwd_left
-        # backward + right = bwd_right
-
-        # Utilize self._hat_data[0]
+        """Sets the direction, and the motor commands that go with it, based on which buttons are being held."""
 
-        if self._controller_present:
-            hat_value = self._hat_data[0]
-        elif len(self._keys) < 1:
-            returnre
-        else:
-            hat_value = (0, 0)
-
-        # If a valid input combo is pressed, set the appropriate direction.
-        if hat_value == (0, 1) or self._keys[pygame.K_UP]:
-            # Up is pressed. Go forward.
-            self._direction = "fwd"
-        elif hat_value == (0, -1) or self._keys[pygame.K_DOWN]:
-            # Down is pressed. Go backward.
-            self._direction = "bwd"
-        elif hat_value == (1, 0) or self._keys[pygame.K_RIGHT]:
-            # Right is pressed. Do the thing.
-            self._direction = "right"
-        elif hat_value == (-1, 0) or self._keys[pygame.K_LEFT]:
-            # GO LEFT, DAMN IT!
-            self._direction = "left"
-        elif hat_value == (1, 1) or (self._keys[pygame.K_UP] and self._keys[pygame.K_RIGHT]):
-            # Go forward-right
-            self._direction = "fwd_right"
-        elif hat_value == (-1, 1) or (self._keys[pygame.K_UP] and self._keys[pygame.K_LEFT]):
-            self._direction = "fwd_left"
-        elif hat_value == (1, -1) or (self._keys[pygame.K_DOWN] and self._keys[pygame.K_RIGHT]):
-            self._direction = "bwd_right"
-        elif hat_value == (-1, -1) or (self._keys[pygame.K_DOWN] and self._keys[pygame.K_LEFT]):
-            self._direction = "bwd_left"
-        else:
-            # No buttons are pressed, or an incorrect number are pressed, so the robot stops.
-            if self._direction is not "stop":
-                self._direction = "stop"
+        self._direction, self._drive_vector = self.drive_for(self.input_bits())
+
+    def drive_for(self, bits):
+        """Returns (direction name, command vector) for a set of input bits. Movement buttons win. Without any, the
+           stick is used when stick driving is on and it isn't centered."""
+
+        direction, drive_vector = self._dispatch.lookup(bits)
 
-        print("Current direction: " + self._direction)
+        if self._mixer is not None and direction == "stop" and self._axis_data:
+            stick_vector = self._mixer.mix(self._axis_data.get(constants.STICK_AXIS_X, 0.0),
+                                           self._axis_data.get(constants.STICK_AXIS_Y, 0.0))
+            if stick_vector is not None:
+                return "stick", stick_vector
+
+        return direction, drive_vector
 
     def run_movement(self):
         """Uses determine_direction to begin with and applies the correct settings to the motor controller."""
 
         self.determine_direction()
 
-        # Use current direction info to determine movement.
-        # This is going to be a long-ass if statement, and I can't do much about that. :(
-
-        if self._direction is "fwd":
-            # Move forward
-            self._motor_controller.drive_forward()
-        elif self._direction is "bwd":
-            # Move backward
-            self._motor_controller.drive_backward()
-        elif self._direction is "left":
-            # Pivot left
-            self._motor_controller.drive_pivot_left()
-        elif self._direction is "right":
-            # Pivot right
-            self._motor_controller.drive_pivot_right()
-        elif self._direction is "fwd_left" or self._direction is "bwd_left":
-            # Do a moving left turn.
-            self._motor_controller.drive_turn_left()
-        elif self._direction is "fwd_right" or self._direction is "fwd_right":
-            # Do a moving right turn
-            self._motor_controller.drive_turn_right()
-        else:
-            # Stop movement
-            self._motor_controller.drive_stop()
+        self._motor_controller.apply_vector(self._drive_vector)
 
     # GROUND MOVEMENT SECTION END
 
-    def scan_events(self):
-        """Listen for controller events."""
+    def input_bits(self):
+        """Returns every held control, after debouncing, packed into one integer of dispatch bits."""
+
+        return self._input_bits
+
+    def input_state(self):
+        """Returns a snapshot of everything the decisions read. Two snapshots compare equal when the decisions would
+           come out the same, so the loop can skip deciding when nothing changed."""
+
+        bits = self._input_bits
+        if self._mixer is None or not self._axis_data:
+            return bits
+
+        return bits, self._axis_data.get(constants.STICK_AXIS_X, 0.0), self._axis_data.get(constants.STICK_AXIS_Y, 0.0)
+
+    def read_keys(self):
+        """Updates the keyboard's share of the input bits and the key names shown in telemetry."""
+
+        key_bits = 0
+        pressed = []
+        for key, name, button in self._control_keys:
+            if key in self._held_keys:
+                key_bits |= dispatch.BUTTON_BITS[button]
+                pressed.append(name)
+
+        self._key_bits = key_bits
+        self._pressed_keys = tuple(pressed)
+
+    def stamp_input(self, received):
+        """Records when new input arrived, unless older input is still waiting to be acted on."""
+
+        if self._input_time is None:
+            self._input_time = received
+
+    def take_input_time(self):
+        """Returns the stamp of the oldest input that hasn't been acted on, or 'None', and clears it."""
+
+        input_time = self._input_time
+        self._input_time = None
+        return input_time
+
+    def decide(self, bits):
+        """Runs the spool and movement decisions for a set of input bits. Returns the spool method to call and the
+           drive command vector for MotorController.apply_vector()."""
+
+        self._spool_spin = self.next_spin(bits)
+        self._direction, self._drive_vector = self.drive_for(bits)
+
+        return self._dispatch.spool_actions[self._spool_spin], self._drive_vector
+
+    def telemetry_snapshot(self):
+        """Returns a copy of the current input state for the telemetry view."""
+
+        return {"direction": self._direction, "spool": self._spool_spin,
+                "buttons": dict(self._button_data) if self._button_data else None,
+                "hats": dict(self._hat_data) if self._hat_data else None,
+                "axes": dict(self._axis_data) if self._axis_data else None,
+                "keys": self._pressed_keys, "keyboard": bool(self._control_keys)}
+
+    def record_tick(self, start, bits):
+        """Writes the tick that began at 'start' to the flight recorder."""
+
+        self.recorder.record(start, bits, self._axis_data, self._motor_controller, self._clock() - start)
+
+    def publish_telemetry(self):
+        """Hands a copy of the current input state to the telemetry view."""
+
+        self._telemetry.publish(self.telemetry_snapshot())
+
+    def start_scanning(self):
+        """Sets up the input state tables. Call this before the first poll_events()."""
 
         if self._controller_present:
             if not self._axis_data:
@@ -318,53 +488,185 @@ class DS4Controller:
 
             if not self._button_data:
                 self._button_data = {}
-                for i in range(self._controller.get_numbuttons()):
+                for i in range(self._events.button_count):
                     self._button_data[i] = False
 
             if not self._hat_data:
                 self._hat_data = {}
-                for i in range(self._controller.get_numhats()):
+                for i in range(self._events.hat_count):
                     self._hat_data[i] = (0, 0)
 
-        if not self._keys:
-            self._keys = []
+    def poll_events(self):
+        """Handles every waiting input event. Returns 'True' if any control input changed."""
+
+        events = self._events.poll()
+        # Events don't say when they happened, so the batch is stamped with when it was picked up.
+        received = self._clock()
+        changed = False
+
+        for kind, code, value in events:
+            if self.journal is not None:
+                self.journal.write(received, kind, code, value)
+            if self.handle_event(kind, code, value):
+                changed = True
+
+        if changed:
+            self.stamp_input(received)
+
+        # Runs even without new events, so a change that's settling gets taken once its time is up.
+        self._input_bits = self.debouncer.update(self._button_bits | self._hat_bits | self._key_bits, received)
+
+        # Polling proves nothing by itself. A controller that drops out without a "removed" event sends nothing
+        # either, so only events or the source's own check count as a fresh sample.
+        if self.watchdog is not None and not self._controller_lost:
+            if events or (self._source_alive is not None and self._source_alive()):
+                self.watchdog.feed_input(received)
+
+        return changed
+
+    def handle_event(self, kind, code, value):
+        """Applies one (kind, code, value) input event. Returns 'True' if it changed a control input."""
+
+        if kind == "key_down" or kind == "key_up":
+            # A Keyboard button has been pressed
+            if kind == "key_down":
+                self._held_keys.add(code)
+            else:
+                self._held_keys.discard(code)
+            self.read_keys()
+            return True
+
+        if not self._controller_present:
+            return False
+
+        if kind == "axis":
+            # An axis has been moved
+            self._axis_data[code] = round(value, 2)
+            return self._mixer is not None
+        elif kind == "button_down":
+            # A button has been pressed
+            self._button_data[code] = True
+            self._button_bits |= self._button_map.get(code, 0)
+            return True
+        elif kind == "button_up":
+            # A button has been released
+            self._button_data[code] = False
+            self._button_bits &= ~self._button_map.get(code, 0)
+            return True
+        elif kind == "hat":
+            # The D-pad was used
+            self._hat_data[code] = value
+            if code == 0:
+                self._hat_bits = self._hat_map.get(tuple(value), 0)
+            return True
+        elif kind == "removed":
+            # The controller was lost. Nothing it was holding counts any more.
+            self.lose_controller()
+            return True
+
+        return False
+
+    def lose_controller(self):
+        """Lets go of every control the controller was holding and stops listening to it."""
+
+        self._controller_present = False
+        self._controller_lost = True
+        self._button_bits = 0
+        self._hat_bits = 0
+        self._axis_data = {}
+        for i in self._button_data:
+            self._button_data[i] = False
+        for i in self._hat_data:
+            self._hat_data[i] = (0, 0)
+
+    def input_fileno(self):
+        """Returns a file descriptor that turns readable when input comes in, or 'None' if there isn't one."""
+
+        fileno = getattr(self._events, "fileno", None)
+        return fileno() if fileno is not None else None
+
+    def wait_timeout(self):
+        """Returns the longest an event-driven loop may sleep waiting for input, or 'None' for as long as it takes."""
+
+        # While a motor is ramping, wake up in time for its next step, unless the writer thread is taking care of it.
+        ramping = self._motor_writer is None and self._motor_controller.is_ramping()
+        timeout = self._scheduler.period if ramping else None
+
+        # A control that's still settling has to be looked at again once it has.
+        settle_at = self.debouncer.next_settle()
+        if settle_at is not None:
+            settle_in = max(settle_at - self._clock(), 0.0)
+            timeout = settle_in if timeout is None else min(timeout, settle_in)
+
+        # The watchdog needs to see a pass, and a sample, well inside its deadlines even when nothing is touched.
+        if self.watchdog is not None:
+            deadline = min(self.watchdog.tick_timeout, self.watchdog.input_timeout) / 2
+            timeout = deadline if timeout is None else min(timeout, deadline)
+
+        return timeout
+
+    def journal_header(self):
+        """Returns what a journal needs to know about this controller to replay its events."""
+
+        return {"source": "ds4", "controller": self._controller_present, "buttons": self._events.button_count,
+                "hats": self._events.hat_count}
+
+    def scan_events(self):
+        """Listen for controller events."""
+
+        self.start_scanning()
+        last_state = None
 
         while True:
-            for event in pygame.event.get():
-                if self._controller_present:
-                    if event.type == pygame.JOYAXISMOTION:
-                        # An axis has been moved
-                        self._axis_data[event.axis] = round(event.value, 2)
-                    elif event.type == pygame.JOYBUTTONDOWN:
-                        # A button has been pressed
-                        self._button_data[event.button] = True
-                    elif event.type == pygame.JOYBUTTONUP:
-                        # A button has been released
-                        self._button_data[event.button] = False
-                    elif event.type == pygame.JOYHATMOTION:
-                        # The D-pad was used
-                        self._hat_data[event.hat] = event.value
-                if event.type == pygame.KEYDOWN or event.type == pygame.KEYUP:
-                    # A Keyboard button has been pressed
-                    self._keys = pygame.key.get_pressed()
-
-            os.system('clear')
-            print("Input values:")
-            pprint(self._button_data)
-            pprint(self._axis_data)
-            pprint(self._hat_data)
-            pprint(self._keys)
-
-            print("\n\t\tCONTROLS:\nLeft = left arrow\nRight = right arrow\nForward = up arrow\nBackward = down arrow"
-                  "\nSpool clockwise = q\nSpool counter-clockwise = e")
-
-            # Second, handle the spool buttons
-
-            self.move_spool()
-
-            # Last, deal with ground movement
-            self.run_movement()
-
-            # Wait a bit for the next loop. This doesn't need to run more than 120 times per second, and the delay will
-            # assist with debouncing the input.
-            #sleep(constants.CYCLE_WAIT)
+            start = self._clock()
+            self.poll_events()
+
+            # Pass the input's stamp along, so the motor controller can tell when it gets acted on. It's taken even
+            # when nothing changed, so it doesn't get pinned on a later change.
+            input_time = self.take_input_time()
+
+            # Only decide again when the input changed. Otherwise the motors already have their commands, and only a
+            # ramp needs stepping.
+            state = self.input_state()
+            changed = state != last_state
+            last_state = state
+
+            if self._motor_writer is not None:
+                # The writer thread does the bus writes and steps the ramps.
+                if changed:
+                    spool_action, drive_vector = self.decide(self.input_bits())
+                    self._motor_writer.submit(spool_action, drive_vector, input_time)
+            elif changed:
+                if input_time is not None:
+                    self._motor_controller.begin_input(input_time)
+
+                # Second, handle the spool buttons
+
+                self.move_spool()
+
+                # Last, deal with ground movement
+                self.run_movement()
+
+                self._motor_controller.end_input()
+
+                # Let any motors that are slowing down take their next step.
+                self._motor_controller.update()
+            elif self._motor_controller.is_ramping():
+                self._motor_controller.update()
+
+            if self._telemetry is not None and changed:
+                self.publish_telemetry()
+
+            if self.recorder is not None:
+                self.record_tick(start, self.input_bits())
+
+            if self.watchdog is not None:
+                self.watchdog.feed_tick(self._clock())
+
+            if self._event_driven:
+                # Sleep until input comes in, or something else needs doing.
+                self._events.wait(self.wait_timeout())
+            else:
+                # Wait for the next frame. The scheduler takes the time this pass took out of the wait, and the delay
+                # will assist with debouncing the input.
+                self._scheduler.wait()
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+
+# Software stand-in for the MotorHAT's PCA9685, for running the robot code on machines without the hardware.
+# Version info found in constants file.
+
+# The emulator works at the I2C level. Adafruit_MotorHAT talks to it exactly like it would talk to the real chip, so
+# everything above the bus runs unchanged. Every transaction is timestamped and logged, which makes it possible to
+# count bus traffic and check motor timing in tests and benchmarks.
+
+from . import constants
+from time import monotonic
+from Adafruit_MotorHAT import Adafruit_MotorHAT
+
+# PCA9685 registers and bits
+MODE1 = 0x00
+MODE2 = 0x01
+LED0_ON_L = 0x06
+ALL_LED_ON_L = 0xFA
+PRESCALE = 0xFE
+MODE1_AI = 0x20
+MODE1_SLEEP = 0x10
+MODE1_ALLCALL = 0x01
+MODE2_OUTDRV = 0x04
+FULL_BIT = 0x10  # Bit 4 of LEDn_ON_H and LEDn_OFF_H
+PIN_COUNT = 16
+
+# (PWM pin, IN1 pin, IN2 pin) for each MotorHAT motor header. Matches Adafruit_DCMotor.
+MOTOR_PINS = {1: (8, 10, 9), 2: (13, 11, 12), 3: (2, 4, 3), 4: (7, 5, 6)}
+
+
+class EmulatedPCA9685:
+    """Keeps the register state of a PCA9685 and logs every transaction sent to it. Looks like an Adafruit_GPIO I2C
+       device to the code using it."""
+
+    def __init__(self, address=constants.HAT_ADDRESS, clock=monotonic):
+        """Sets up the chip in its power-on state. 'clock' is used to timestamp transactions."""
+
+        self.address = address
+        self._clock = clock
+        self.registers = bytearray(256)
+        self.log = []
+        self.reset()
+
+    def reset(self):
+        """Puts every register back to its power-on value. The log is kept."""
+
+        for i in range(len(self.registers)):
+            self.registers[i] = 0
+
+        self.registers[MODE1] = MODE1_SLEEP | MODE1_ALLCALL
+        self.registers[MODE2] = MODE2_OUTDRV
+        self.registers[PRESCALE] = 0x1E
+
+        # Every output starts fully off.
+        for pin in range(PIN_COUNT):
+            self.registers[LED0_ON_L + pin * 4 + 3] = FULL_BIT
+
+    def _record(self, op, register, data):
+        """Adds a transaction to the log."""
+
+        self.log.append((self._clock(), op, register, bytes(data)))
+
+    def _store(self, register, value):
+        """Writes one register the way the chip does, including the ALL_LED broadcast registers."""
+
+        if ALL_LED_ON_L <= register < ALL_LED_ON_L + 4:
+            # Writing an ALL_LED register writes the same byte of every LED register.
+            offset = register - ALL_LED_ON_L
+            for pin in range(PIN_COUNT):
+                self.registers[LED0_ON_L + pin * 4 + offset] = value
+        else:
+            self.registers[register] = value
+
+    def _write_block(self, register, data):
+        """Writes a run of bytes. Without auto-increment, the chip keeps writing to the same register."""
+
+        auto_increment = self.registers[MODE1] & MODE1_AI
+        for value in data:
+            self._store(register, value & 0xFF)
+            if auto_increment:
+                register = (register + 1) & 0xFF
+
+    # Adafruit_GPIO.I2C.Device interface
+
+    def writeRaw8(self, value):
+        self._record("write", None, [value & 0xFF])
+
+    def write8(self, register, value):
+        self._record("write", register, [value & 0xFF])
+        self._write_block(register, [value])
+
+    def write16(self, register, value):
+        data = [value & 0xFF, (value >> 8) & 0xFF]
+        self._record("write", register, data)
+        self._write_block(register, data)
+
+    def writeList(self, register, data):
+        self._record("write", register, data)
+        self._write_block(register, data)
+
+    def readU8(self, register):
+        value = self.registers[register]
+        self._record("read", register, [value])
+        return value
+
+    def readList(self, register, length):
+        if self.registers[MODE1] & MODE1_AI:
+            data = bytearray(self.registers[(register + i) & 0xFF] for i in range(length))
+        else:
+            data = bytearray([self.registers[register]] * length)
+        self._record("read", register, data)
+        return data
+
+    # Helpers for tests and benchmarks
+
+    @property
+    def transactions(self):
+        """Number of transactions logged so far."""
+
+        return len(self.log)
+
+    def clear_log(self):
+        """Empties the transaction log."""
+
+        self.log = []
+
+    def pin_counts(self, pin):
+        """Returns the (on, off) counts of an LED pin, with the full on/off bit kept in bit 12."""
+
+        base = LED0_ON_L + pin * 4
+        regs = self.registers
+        return regs[base] | (regs[base + 1] << 8), regs[base + 2] | (regs[base + 3] << 8)
+
+    def pin_duty(self, pin):
+        """Returns how much of each PWM period a pin is high for, out of 4096."""
+
+        on, off = self.pin_counts(pin)
+        if off & (FULL_BIT << 8):
+            # Full off wins over everything else.
+            return 0
+        if on & (FULL_BIT << 8):
+            return 4096
+
+        return (off - on) % 4096
+
+    def motor_state(self, motor_num):
+        """Decodes the direction and speed a motor header is being driven at. Returns (state, speed)."""
+
+        pwm_pin, in1_pin, in2_pin = MOTOR_PINS[motor_num]
+        in1 = self.pin_duty(in1_pin) == 4096
+        in2 = self.pin_duty(in2_pin) == 4096
+
+        if in1 and not in2:
+            state = constants.FORWARD
+        elif in2 and not in1:
+            state = constants.BACKWARD
+        elif in1 and in2:
+            state = constants.BRAKE
+        else:
+            state = constants.RELEASE
+
+        return state, self.pin_duty(pwm_pin) // 16
+
+
+class EmulatedI2C:
+    """Stands in for the Adafruit_GPIO.I2C module. Hands out an EmulatedPCA9685 for each address."""
+
+    def __init__(self, clock=monotonic):
+        self._clock = clock
+        self.devices = {}
+
+    def get_i2c_device(self, address, **kwargs):
+        if address not in self.devices:
+            self.devices[address] = EmulatedPCA9685(address, clock=self._clock)
+        return self.devices[address]
+
+
+class EmulatedMotorHAT(Adafruit_MotorHAT):
+    """An Adafruit_MotorHAT wired to an emulated PCA9685. Pass it to MotorController as 'motor_hat'."""
+
+    def __init__(self, addr=constants.HAT_ADDRESS, freq=1600, clock=monotonic):
+        self.bus = EmulatedI2C(clock=clock)
+        self.chip = self.bus.get_i2c_device(addr)
+        super().__init__(addr=addr, freq=freq, i2c=self.bus)
+
+
+def make_controller(clock=monotonic, motion_profile="stopping", **kwargs):
+    """Returns a motor controller with the robot's motors, set up the way SpoolBot does it, on a new EmulatedMotorHAT.
+       'clock' is used by both. 'motion_profile' defaults to the MotorController's own default, and any other keyword
+       arguments are passed on to the MotorController too. The emulated chip is at 'controller._motor_hat.chip'."""
+
+    from .__main__ import SpoolBot
+
+    return SpoolBot.init_motor_controller(motion_profile, motor_hat=EmulatedMotorHAT(clock=clock), clock=clock,
+                                          **kwargs)
@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+
+# Reads the DS4 straight from the Linux input subsystem, without pygame.
+# Version info found in constants file.
+
+# The kernel's DS4 driver shows the controller as an event device, /dev/input/eventN. Reading it gives whole
+# input_event structs, each one a timestamp, a type, a code and a value. The events of one report from the controller
+# end with a SYN_REPORT. EvdevEvents turns every finished report into the same (kind, code, value) tuples PygameEvents
+# hands out, numbering buttons and axes the way SDL does for the DS4, so constants.BTN_NUMS and the stick settings work
+# the same with either one.
+#
+# Reads never block. wait() sleeps in select() until the device has something to read, so an idle robot uses no CPU.
+# Anything that gives input_event structs through a file descriptor works, which is how the tests feed it from a pipe.
+
+from . import constants
+import fcntl
+import glob
+import os
+import select
+import struct
+from time import sleep
+
+# struct input_event: struct timeval, __u16 type, __u16 code, __s32 value
+EVENT = struct.Struct("llHHi")
+READ_SIZE = EVENT.size * 64
+
+# Event types and codes, from linux/input-event-codes.h
+EV_SYN = 0x00
+EV_KEY = 0x01
+EV_ABS = 0x03
+SYN_REPORT = 0
+SYN_DROPPED = 3
+KEY_REPEAT = 2  # The value of a key event sent while the key is held
+
+BTN_SOUTH = 0x130  # Cross
+BTN_EAST = 0x131  # Circle
+BTN_NORTH = 0x133  # Triangle
+BTN_WEST = 0x134  # Square
+BTN_TL = 0x136  # L1
+BTN_TR = 0x137  # R1
+BTN_TL2 = 0x138  # L2
+BTN_TR2 = 0x139  # R2
+BTN_SELECT = 0x13a  # Share
+BTN_START = 0x13b  # Options
+BTN_MODE = 0x13c  # PS
+BTN_THUMBL = 0x13d  # L3
+BTN_THUMBR = 0x13e  # R3
+
+ABS_X = 0x00
+ABS_Y = 0x01
+ABS_Z = 0x02
+ABS_RX = 0x03
+ABS_RY = 0x04
+ABS_RZ = 0x05
+ABS_HAT0X = 0x10
+ABS_HAT0Y = 0x11
+
+# The DS4's buttons and axes, in the order SDL numbers them. pygame's button 4 is L1 and button 5 is R1.
+DS4_BUTTONS = (BTN_SOUTH, BTN_EAST, BTN_NORTH, BTN_WEST, BTN_TL, BTN_TR, BTN_TL2, BTN_TR2, BTN_SELECT, BTN_START,
+               BTN_MODE, BTN_THUMBL, BTN_THUMBR)
+DS4_AXES = (ABS_X, ABS_Y, ABS_Z, ABS_RX, ABS_RY, ABS_RZ)
+DS4_AXIS_RANGE = (0, 255)  # Used when the device can't be asked for an axis's range
+
+# EVIOCGABS(axis) is _IOR('E', 0x40 + axis, struct input_absinfo). input_absinfo is six __s32: value, minimum,
+# maximum, fuzz, flat and resolution.
+ABSINFO = struct.Struct("6i")
+
+
+def eviocgabs(axis):
+    """Returns the ioctl request number that reads an axis's range."""
+
+    return (2 << 30) | (ABSINFO.size << 16) | (ord("E") << 8) | (0x40 + axis)
+
+
+def find_device(name=constants.EVDEV_NAME):
+    """Returns the path of the first event device whose name ends with 'name', or 'None'. The DS4's touchpad and
+       motion sensors show up as devices of their own, with longer names."""
+
+    for name_path in sorted(glob.glob("/sys/class/input/event*/device/name")):
+        try:
+            with open(name_path) as name_file:
+                device_name = name_file.read().strip()
+        except OSError:
+            continue
+
+        if device_name.endswith(name):
+            return os.path.join("/dev/input", name_path.split("/")[4])
+
+    return None
+
+
+class EvdevEvents:
+    """Reads the DS4 from a Linux event device, and hands its events to DS4Controller as plain tuples.
+
+       The kinds are the same as PygameEvents': "button_down", "button_up", "hat", "axis", and "removed" once the
+       device goes away. There's no keyboard."""
+
+    def __init__(self, fd, button_codes=DS4_BUTTONS, axis_codes=DS4_AXES):
+        """Reads input_event structs from the file descriptor 'fd', which is switched to non-blocking. 'button_codes'
+           and 'axis_codes' list the key and axis codes in the order they're numbered."""
+
+        self._fd = fd
+        os.set_blocking(fd, False)
+
+        self.controller_present = True
+        self.button_count = len(button_codes)
+        self.hat_count = 1
+        self.control_keys = ()
+        self.event_driven = True
+
+        self._buttons = {code: number for number, code in enumerate(button_codes)}
+        self._axes = {code: number for number, code in enumerate(axis_codes)}
+        self._ranges = {code: self._axis_range(code) for code in axis_codes}
+
+        # Bytes of an event that hasn't been read in full yet, and the events of the report that's coming in
+        self._partial = b""
+        self._report = []
+        self._hat = (0, 0)
+        self._sent_hat = (0, 0)
+        self._held = set()
+        self.closed = False
+
+    @classmethod
+    def open(cls, path=None):
+        """Opens an event device, or the DS4's if no 'path' is given. Raises OSError if there isn't one."""
+
+        if path is None:
+            path = find_device()
+            if path is None:
+                raise FileNotFoundError("No event device named '" + constants.EVDEV_NAME + "' was found")
+
+        return cls(os.open(path, os.O_RDONLY | os.O_NONBLOCK))
+
+    def fileno(self):
+        """Returns the file descriptor being read, or 'None' once the device is gone."""
+
+        return None if self.closed else self._fd
+
+    def close(self):
+        """Closes the file descriptor."""
+
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+        self.closed = True
+
+    def alive(self):
+        """Returns 'True' until the device has gone away. Reads fail as soon as it does, so it can't go quietly."""
+
+        return not self.closed
+
+    def _axis_range(self, code):
+        """Asks the device for an axis's (minimum, maximum). Falls back to the DS4's range."""
+
+        try:
+            info = ABSINFO.unpack(fcntl.ioctl(self._fd, eviocgabs(code), bytes(ABSINFO.size)))
+        except OSError:
+            return DS4_AXIS_RANGE
+
+        if info[2] <= info[1]:
+            return DS4_AXIS_RANGE
+
+        return info[1], info[2]
+
+    def poll(self):
+        """Returns the events of every report that has finished coming in, as a list of (kind, code, value) tuples."""
+
+        if self.closed:
+            return []
+
+        chunks = [self._partial]
+        lost = False
+        try:
+            while True:
+                chunk = os.read(self._fd, READ_SIZE)
+                if not chunk:
+                    lost = True
+                    break
+                chunks.append(chunk)
+        except BlockingIOError:
+            pass
+        except OSError:
+            # ENODEV once the controller has disconnected
+            lost = True
+
+        data = b"".join(chunks)
+        whole = len(data) - len(data) % EVENT.size
+        self._partial = data[whole:]
+
+        events = []
+        for offset in range(0, whole, EVENT.size):
+            self._handle(EVENT.unpack_from(data, offset), events)
+
+        if lost:
+            # Closed straight away, so a controller that keeps reconnecting doesn't leak a descriptor each time.
+            self.close()
+            events.append(("removed", 0, 0))
+
+        return events
+
+    def _handle(self, event, events):
+        """Adds one input_event to the report coming in. A SYN_REPORT moves the report into 'events'."""
+
+        seconds, microseconds, event_type, code, value = event
+
+        if event_type == EV_KEY:
+            number = self._buttons.get(code)
+            if number is not None and value != KEY_REPEAT:
+                self._report.append(("button_down", number, 1) if value else ("button_up", number, 0))
+        elif event_type == EV_ABS:
+            if code == ABS_HAT0X:
+                self._hat = (value, self._hat[1])
+            elif code == ABS_HAT0Y:
+                # Up is negative here, and positive in pygame.
+                self._hat = (self._hat[0], -value)
+            elif code in self._axes:
+                low, high = self._ranges[code]
+                self._report.append(("axis", self._axes[code], (value - low) * 2.0 / (high - low) - 1.0))
+        elif event_type == EV_SYN:
+            if code == SYN_REPORT:
+                for report_event in self._report:
+                    if report_event[0] == "button_down":
+                        self._held.add(report_event[1])
+                    elif report_event[0] == "button_up":
+                        self._held.discard(report_event[1])
+                    events.append(report_event)
+                self._report = []
+
+                if self._hat != self._sent_hat:
+                    events.append(("hat", 0, self._hat))
+                    self._sent_hat = self._hat
+            elif code == SYN_DROPPED:
+                # The kernel's queue overflowed and events were lost, so nothing is known to be held any more.
+                self._report = []
+                for number in sorted(self._held):
+                    events.append(("button_up", number, 0))
+                self._held.clear()
+                self._hat = (0, 0)
+                if self._sent_hat != (0, 0):
+                    events.append(("hat", 0, (0, 0)))
+                    self._sent_hat = (0, 0)
+
+    def wait(self, timeout=None):
+        """Sleeps until the device has something to read or 'timeout' seconds pass. Returns 'True' if it has."""
+
+        if self.closed:
+            # Nothing is coming any more. Sleep a frame at most, so a loop with nothing else to wake it for falls back
+            # to running once a frame instead of hanging.
+            period = 1.0 / constants.LOOP_RATE
+            sleep(period if timeout is None else min(timeout, period))
+            return False
+
+        return bool(select.select([self._fd], [], [], timeout)[0])
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+
+# Stand-in for RPi.GPIO so the button remote can be run and tested without a Raspberry Pi.
+# Version info found in constants file.
+
+# Only the parts of RPi.GPIO used by robotinput are here. Pin levels are set with set_input(), which also fires any edge
+# callbacks registered for the pin, the same way the real module's event thread would.
+
+import threading
+
+# Constants matching RPi.GPIO
+BCM = 11
+BOARD = 10
+IN = 1
+OUT = 0
+LOW = 0
+HIGH = 1
+PUD_OFF = 20
+PUD_DOWN = 21
+PUD_UP = 22
+RISING = 31
+FALLING = 32
+BOTH = 33
+
+_lock = threading.Lock()
+_mode = None
+_levels = {}
+_callbacks = {}
+_edges = {}
+
+
+def setmode(mode):
+    """Sets the pin numbering scheme."""
+
+    global _mode
+    _mode = mode
+
+
+def getmode():
+    """Returns the pin numbering scheme, or 'None' if it hasn't been set."""
+
+    return _mode
+
+
+def setup(channel, direction, pull_up_down=PUD_OFF, initial=None):
+    """Sets up a pin. Inputs start at the level their pull resistor would give them."""
+
+    if _mode is None:
+        raise RuntimeError("Please set pin numbering mode using GPIO.setmode(GPIO.BOARD) or GPIO.setmode(GPIO.BCM)")
+
+    with _lock:
+        if direction == IN:
+            _levels[channel] = HIGH if pull_up_down == PUD_UP else LOW
+        else:
+            _levels[channel] = initial if initial is not None else LOW
+
+
+def input(channel):
+    """Returns the current level of a pin."""
+
+    if channel not in _levels:
+        raise RuntimeError("You must setup() the GPIO channel first")
+
+    return _levels[channel]
+
+
+def add_event_detect(channel, edge, callback=None, bouncetime=None):
+    """Starts watching a pin for edges. 'bouncetime' is accepted but ignored."""
+
+    if channel not in _levels:
+        raise RuntimeError("You must setup() the GPIO channel first")
+    if channel in _edges:
+        raise RuntimeError("Conflicting edge detection already enabled for this GPIO channel")
+
+    with _lock:
+        _edges[channel] = edge
+        _callbacks[channel] = [] if callback is None else [callback]
+
+
+def add_event_callback(channel, callback):
+    """Adds another callback to a pin that already has edge detection."""
+
+    if channel not in _edges:
+        raise RuntimeError("Add event detection using add_event_detect first before adding a callback")
+
+    with _lock:
+        _callbacks[channel].append(callback)
+
+
+def remove_event_detect(channel):
+    """Stops watching a pin for edges."""
+
+    with _lock:
+        _edges.pop(channel, None)
+        _callbacks.pop(channel, None)
+
+
+def cleanup(channel=None):
+    """Forgets about one pin, or about every pin and the numbering mode."""
+
+    global _mode
+    with _lock:
+        if channel is None:
+            _levels.clear()
+            _edges.clear()
+            _callbacks.clear()
+            _mode = None
+        else:
+            _levels.pop(channel, None)
+            _edges.pop(channel, None)
+            _callbacks.pop(channel, None)
+
+
+def set_input(channel, value):
+    """Test helper. Drives a pin to a level and runs its callbacks if that counts as a watched edge."""
+
+    with _lock:
+        old = _levels[channel]
+        _levels[channel] = HIGH if value else LOW
+        new = _levels[channel]
+        edge = _edges.get(channel)
+        callbacks = list(_callbacks.get(channel, ()))
+
+    if old == new or edge is None:
+        return
+
+    if edge == BOTH or (edge == RISING and new == HIGH) or (edge == FALLING and new == LOW):
+        for callback in callbacks:
+            callback(channel)
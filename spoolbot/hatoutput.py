@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+
+# Batched output stage for the MotorHAT's PCA9685 PWM chip.
+# Version info found in constants file.
+
+# The Adafruit library sends every setSpeed and run call as a string of single register writes, four for each PCA9685
+# pin it touches. This module keeps a copy of every LED register, lets the motor controller stage the next state of
+# each motor, and then sends only the registers that changed using auto-increment block writes.
+#
+# all_off() is the emergency stop. It sets the full off bit of every pin at once through the ALL_LED_OFF_H broadcast
+# register. Full off wins over any other pin setting, so every motor driver input goes low and the motors coast, all
+# in a single one byte write.
+
+from . import constants
+
+# PCA9685 registers and bits
+MODE1 = 0x00
+MODE1_AI = 0x20  # Register auto-increment
+LED0_ON_L = 0x06
+ALL_LED_OFF_H = 0xFD
+FULL_BIT = 0x10  # Bit 4 of LEDn_ON_H and LEDn_OFF_H
+REGS_PER_PIN = 4
+PIN_COUNT = 16
+
+# Pin values used by Adafruit_MotorHAT.setPin()
+PIN_FULL_ON = 4096
+PIN_FULL_OFF = 4096
+
+
+def all_off(i2c_device):
+    """Turns every PCA9685 pin fully off with one write to the ALL_LED_OFF_H register."""
+
+    i2c_device.write8(ALL_LED_OFF_H, FULL_BIT)
+
+
+class BatchedOutput:
+    """Collects the next state of every MotorHAT channel and writes it to the PCA9685 in as few transactions as
+       possible."""
+
+    def __init__(self, i2c_device, max_block=constants.I2C_MAX_BLOCK):
+        """Sets up the output stage on an Adafruit_GPIO style I2C device and turns on register auto-increment."""
+
+        self._device = i2c_device
+        self.max_block = max_block
+
+        # Register values that are waiting to go out, and the values the chip is known to have. 'None' is unknown.
+        self._pending = [None] * (PIN_COUNT * REGS_PER_PIN)
+        self._written = [None] * (PIN_COUNT * REGS_PER_PIN)
+        # Set when something was staged or forgotten since the last flush. Without it, there's nothing to look for.
+        self._staged = False
+
+        self.transactions = 0
+        self.flushes = 0
+
+        mode1 = self._device.readU8(MODE1)
+        self._device.write8(MODE1, mode1 | MODE1_AI)
+        self.transactions += 2
+
+    def _stage_pin(self, pin, on, off):
+        """Stages the on and off counts for a single PCA9685 pin."""
+
+        offset = pin * REGS_PER_PIN
+        self._staged = True
+        pending = self._pending
+        pending[offset] = on & 0xFF
+        pending[offset + 1] = on >> 8
+        pending[offset + 2] = off & 0xFF
+        pending[offset + 3] = off >> 8
+
+    def set_speed(self, dc_motor, speed):
+        """Stages a new speed for an Adafruit_DCMotor. Mirrors Adafruit_DCMotor.setSpeed()."""
+
+        if speed < 0:
+            speed = 0
+        if speed > 255:
+            speed = 255
+
+        self._stage_pin(dc_motor.PWMpin, 0, speed * 16)
+
+    def set_pin(self, pin, value):
+        """Stages a pin as fully on or fully off. Mirrors Adafruit_MotorHAT.setPin()."""
+
+        if value:
+            self._stage_pin(pin, PIN_FULL_ON, 0)
+        else:
+            self._stage_pin(pin, 0, PIN_FULL_OFF)
+
+    def run(self, dc_motor, command):
+        """Stages a new direction for an Adafruit_DCMotor. Mirrors Adafruit_DCMotor.run()."""
+
+        if command == constants.FORWARD:
+            self.set_pin(dc_motor.IN2pin, 0)
+            self.set_pin(dc_motor.IN1pin, 1)
+        elif command == constants.BACKWARD:
+            self.set_pin(dc_motor.IN1pin, 0)
+            self.set_pin(dc_motor.IN2pin, 1)
+        elif command == constants.RELEASE:
+            self.set_pin(dc_motor.IN1pin, 0)
+            self.set_pin(dc_motor.IN2pin, 0)
+
+    def all_off(self):
+        """Turns every pin fully off right away, skipping anything staged. The staged registers are changed to match,
+           so the next flush doesn't turn anything back on that wasn't commanded again."""
+
+        all_off(self._device)
+        self.transactions += 1
+
+        pending = self._pending
+        written = self._written
+        for i in range(REGS_PER_PIN - 1, len(written), REGS_PER_PIN):
+            written[i] = FULL_BIT
+            if pending[i] is not None:
+                pending[i] = FULL_BIT
+
+    def invalidate(self):
+        """Forgets what the chip holds, so everything staged from now on is written out again."""
+
+        for i in range(len(self._written)):
+            self._written[i] = None
+        self._staged = True
+
+    def flush(self):
+        """Writes every staged register that differs from the chip. Returns the number of block writes used."""
+
+        self.flushes += 1
+        if not self._staged:
+            return 0
+        self._staged = False
+
+        pending = self._pending
+        written = self._written
+
+        # Find the first and last register that actually changed. Anything unchanged that sits between them is
+        # cheaper to resend than to split the write.
+        start = None
+        end = None
+        for i in range(len(pending)):
+            value = pending[i]
+            if value is not None and value != written[i]:
+                if start is None:
+                    start = i
+                end = i
+
+        if start is None:
+            return 0
+
+        # Registers in the gaps that were never staged have to be filled in from what the chip already holds. If
+        # that isn't known, the run gets split around them.
+        blocks = 0
+        block_start = start
+        for i in range(start, end + 2):
+            if i <= end and pending[i] is None and written[i] is not None:
+                pending[i] = written[i]
+
+            at_gap = i > end or pending[i] is None
+            if at_gap or i - block_start >= self.max_block:
+                if block_start < i:
+                    data = pending[block_start:i]
+                    self._device.writeList(LED0_ON_L + block_start, data)
+                    written[block_start:i] = data
+                    blocks += 1
+                block_start = i + 1 if at_gap else i
+
+        self.transactions += blocks
+        return blocks
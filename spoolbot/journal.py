@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+
+# Input journal: records the raw input events a remote reads, and plays them back as an input backend.
+# Version info found in constants file.
+
+# A journal is a text file with one JSON value per line. The first line describes the remote that was recorded, and
+# every line after it is one event: [seconds since recording started, kind, code, value]. The DS4 remote writes the
+# (kind, code, value) tuples its event source hands it, and the button remote writes a "pin" event, with the pin
+# number and its new level, for every change it reads.
+#
+# ReplaySource hands the events back out at the times they were recorded, by whatever clock it's given. With the real
+# clock, a session plays back in real time. With a clock.VirtualClock that the loop scheduler sleeps on, it plays back
+# as fast as the pipeline can run, and every run of the same journal makes the same motor commands at the same
+# virtual times.
+#
+# Run 'python3 -m spoolbot.journal FILE' to replay a journal against the emulated MotorHAT.
+
+from . import clock
+from . import constants
+from . import fakegpio
+from . import scheduler
+import argparse
+import json
+import sys
+from time import monotonic, perf_counter
+
+FORMAT = "spoolbot-journal"
+VERSION = 1
+
+
+class JournalWriter:
+    """Writes input events to a journal file as they come in."""
+
+    def __init__(self, path, header, clock=monotonic):
+        """Creates, or starts over, the journal at 'path'. 'header' is the remote's journal_header(). Event times are
+           written relative to when the journal was made, as read from 'clock'."""
+
+        self.path = path
+        self.events = 0
+        self._start = clock()
+
+        # Line buffered, so every event reaches the operating system as soon as it's written and survives a crash.
+        self._file = open(path, "w", buffering=1)
+        self._file.write(json.dumps(dict(header, format=FORMAT, version=VERSION)) + "\n")
+
+    def write(self, timestamp, kind, code, value):
+        """Adds one event. 'timestamp' comes from the same clock the journal was made with."""
+
+        if isinstance(value, tuple):
+            value = list(value)
+
+        self._file.write(json.dumps([timestamp - self._start, kind, code, value]) + "\n")
+        self.events += 1
+
+    def close(self):
+        """Closes the journal file."""
+
+        if self._file is None:
+            return
+
+        self._file.close()
+        self._file = None
+
+
+def load(path):
+    """Reads a journal. Returns its header dictionary and a list of (time, kind, code, value) events."""
+
+    with open(path) as file:
+        try:
+            header = json.loads(file.readline())
+        except ValueError:
+            header = None
+
+        if not isinstance(header, dict) or header.get("format") != FORMAT or header.get("version") != VERSION:
+            raise ValueError(path + " isn't a version " + str(VERSION) + " input journal")
+
+        events = []
+        for line in file:
+            try:
+                timestamp, kind, code, value = json.loads(line)
+            except ValueError:
+                # A line cut off when the recording process died ends the journal.
+                break
+
+            if isinstance(value, list):
+                value = tuple(value)
+            events.append((timestamp, kind, code, value))
+
+    return header, events
+
+
+class ReplaySource:
+    """Hands out journal events at the times they were recorded. Works as a DS4Controller event source, and feeds
+       ReplayGPIO for the button remote."""
+
+    def __init__(self, events, header=None, clock=monotonic):
+        """'events' and 'header' are what load() returns. Time starts on the first poll(), as read from 'clock'."""
+
+        header = header if header is not None else {}
+        self._events = events
+        self._clock = clock
+        self._next = 0
+        self._start = None
+
+        self.controller_present = header.get("controller", True)
+        self.button_count = header.get("buttons", 0)
+        self.hat_count = header.get("hats", 0)
+
+    def poll(self):
+        """Returns every event that has come due since the last poll as a list of (kind, code, value) tuples."""
+
+        now = self._clock()
+        if self._start is None:
+            self._start = now
+        elapsed = now - self._start
+
+        events = self._events
+        first = self._next
+        last = first
+        while last < len(events) and events[last][0] <= elapsed:
+            last += 1
+
+        self._next = last
+        return [event[1:] for event in events[first:last]]
+
+    def finished(self):
+        """Returns 'True' once every event has been handed out."""
+
+        return self._next >= len(self._events)
+
+    def alive(self):
+        """Returns 'True'. A recorded controller counts as connected until its "removed" event comes up."""
+
+        return True
+
+
+class ReplayGPIO:
+    """Stands in for RPi.GPIO with pin levels that follow the "pin" events of a ReplaySource. Pins can only be polled.
+       Pass it to RemoteControl as 'gpio'."""
+
+    BCM = fakegpio.BCM
+    BOARD = fakegpio.BOARD
+    IN = fakegpio.IN
+    OUT = fakegpio.OUT
+    PUD_OFF = fakegpio.PUD_OFF
+    PUD_DOWN = fakegpio.PUD_DOWN
+    PUD_UP = fakegpio.PUD_UP
+    BOTH = fakegpio.BOTH
+
+    def __init__(self, source):
+        self._source = source
+        self._levels = {}
+
+    def setmode(self, mode):
+        """Accepts any pin numbering scheme. The journal uses whichever one the recording did."""
+
+    def setup(self, channel, direction, pull_up_down=PUD_OFF, initial=None):
+        """Sets up a pin. Every pin starts low, like the button remote's pulled down inputs."""
+
+        self._levels[channel] = fakegpio.LOW
+
+    def input(self, channel):
+        """Applies any pin changes that have come due and returns the level of a pin."""
+
+        for kind, code, value in self._source.poll():
+            if kind == "pin":
+                self._levels[code] = value
+
+        return self._levels[channel]
+
+    def add_event_detect(self, channel, edge, callback=None, bouncetime=None):
+        raise RuntimeError("Replayed pins can only be polled")
+
+
+def replay(remote, motor_controller, source, loop_scheduler, replay_clock=monotonic):
+    """Runs the control loop on a remote reading from 'source' until the journal runs out, the last button change has
+       been debounced, and the motors have settled.
+       Each pass does what the remotes' own loops do without a motor writer. 'replay_clock' is the clock everything
+       else was given. Returns the number of passes run."""
+
+    if hasattr(remote, "start_scanning"):
+        remote.start_scanning()
+
+    ticks = 0
+    last_state = None
+    debouncer = remote.debouncer
+    while not source.finished() or debouncer.next_settle() is not None or motor_controller.is_ramping():
+        start = replay_clock()
+        remote.poll_events()
+
+        input_time = remote.take_input_time()
+        bits = remote.input_bits()
+        state = remote.input_state()
+
+        if state != last_state:
+            last_state = state
+            if input_time is not None:
+                motor_controller.begin_input(input_time)
+
+            spool_action, drive_vector = remote.decide(bits)
+            spool_action()
+            motor_controller.apply_vector(drive_vector)
+            motor_controller.end_input()
+            motor_controller.update()
+        elif motor_controller.is_ramping():
+            motor_controller.update()
+
+        if remote.recorder is not None:
+            remote.record_tick(start, bits)
+
+        ticks += 1
+        loop_scheduler.wait()
+
+    return ticks
+
+
+def make_remote(header, motor_controller, source, loop_scheduler, replay_clock, stick_drive=False):
+    """Builds the kind of remote a journal was recorded from, reading its input from 'source'."""
+
+    if header.get("source") == "gpio":
+        from . import robotinput
+        return robotinput.RemoteControl(motor_controller, loop_scheduler=loop_scheduler, gpio=ReplayGPIO(source),
+                                        clock=replay_clock, verbose=False)
+
+    from . import ds4input
+    return ds4input.DS4Controller(motor_controller, loop_scheduler=loop_scheduler, stick_drive=stick_drive,
+                                  event_source=source, clock=replay_clock)
+
+
+def parse_args(args=None):
+    """Reads the command line options."""
+
+    parser = argparse.ArgumentParser(prog="python3 -m spoolbot.journal",
+                                     description="Replays an input journal through the control pipeline.")
+    parser.add_argument("journal", help="journal file recorded with 'spoolbot --journal FILE'")
+    parser.add_argument("--realtime", action="store_true",
+                        help="play the journal back in real time instead of as fast as possible")
+    parser.add_argument("--hardware", action="store_true",
+                        help="drive the real MotorHAT instead of the emulated one")
+    parser.add_argument("--profile", choices=["stopping", "trapezoid", "s-curve"], default=constants.MOTION_PROFILE,
+                        help="how the drive motors speed up and slow down (default: %(default)s)")
+    parser.add_argument("--stick", action="store_true",
+                        help="drive proportionally with the left stick when no D-pad button is held")
+    parser.add_argument("--record", metavar="FILE", help="write a flight recording of the replay to FILE")
+    parser.add_argument("--phase-timing", action="store_true",
+                        help="time every loop phase and motor command, and print min/mean/p99 afterwards")
+
+    return parser.parse_args(args)
+
+
+def main(args=None):
+    """Replays a journal and prints how long it took."""
+
+    from .__main__ import SpoolBot
+
+    options = parse_args(args)
+    header, events = load(options.journal)
+
+    if options.realtime:
+        replay_clock = monotonic
+        loop_scheduler = scheduler.LoopScheduler()
+    else:
+        virtual = clock.VirtualClock()
+        replay_clock = virtual
+        loop_scheduler = scheduler.LoopScheduler(clock=virtual, sleep_func=virtual.sleep)
+
+    motor_hat = None
+    if not options.hardware:
+        from . import emulator
+        motor_hat = emulator.EmulatedMotorHAT(clock=replay_clock)
+
+    mc = SpoolBot.init_motor_controller(options.profile, motor_hat=motor_hat, clock=replay_clock)
+
+    phases = None
+    if options.phase_timing:
+        from . import profiler
+        phases = profiler.PhaseProfiler()
+        phases.attach(mc, "motors")
+
+    source = ReplaySource(events, header, clock=replay_clock)
+    remote = make_remote(header, mc, source, loop_scheduler, replay_clock, stick_drive=options.stick)
+    if phases is not None:
+        phases.attach(remote, "input")
+    if options.record is not None:
+        from . import recorder
+        remote.recorder = recorder.FlightRecorder(options.record)
+
+    started = perf_counter()
+    try:
+        ticks = replay(remote, mc, source, loop_scheduler, replay_clock)
+    finally:
+        mc.release_all()
+        if remote.recorder is not None:
+            remote.recorder.close()
+    elapsed = perf_counter() - started
+
+    covered = ticks * loop_scheduler.period
+    print(str(len(events)) + " events replayed in " + str(ticks) + " ticks")
+    print("Covers {:.1f} s, replayed in {:.3f} s ({:.0f}x real time)".format(
+        covered, elapsed, covered / elapsed if elapsed > 0 else 0.0))
+    stats = mc.get_write_stats()
+    print("MotorHAT writes: " + str(stats["issued"]) + " issued, " + str(stats["skipped"]) + " skipped")
+    if phases is not None:
+        print(phases.report())
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
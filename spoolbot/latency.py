@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+
+# Input to actuation latency tracking.
+# Version info found in constants file.
+
+# Input samples are stamped with time.monotonic() when they arrive. The stamp follows the sample through the decision
+# code into the motor controller, and the time from the stamp to the motor write going out is recorded in a histogram.
+# The histogram uses HDR-style log-linear buckets, so it stays small and fast while keeping a fixed relative precision
+# from microseconds up to seconds.
+
+from . import constants
+
+REPORT_PERCENTILES = [50.0, 75.0, 90.0, 95.0, 99.0, 99.9, 100.0]
+
+
+class LatencyHistogram:
+    """Log-linear histogram of durations. Values are kept in whole units of the histogram's resolution, which is a
+       microsecond unless it's changed."""
+
+    def __init__(self, sub_bucket_bits=constants.LATENCY_SUB_BUCKET_BITS, max_value=constants.LATENCY_MAX_VALUE,
+                 resolution=0.000001):
+        """Each power of two is split into 2 ** (sub_bucket_bits - 1) buckets. 'max_value' is in seconds, and longer
+           durations are counted as 'max_value'. 'resolution' is the smallest step in seconds that's told apart."""
+
+        self._sub_bits = sub_bucket_bits
+        self._sub_count = 1 << sub_bucket_bits
+        self._half_count = self._sub_count >> 1
+        self._per_second = 1.0 / resolution
+        self._max_units = int(max_value * self._per_second)
+        self.counts = [0] * (self._index(self._max_units) + 1)
+        self.reset()
+
+    def reset(self):
+        """Clears every recorded value."""
+
+        for i in range(len(self.counts)):
+            self.counts[i] = 0
+
+        self.total = 0
+        self.min = None
+        self.max = 0
+        self._sum = 0
+
+    def _index(self, value):
+        """Returns the bucket a value in units falls in."""
+
+        if value < self._sub_count:
+            return value
+
+        shift = value.bit_length() - self._sub_bits
+        return shift * self._half_count + (value >> shift)
+
+    def _highest_in_bucket(self, index):
+        """Returns the largest value in units that lands in a bucket."""
+
+        if index < self._sub_count:
+            return index
+
+        shift = (index - self._half_count) // self._half_count
+        sub = index - shift * self._half_count
+        return ((sub + 1) << shift) - 1
+
+    def record(self, seconds):
+        """Adds a duration to the histogram."""
+
+        value = int(seconds * self._per_second)
+        if value < 0:
+            value = 0
+        elif value > self._max_units:
+            value = self._max_units
+
+        self.counts[self._index(value)] += 1
+        self.total += 1
+        self._sum += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, percent):
+        """Returns the duration in seconds that 'percent' percent of the recorded values are at or below."""
+
+        if self.total == 0:
+            return 0.0
+
+        wanted = max(int(self.total * percent / 100.0 + 0.5), 1)
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= wanted:
+                return min(self._highest_in_bucket(index), self.max) / self._per_second
+
+        return self.max / self._per_second
+
+    def mean(self):
+        """Returns the average recorded duration in seconds."""
+
+        if self.total == 0:
+            return 0.0
+
+        return self._sum / self.total / self._per_second
+
+    def minimum(self):
+        """Returns the shortest recorded duration in seconds."""
+
+        if self.total == 0:
+            return 0.0
+
+        return self.min / self._per_second
+
+    def report(self, title="Latency"):
+        """Returns a printable summary of the histogram."""
+
+        lines = [title + " (" + str(self.total) + " samples)"]
+        if self.total == 0:
+            return "\n".join(lines)
+
+        for percent in REPORT_PERCENTILES:
+            label = "max" if percent == 100.0 else "p" + ("%g" % percent)
+            lines.append("  {:<7}{:>10.3f} ms".format(label, self.percentile(percent) * 1000))
+
+        lines.append("  {:<7}{:>10.3f} ms".format("mean", self.mean() * 1000))
+        lines.append("  {:<7}{:>10.3f} ms".format("min", self.minimum() * 1000))
+        return "\n".join(lines)
+
+
+class LatencyTracker:
+    """Matches input stamps to the motor writes they cause and records the time in between."""
+
+    def __init__(self):
+        self.histogram = LatencyHistogram()
+        self.unmatched = 0
+
+    def record(self, input_time, write_time):
+        """Records one input to actuation delay. Both times come from time.monotonic()."""
+
+        self.histogram.record(write_time - input_time)
+
+    def report(self):
+        """Returns a printable summary of the recorded latencies."""
+
+        return self.histogram.report("Input to motor write latency")
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+
+# Proportional differential drive from an analog stick.
+# Version info found in constants file.
+
+# The stick's two axes go through a deadzone and an expo curve, and are then mixed into a left and right wheel value
+# between -1 and 1. Those are spread over the drive motors, scaled to a speed and trimmed as numpy arrays, so the work
+# per frame is the same handful of array operations however many drive motors there are.
+
+from . import constants
+import numpy
+
+FORWARD = constants.FORWARD
+BACKWARD = constants.BACKWARD
+RELEASE = constants.RELEASE
+
+MAX_PWM = 255
+
+
+def shape_axes(values, deadzone=constants.STICK_DEADZONE, expo=constants.STICK_EXPO):
+    """Applies the deadzone and expo curve to an array of axis values between -1 and 1."""
+
+    magnitude = numpy.clip((numpy.abs(values) - deadzone) / (1.0 - deadzone), 0.0, 1.0)
+    magnitude = (1.0 - expo) * magnitude + expo * magnitude ** 3
+
+    return numpy.copysign(magnitude, values)
+
+
+class StickMixer:
+    """Turns stick positions into command vectors for MotorController.apply_vector()."""
+
+    def __init__(self, motor_controller, deadzone=constants.STICK_DEADZONE, expo=constants.STICK_EXPO,
+                 max_speed=None):
+        """Reads the drive motors and their trim from 'motor_controller'. Call rebuild() if they change. 'max_speed'
+           is the speed at full stick, and defaults to the controller's forward speed."""
+
+        self._motor_controller = motor_controller
+        self.deadzone = deadzone
+        self.expo = expo
+        self.max_speed = max_speed if max_speed is not None else motor_controller.fwd_speed
+        self.rebuild()
+
+    def rebuild(self):
+        """Reads the drive motors, their sides and their trim again."""
+
+        motors = []
+        for motor in self._motor_controller.drive_motors.values():
+            if motor is not None and (motor.side == "left" or motor.side == "right"):
+                motors.append(motor)
+
+        self._motors = tuple(motors)
+        # 0 picks the left wheel value and 1 picks the right one.
+        self._sides = numpy.array([0 if motor.side == "left" else 1 for motor in motors], dtype=numpy.intp)
+        self._trim = numpy.array([motor.trim for motor in motors], dtype=float)
+
+    def mix(self, x, y):
+        """Returns the command vector for a stick position, or 'None' if the stick is centered. 'x' is positive to
+           the right and 'y' is positive downward, like pygame reports them."""
+
+        turn, throttle = shape_axes(numpy.array([x, -y]), self.deadzone, self.expo)
+        if turn == 0.0 and throttle == 0.0:
+            return None
+
+        wheels = numpy.array([throttle + turn, throttle - turn])
+        # Keep the turn the same shape when a wheel would go past full speed.
+        wheels /= max(numpy.abs(wheels).max(), 1.0)
+
+        values = wheels[self._sides] * self.max_speed
+        speeds = numpy.where(values != 0.0, numpy.abs(values) + self._trim, 0.0)
+        speeds = numpy.clip(numpy.rint(speeds), 0, MAX_PWM).astype(int)
+        states = numpy.where(values > 0.0, FORWARD, BACKWARD)
+        states = numpy.where(speeds == 0, RELEASE, states)
+
+        return tuple(zip(self._motors, states.tolist(), speeds.tolist()))
@@ -3,9 +3,10 @@
 # Written by Brenden Davidson on Dec 3 2018.
 # Version info found in constants file.
 
-import constants
-from Adafruit_MotorHAT import Adafruit_MotorHAT
-from time import sleep
+from . import constants
+from . import hatoutput
+from time import monotonic, perf_counter
+import weakref
 
 VERSION = constants.VERSION
 
@@ -14,36 +15,288 @@ _FWD_SPEED = constants.FWD_SPEED
 _BWD_SPEED = constants.BWD_SPEED
 _SPOOL_SPEED = constants.SPOOL_SPEED
 _STOPPING_FACTOR = constants.STOPPING_FACTOR
+_STOPPING_INTERVAL = constants.STOPPING_INTERVAL
+_STOPPING_CUTOFF = constants.STOPPING_CUTOFF
 
 # Rename movement for easier use
 FORWARD = constants.FORWARD
 BACKWARD = constants.BACKWARD
 RELEASE = constants.RELEASE
 
+# Every MotorController that has been created, so the motors can all be turned off when the script stops.
+controllers = weakref.WeakSet()
+
 
 def print_info():
     print("\nRaspberry Pi MotorHAT controller module for use on ME2011 robot.")
     print("Version " + VERSION + "\t\tWritten by Brenden Davidson")
 
 
+def signed_speed(state, speed):
+    """Turns a direction and speed into one number. Forward is positive and backward is negative."""
+
+    if state == FORWARD:
+        return float(speed)
+    elif state == BACKWARD:
+        return -float(speed)
+
+    return 0.0
+
+
+class StoppingRamp:
+    """Deceleration profile that cuts a motor's speed by a fixed factor on every step.
+
+       New speeds in the same direction are used right away. Only a change of direction, or a stop, is ramped down."""
+
+    def __init__(self, factor=_STOPPING_FACTOR, interval=_STOPPING_INTERVAL, cutoff=_STOPPING_CUTOFF):
+        """'factor' is applied to the speed once every 'interval' seconds until it drops to 'cutoff' or below."""
+
+        self.factor = factor
+        self.interval = interval
+        self.cutoff = cutoff
+
+    def next_speed(self, speed):
+        """Returns the speed one step further down the ramp."""
+
+        speed = int(speed * self.factor)
+        if speed <= self.cutoff:
+            speed = 0
+
+        return speed
+
+    def is_ramping(self, motor):
+        """Returns 'True' if the motor is still slowing down before it can change direction."""
+
+        return motor.state != motor.target_state
+
+    def update(self, motor, now):
+        """Moves a motor one step towards its target. Returns 'True' if the speed or direction changed."""
+
+        if motor.state == motor.target_state or motor.state == RELEASE:
+            # Nothing needs to slow down first, so the target can be used right away. This is also how a new
+            # command cuts a ramp short.
+            motor._ramping = False
+            if motor.state == motor.target_state and motor.speed == motor.target_speed:
+                return False
+
+            motor.state = motor.target_state
+            motor.speed = motor.target_speed
+            return True
+
+        # The direction is changing, so the motor has to slow down first.
+        if motor._ramping and now < motor._next_step:
+            return False
+
+        motor._ramping = True
+        motor._next_step = now + self.interval
+        motor.speed = self.next_speed(motor.speed)
+
+        if motor.speed == 0:
+            # Fully slowed down. Switch over to the new direction.
+            motor._ramping = False
+            motor.state = motor.target_state
+            motor.speed = motor.target_speed
+
+        return True
+
+
+class AccelerationProfile:
+    """Motion profile that moves a motor's speed towards its target at a limited acceleration, a little on every tick.
+
+       Speed runs from full backward to full forward as one signed number, so a change of direction passes straight
+       through zero instead of stopping first. Without a jerk limit, the speed follows a trapezoid. With one, the
+       acceleration itself builds up and tapers off gradually, which rounds the corners into an S-curve."""
+
+    def __init__(self, accel=constants.DRIVE_ACCEL, jerk=None, interval=1.0 / constants.LOOP_RATE):
+        """'accel' is the most the speed may change per second, and 'jerk' is the most the acceleration may change per
+           second. 'interval' is the expected time between ticks. A tick after a longer gap, such as the first one
+           after sitting still, moves the motor as if only 'interval' had passed."""
+
+        self.accel = float(accel)
+        self.jerk = float(jerk) if jerk is not None else None
+        self.interval = interval
+
+    def is_ramping(self, motor):
+        """Returns 'True' if the motor hasn't settled at its target yet."""
+
+        return motor.velocity != signed_speed(motor.target_state, motor.target_speed) or motor.accel != 0.0
+
+    def update(self, motor, now):
+        """Moves a motor one tick towards its target. Returns 'True' if the speed or direction changed."""
+
+        target = signed_speed(motor.target_state, motor.target_speed)
+        last_step = motor._last_step
+        motor._last_step = now
+
+        if motor.velocity == target and motor.accel == 0.0:
+            return self._set_velocity(motor, target)
+
+        dt = now - last_step
+        if dt > self.interval or dt < 0.0:
+            dt = self.interval
+
+        if self.jerk is None:
+            velocity, accel = self._trapezoid_step(motor.velocity, target, dt)
+        else:
+            velocity, accel = self._s_curve_step(motor.velocity, motor.accel, target, dt)
+
+        motor.velocity = velocity
+        motor.accel = accel
+        return self._set_velocity(motor, velocity)
+
+    def _trapezoid_step(self, velocity, target, dt):
+        """Returns the next (velocity, acceleration) at a constant acceleration limit."""
+
+        error = target - velocity
+        max_change = self.accel * dt
+
+        if abs(error) <= max_change:
+            return target, 0.0
+
+        if error > 0:
+            return velocity + max_change, self.accel
+
+        return velocity - max_change, -self.accel
+
+    def _s_curve_step(self, velocity, accel, target, dt):
+        """Returns the next (velocity, acceleration) with both the acceleration and jerk limited."""
+
+        error = target - velocity
+        if abs(error) < 0.5 and abs(accel) <= self.jerk * dt:
+            # Close enough that the next write would be the same anyway.
+            return target, 0.0
+
+        direction = 1.0 if error > 0 else -1.0
+        change = self.jerk * dt
+
+        # How much more the speed changes if the acceleration starts tapering off right now.
+        taper = accel * accel / (2.0 * self.jerk)
+
+        if accel * direction > 0 and abs(error) <= taper:
+            # Time to ease off, so the speed lands on the target as the acceleration reaches zero.
+            if abs(accel) <= change:
+                accel = 0.0
+            else:
+                accel -= direction * change
+        else:
+            accel += direction * change
+            if accel > self.accel:
+                accel = self.accel
+            elif accel < -self.accel:
+                accel = -self.accel
+
+        velocity += accel * dt
+        if (target - velocity) * direction <= 0:
+            # Went past the target.
+            return target, 0.0
+
+        return velocity, accel
+
+    @staticmethod
+    def _set_velocity(motor, velocity):
+        """Sets a motor's direction and whole number speed from a signed speed. Returns 'True' if either changed."""
+
+        if velocity == signed_speed(motor.target_state, motor.target_speed):
+            state = motor.target_state
+            speed = motor.target_speed
+        else:
+            speed = int(round(abs(velocity)))
+            if speed == 0:
+                state = RELEASE
+            elif velocity > 0:
+                state = FORWARD
+            else:
+                state = BACKWARD
+
+        if state == motor.state and speed == motor.speed:
+            return False
+
+        motor.state = state
+        motor.speed = speed
+        return True
+
+
+def make_profile(name):
+    """Returns a motion profile by name. 'stopping' only ramps down before a change of direction, 'trapezoid' limits
+       acceleration, and 's-curve' limits acceleration and jerk."""
+
+    if name == "stopping":
+        return StoppingRamp()
+    elif name == "trapezoid":
+        return AccelerationProfile()
+    elif name == "s-curve":
+        return AccelerationProfile(jerk=constants.DRIVE_JERK)
+
+    raise ValueError("Unknown motion profile: " + str(name))
+
+
 class Motor:
     """Keeps track of info for individual motors to be used with the MotorHAT"""
 
-    def __init__(self, motor_hat, name="motor", style="generic", index=1):
-        """Creates a Motor object. 'name' is a string id, and 'index' is what header the motor is connected to."""
+    # Fixed attributes keep motors small and their attribute lookups quick, since every tick reads them.
+    __slots__ = ("name", "style", "index", "motor", "state", "speed", "target_state", "target_speed", "ramp",
+                 "velocity", "accel", "_last_step", "_ramping", "_next_step")
+
+    def __init__(self, motor_hat, name="motor", style="generic", index=1, ramp=None):
+        """Creates a Motor object. 'name' is a string id, and 'index' is what header the motor is connected to.
+           'ramp' is the motion profile that takes the motor to its targets. It defaults to a StoppingRamp."""
 
         self.name = name
         self.style = style
         self.index = index
         self.motor = motor_hat.getMotor(index)
         self.state = RELEASE
+        self.speed = 0
+
+        # Where the motor is headed. update() moves 'state' and 'speed' towards these one step at a time.
+        self.target_state = RELEASE
+        self.target_speed = 0
+        self.ramp = ramp if ramp is not None else StoppingRamp()
+
+        # Motion state kept for the profile. 'velocity' is the signed speed and 'accel' its rate of change, per second.
+        self.velocity = 0.0
+        self.accel = 0.0
+        self._last_step = 0.0
+        self._ramping = False
+        self._next_step = 0.0
+
+    def set_target(self, state, speed):
+        """Sets the direction and speed the motor should end up at. Nothing is sent to the motor until update()."""
+
+        if state == RELEASE:
+            speed = 0
+
+        self.target_state = state
+        self.target_speed = speed
+
+    def force(self, state, speed):
+        """Jumps straight to a direction and speed, skipping the ramp entirely."""
+
+        self.set_target(state, speed)
+        self.state = self.target_state
+        self.speed = self.target_speed
+        self.velocity = signed_speed(self.state, self.speed)
+        self.accel = 0.0
+        self._ramping = False
+
+    def is_ramping(self):
+        """Returns 'True' if the motor is still working its way towards its target."""
+
+        return self.ramp.is_ramping(self)
+
+    def update(self, now):
+        """Moves the motor one step towards its target. Returns 'True' if the speed or direction changed."""
+
+        return self.ramp.update(self, now)
 
 
 class DriveMotor(Motor):
     """Creates a DriveMotor object for use with the MotorHAT"""
 
-    def __init__(self, motor_hat, side="left", name="drive_motor", index=1, trim=0):
-        super().__init__(motor_hat, name=name, style="drive", index=index)
+    __slots__ = ("side", "trim")
+
+    def __init__(self, motor_hat, side="left", name="drive_motor", index=1, trim=0, ramp=None):
+        super().__init__(motor_hat, name=name, style="drive", index=index, ramp=ramp)
         self.side = side
         self.trim = trim
 
@@ -51,6 +304,8 @@ class DriveMotor(Motor):
 class SpoolMotor(Motor):
     """Creates a SpoolMotor object for use with the MotorHAT"""
 
+    __slots__ = ()
+
     def __init__(self, motor_hat, name="spool_motor", index=3):
         super().__init__(motor_hat, name=name, style="spool", index=index)
 
@@ -58,23 +313,76 @@ class SpoolMotor(Motor):
 class MotorController:
     """Manages all motors connected to the MotorHAT and provides methods for interacting with them"""
 
-    def __init__(self, hat_addr=constants.HAT_ADDRESS, fwd_speed=_FWD_SPEED, bwd_speed=_BWD_SPEED, spool_speed=_SPOOL_SPEED):
+    # Commands a profiler.PhaseProfiler can time. _apply() and _flush() are where the I2C writes happen.
+    PROFILED_PHASES = ("drive_forward", "drive_backward", "drive_stop", "drive_pivot_right", "drive_pivot_left",
+                       "drive_turn_left", "drive_turn_right", "apply_vector", "spool_stop", "spool_clockwise",
+                       "spool_counterclockwise", "stop_all", "release_all", "emergency_stop", "update", "_apply",
+                       "_flush")
+
+    def __init__(self, hat_addr=constants.HAT_ADDRESS, fwd_speed=_FWD_SPEED, bwd_speed=_BWD_SPEED, spool_speed=_SPOOL_SPEED,
+                 batch_writes=True, i2c=None, verbose=True, motor_hat=None, motion_profile="stopping",
+                 clock=monotonic):
+        """Sets up the MotorHAT. With 'batch_writes' on, motor changes are collected and sent to the PWM chip together
+           when each command finishes. 'i2c' is passed on to Adafruit_MotorHAT to use a different I2C provider.
+           Turning 'verbose' off silences the per-command messages, for when something else is showing motor state.
+           'motor_hat' is an already built Adafruit_MotorHAT, such as emulator.EmulatedMotorHAT, to use instead.
+           'motion_profile' is how the drive motors get to new speeds: a profile name for make_profile(), or a
+           profile object. 'clock' stands in for time.monotonic(), so ramps can be stepped on a virtual clock."""
+
         print_info()
-        self._motor_hat = Adafruit_MotorHAT(addr=hat_addr)
+        self.verbose = verbose
+        self._clock = clock
+        if motor_hat is None:
+            # The Adafruit library is only loaded once real hardware is needed.
+            from Adafruit_MotorHAT import Adafruit_MotorHAT
+            motor_hat = Adafruit_MotorHAT(addr=hat_addr, i2c=i2c)
+        self._motor_hat = motor_hat
+        self._output = None
+        if batch_writes:
+            self._output = hatoutput.BatchedOutput(self._motor_hat._pwm.i2c)
         self.fwd_speed = fwd_speed
         self.bwd_speed = bwd_speed
         self.spool_speed = spool_speed
+        self.motion_profile = make_profile(motion_profile) if isinstance(motion_profile, str) else motion_profile
         self.motors = {1: None, 2: None, 3: None, 4: None}
         self.drive_motors = {1: None, 2: None, 3: None, 4: None}
         self.spool_motors = {1: None, 2: None, 3: None, 4: None}
         # This will be a dictionary containing all of the motor objects and their indexes
 
+        # The motors each command works on, as tuples in channel order. They're worked out again whenever a motor is
+        # added, so commands never have to search the dictionaries above.
+        self._live_motors = ()
+        self._drive_group = ()
+        self._left_group = ()
+        self._right_group = ()
+        self._sided_group = ()
+        self._spool_group = ()
+
+        # Shadow copies of the last speed and direction sent to each channel. 'None' means unknown, so the next
+        # command for that channel always goes out.
+        self._speed_cache = {1: None, 2: None, 3: None, 4: None}
+        self._state_cache = {1: None, 2: None, 3: None, 4: None}
+        self.writes_issued = 0
+        self.writes_skipped = 0
+        # How many emergency stops there have been, and the longest one took, in seconds
+        self.estops = 0
+        self.estop_worst = 0.0
+
+        # Latency tracking. 'latency' is a latency.LatencyTracker when it's turned on.
+        self.latency = None
+        self._input_time = None
+        self._wrote = False
+
+        controllers.add(self)
+
     def add_drive_motor(self, name="drive_motor", side="left", index=1, trim=0):
         """Creates a DriveMotor object and adds it to the motor controller."""
 
-        drive_motor = DriveMotor(motor_hat=self._motor_hat, side=side, name=name, index=index, trim=trim)
+        drive_motor = DriveMotor(motor_hat=self._motor_hat, side=side, name=name, index=index, trim=trim,
+                                 ramp=self.motion_profile)
         self.motors[index] = drive_motor
         self.drive_motors[index] = drive_motor
+        self._build_groups()
 
     def add_spool_motor(self, name="spool_motor", index=3):
         """Creates a DriveMotor object and adds it to the motor controller."""
@@ -82,159 +390,268 @@ class MotorController:
         spool_motor = SpoolMotor(motor_hat=self._motor_hat, name=name, index=index)
         self.motors[index] = spool_motor
         self.spool_motors[index] = spool_motor
+        self._build_groups()
+
+    def _build_groups(self):
+        """Sorts the added motors into the groups the commands use."""
+
+        self._live_motors = tuple(motor for motor in self.motors.values() if motor is not None)
+        self._drive_group = tuple(motor for motor in self.drive_motors.values() if motor is not None)
+        self._left_group = tuple(motor for motor in self._drive_group if motor.side == "left")
+        self._right_group = tuple(motor for motor in self._drive_group if motor.side == "right")
+        self._sided_group = tuple(motor for motor in self._drive_group if motor.side == "left" or motor.side == "right")
+        self._spool_group = tuple(motor for motor in self.spool_motors.values() if motor is not None)
+
+        for motor in self._drive_group:
+            if motor.side != "left" and motor.side != "right":
+                print(motor.name + " was not set as 'left' or 'right'. Omitting...")
+
+    def _apply(self, motor):
+        """Sends a motor's current speed and direction to the MotorHAT, skipping anything the channel already has."""
+
+        index = motor.index
+        output = self._output
+
+        if self._speed_cache[index] != motor.speed:
+            if output is not None:
+                output.set_speed(motor.motor, motor.speed)
+            else:
+                motor.motor.setSpeed(motor.speed)
+            self._speed_cache[index] = motor.speed
+            self.writes_issued += 1
+            self._wrote = True
+        else:
+            self.writes_skipped += 1
+
+        if self._state_cache[index] != motor.state:
+            if output is not None:
+                output.run(motor.motor, motor.state)
+            else:
+                motor.motor.run(motor.state)
+            self._state_cache[index] = motor.state
+            self.writes_issued += 1
+            self._wrote = True
+        else:
+            self.writes_skipped += 1
+
+    def _flush(self):
+        """Sends everything staged by _apply() to the MotorHAT in one burst."""
+
+        if self._output is not None:
+            self._output.flush()
+
+        if self._wrote:
+            self._wrote = False
+            if self._input_time is not None:
+                # This is the first write since the input came in.
+                if self.latency is not None:
+                    self.latency.record(self._input_time, self._clock())
+                self._input_time = None
+
+    def begin_input(self, input_time):
+        """Tags the commands that follow with the time.monotonic() stamp of the input sample that caused them. The
+           first write to the MotorHAT after this is counted as that input's actuation."""
+
+        self._input_time = input_time
+
+    def end_input(self):
+        """Stops tagging commands. An input that didn't change any motor is counted as unmatched."""
+
+        if self._input_time is not None and self.latency is not None:
+            self.latency.unmatched += 1
+
+        self._input_time = None
+
+    def invalidate_cache(self):
+        """Forgets what was last sent to each channel so the next command for every motor is written out in full."""
+
+        for index in self._speed_cache:
+            self._speed_cache[index] = None
+            self._state_cache[index] = None
+
+        if self._output is not None:
+            self._output.invalidate()
+
+    def get_write_stats(self):
+        """Returns how many speed/direction writes were sent to the MotorHAT and how many were skipped."""
+
+        return {"issued": self.writes_issued, "skipped": self.writes_skipped}
+
+    def _command(self, motor, state, speed, now):
+        """Gives a motor a new target and applies whatever part of it can be applied right now."""
+
+        motor.set_target(state, speed)
+        if motor.update(now):
+            self._apply(motor)
+        else:
+            # Nothing changed, so neither the speed nor the direction needs to be sent again.
+            self.writes_skipped += 2
+
+    def update(self, now=None):
+        """Moves every motor one step along its ramp. This should be called once on every pass of the control loop."""
+
+        if now is None:
+            now = self._clock()
+
+        for motor in self._live_motors:
+            if motor.update(now):
+                self._apply(motor)
+                if self.verbose:
+                    print(motor.name + " is at speed: " + str(motor.speed))
+
+        self._flush()
+
+    def snapshot(self):
+        """Returns a (name, state, speed) tuple for every motor, in channel order."""
+
+        return [(motor.name, motor.state, motor.speed) for motor in self.motors.values() if motor is not None]
+
+    def is_ramping(self):
+        """Returns 'True' if any motor is still working its way towards its target."""
+
+        for motor in self._live_motors:
+            if motor.is_ramping():
+                return True
+
+        return False
 
     def stop_all(self):
         """Stops all motors at the same time. Useful for testing."""
-        # Get list of usable motors
-        live_motors = []
-        for drive_motor in self.drive_motors.values():
-            if drive_motor is not None:
-                live_motors.append(drive_motor)
 
-        for motor in live_motors:
-            motor.state = RELEASE
-            motor.motor.run(RELEASE)
+        for motor in self._drive_group:
+            motor.force(RELEASE, 0)
+            self._apply(motor)
+
+        self._flush()
+
+    def release_all(self):
+        """Releases all four MotorHAT channels, whether a motor was added to them or not. Used when shutting down."""
+
+        for index in self.motors:
+            motor = self.motors[index]
+            if motor is not None:
+                motor.force(RELEASE, 0)
+
+            self._motor_hat.getMotor(index).run(RELEASE)
+            self._state_cache[index] = RELEASE
+
+        if self._output is not None:
+            # The release went around the batched output, so it no longer knows what the direction pins hold.
+            self._output.invalidate()
+
+    def emergency_stop(self):
+        """Cuts every MotorHAT channel, spool included, with a single I2C write. It takes no locks and doesn't wait
+           for the motor writer, so it can be called from signal handlers, atexit or a watchdog. Returns how many
+           seconds passed from the call until the write was done."""
+
+        start = perf_counter()
+        if self._output is not None:
+            self._output.all_off()
+        else:
+            hatoutput.all_off(self._motor_hat._pwm.i2c)
+        elapsed = perf_counter() - start
+
+        # Every channel is now released with its PWM off, so the motors and the caches have to agree. Otherwise a
+        # ramp or a skipped write could carry on where it left off.
+        for motor in self._live_motors:
+            motor.force(RELEASE, 0)
+        for index in self._state_cache:
+            self._state_cache[index] = RELEASE
+            self._speed_cache[index] = 0
+
+        self.estops += 1
+        if elapsed > self.estop_worst:
+            self.estop_worst = elapsed
+
+        return elapsed
 
     # BEGIN DRIVE MOTOR FUNCTIONS #
 
     def drive_forward(self):
         """Uses all drive motors to move forward."""
 
-        # Get list of usable motors
-        live_motors = []
-        for drive_motor in self.drive_motors.values():
-            if drive_motor is not None:
-                live_motors.append(drive_motor)
+        now = self._clock()
 
         # Set all correct attributes of all usable motors
-        for motor in live_motors:
+        for motor in self._drive_group:
             trim = motor.trim
-            motor.state = FORWARD
-            motor.motor.setSpeed(self.fwd_speed + trim)
-            motor.motor.run(motor.state)
-            print(motor.name + " is moving forward.")
+            self._command(motor, FORWARD, self.fwd_speed + trim, now)
+            if self.verbose:
+                print(motor.name + " is moving forward.")
+
+        self._flush()
 
     def drive_backward(self):
         """Uses all drive motors to move backward."""
 
-        # Get list of usable motors
-        live_motors = []
-        for drive_motor in self.drive_motors.values():
-            if drive_motor is not None:
-                live_motors.append(drive_motor)
+        now = self._clock()
 
         # Set all correct attributes of all usable motors
-        for motor in live_motors:
+        for motor in self._drive_group:
             trim = motor.trim
-            motor.state = BACKWARD
-            motor.motor.setSpeed(self.bwd_speed + trim)
-            motor.motor.run(motor.state)
-            print(motor.name + " is moving backward.")
+            self._command(motor, BACKWARD, self.bwd_speed + trim, now)
+            if self.verbose:
+                print(motor.name + " is moving backward.")
 
-    def drive_stop(self):
-        """Stops all drive motors gracefully, and returns a list of live motors."""
+        self._flush()
 
-        # Get list of usable motors
-        live_motors = []
-        for drive_motor in self.drive_motors.values():
-            if drive_motor is not None:
-                live_motors.append(drive_motor)
+    def drive_stop(self):
+        """Starts slowing all drive motors down to a stop, and returns a tuple of live motors. This doesn't wait for
+           the motors to stop. update() takes them the rest of the way."""
 
-        # Set all correct attributes of all usable motors
-        motor = live_motors[0]
-        current_speed = 100
-        if motor.state == FORWARD:
-            print("Current direction of " + motor.name + " is FORWARD")
-            # Slow down from forward direction
-            current_speed = self.fwd_speed
-        elif motor.state == BACKWARD:
-            print("Current direction of " + motor.name + " is BACKWARD")
-            # Slow down from backward direction
-            current_speed = self.bwd_speed
-        elif motor.state == RELEASE:
-            print("Current direction of " + motor.name + " is RELEASE")
-            current_speed = 0
-
-        while current_speed > 2:
-            for motor in live_motors:
-                trim = motor.trim
-                motor.motor.setSpeed(current_speed)
-                print(motor.name + " is at speed: " + str(current_speed))
-            current_speed = int(current_speed * _STOPPING_FACTOR)
-            if current_speed <= 2:
-                current_speed = 0
-            sleep(0.25)
+        now = self._clock()
 
+        live_motors = self._drive_group
         for motor in live_motors:
-            motor.motor.run(RELEASE)
+            self._command(motor, RELEASE, 0, now)
+
+        self._flush()
 
         return live_motors
 
     def drive_pivot_right(self):
-        """Pivots the robot left from a stopped position."""
-
-        # Stop the robot first.
-        live_motors = self.drive_stop()
-
-        # Get lists of all motors for each direction
-        right_motors = []
-        left_motors = []
+        """Pivots the robot right from a stopped position. Motors that have to change direction slow down first."""
 
-        for motor in live_motors:
-            if motor.side == "left":
-                left_motors.append(motor)
-            elif motor.side == "right":
-                right_motors.append(motor)
-            else:
-                print(motor.name + " was not set as 'left' or 'right'. Omitting...")
+        now = self._clock()
+        right_motors = self._right_group
+        left_motors = self._left_group
 
-        # Run the right motors forward and the left motors backward to pivot left
+        # Run the left motors forward and the right motors backward to pivot right
         for motor in left_motors:
             trim = motor.trim
-            motor.state = BACKWARD
-            motor.motor.setSpeed(self.bwd_speed + trim)
-            motor.motor.run(motor.state)
-            print(motor.name + " is moving backward.")
+            self._command(motor, FORWARD, self.bwd_speed + trim, now)
+            if self.verbose:
+                print(motor.name + " is moving forward.")
 
         for motor in right_motors:
             trim = motor.trim
-            motor.state = FORWARD
-            motor.motor.setSpeed(self.bwd_speed + trim)
-            motor.motor.run(motor.state)
-            print(motor.name + " is moving forward.")
+            self._command(motor, BACKWARD, self.bwd_speed + trim, now)
+            if self.verbose:
+                print(motor.name + " is moving backward.")
 
-    def drive_pivot_left(self):
-        """Pivots the robot right from a stopped position."""
+        self._flush()
 
-        # Stop the robot first.
-        live_motors = self.drive_stop()
+    def drive_pivot_left(self):
+        """Pivots the robot left from a stopped position. Motors that have to change direction slow down first."""
 
-        # Get lists of all motors for each direction
-        right_motors = []
-        left_motors = []
-
-        for motor in live_motors:
-            if motor.side == "left":
-                left_motors.append(motor)
-            elif motor.side == "right":
-                right_motors.append(motor)
-            else:
-                print(motor.name + " was not set as 'left' or 'right'. Omitting...")
+        now = self._clock()
+        right_motors = self._right_group
+        left_motors = self._left_group
 
         # Run the right motors forward and the left motors backward to pivot left
         for motor in right_motors:
             trim = motor.trim
-            motor.state = BACKWARD
-            motor.motor.setSpeed(self.bwd_speed + trim)
-            motor.motor.run(motor.state)
-            print(motor.name + " is moving backward.")
+            self._command(motor, FORWARD, self.bwd_speed + trim, now)
+            if self.verbose:
+                print(motor.name + " is moving forward.")
 
         for motor in left_motors:
             trim = motor.trim
-            motor.state = FORWARD
-            motor.motor.setSpeed(self.bwd_speed + trim)
-            motor.motor.run(motor.state)
-            print(motor.name + " is moving forward.")
+            self._command(motor, BACKWARD, self.bwd_speed + trim, now)
+            if self.verbose:
+                print(motor.name + " is moving backward.")
+
+        self._flush()
 
     def check_same_direction(self, directions):
         """Returns 'True' if all of the directions are the same. 'False' otherwise."""
@@ -247,83 +664,83 @@ class MotorController:
 
         return True
 
-    def drive_turn_left(self):
-        """Turns right while the robot is in motion"""
+    def _sides_agree(self):
+        """Returns 'True' if every left and right drive motor is going the same direction. Works like
+           check_same_direction() without building a list of directions."""
 
-        # Get lists of all motors for each direction
-        right_motors = []
-        left_motors = []
-        motor_directions = []
+        state = None
+        for motor in self._sided_group:
+            if state is None:
+                state = motor.state
+            elif motor.state != state:
+                return False
 
-        for motor in self.drive_motors.values():
-            if motor is not None:
-                if motor.side == "left":
-                    left_motors.append(motor)
-                    motor_directions.append(motor.state)
-                elif motor.side == "right":
-                    right_motors.append(motor)
-                    motor_directions.append(motor.state)
-                else:
-                    print(motor.name + " was not set as 'left' or 'right'. Omitting...")
+        return True
+
+    def drive_turn_left(self):
+        """Turns left while the robot is in motion"""
+
+        now = self._clock()
+        right_motors = self._right_group
+        left_motors = self._left_group
 
         # Double check that all motors are moving in the same direction.
-        all_same = self.check_same_direction(motor_directions)
+        all_same = self._sides_agree()
 
         # Skip the rest of the function if the robot is pivoting.
         if not all_same:
-            print("Robot is currently pivoting. Can't do a drive turn right now.")
+            if self.verbose:
+                print("Robot is currently pivoting. Can't do a drive turn right now.")
             return
 
         # Set appropriate speeds for the motors to allow a turn
         for motor in right_motors:
             trim = motor.trim
-            motor.motor.setSpeed(self.fwd_speed + trim)
-            motor.motor.run(motor.state)
+            self._command(motor, motor.state, self.fwd_speed + trim, now)
 
         for motor in left_motors:
             trim = motor.trim
-            motor.motor.setSpeed(self.bwd_speed + trim)
-            motor.motor.run(motor.state)
+            self._command(motor, motor.state, self.bwd_speed + trim, now)
+
+        self._flush()
 
     def drive_turn_right(self):
         """Turns right while the robot is in motion"""
 
-        # TODO: Figure out why this is turning left
-
-        # Get lists of all motors for each direction
-        right_motors = []
-        left_motors = []
-        motor_directions = []
-
-        for motor in self.drive_motors.values():
-            if motor is not None:
-                if motor.side == "left":
-                    left_motors.append(motor)
-                    motor_directions.append(motor.state)
-                elif motor.side == "right":
-                    right_motors.append(motor)
-                    motor_directions.append(motor.state)
-                else:
-                    print(motor.name + " was not set as 'left' or 'right'. Omitting...")
+        now = self._clock()
+        right_motors = self._right_group
+        left_motors = self._left_group
 
         # Double check that all motors are moving in the same direction.
-        all_same = self.check_same_direction(motor_directions)
+        all_same = self._sides_agree()
 
         # Skip the rest of the function if the robot is pivoting.
         if not all_same:
-            print("Robot is currently pivoting. Can't do a drive turn right now.")
+            if self.verbose:
+                print("Robot is currently pivoting. Can't do a drive turn right now.")
             return
 
         # Set appropriate speeds for the motors to allow a turn
-        for motor in right_motors:
+        for motor in left_motors:
             trim = motor.trim
-            motor.motor.setSpeed(self.fwd_speed + trim)
-            motor.motor.run(motor.state)
+            self._command(motor, motor.state, self.fwd_speed + trim, now)
 
-        for motor in left_motors:
+        for motor in right_motors:
             trim = motor.trim
-            motor.motor.setSpeed(self.bwd_speed + trim)
-            motor.motor.run(motor.state)
+            self._command(motor, motor.state, self.bwd_speed + trim, now)
+
+        self._flush()
+
+    def apply_vector(self, vector):
+        """Applies a command vector of (motor, state, speed) tuples, like the ones from dispatch.DispatchTable. Motors
+           that have to stop or change direction ramp down first."""
+
+        now = self._clock()
+
+        for motor, state, speed in vector:
+            self._command(motor, state, speed, now)
+
+        self._flush()
 
     # END DRIVE MOTOR FUNCTIONS #
 
@@ -331,38 +748,35 @@ class MotorController:
 
     def spool_stop(self):
         """Immediately stops the spool motor. It doesn't move very fast, so immediate stopping isn't a problem.
-           Also returns the list of spool motors."""
-
-        spool_motors = []
-
-        for motor in self.spool_motors.values():
-            if motor is not None:
-                spool_motors.append(motor)
+           Also returns the tuple of spool motors."""
 
+        spool_motors = self._spool_group
         for motor in spool_motors:
-            motor.state = RELEASE
-            motor.motor.run(RELEASE)
+            motor.force(RELEASE, 0)
+            self._apply(motor)
+
+        self._flush()
 
         return spool_motors
 
     def spool_clockwise(self):
         """Runs the spool motor clockwise"""
 
-        spool_motors = self.spool_stop()
+        # The MotorHAT drops both direction pins before setting the new one, so there's no need to stop first.
+        for motor in self._spool_group:
+            motor.force(FORWARD, self.spool_speed)
+            self._apply(motor)
 
-        for motor in spool_motors:
-            motor.state = FORWARD
-            motor.motor.setSpeed(self.spool_speed)
-            motor.motor.run(FORWARD)
+        self._flush()
 
     def spool_counterclockwise(self):
         """Runs the spool motor clockwise"""
 
-        spool_motors = self.spool_stop()
+        # The MotorHAT drops both direction pins before setting the new one, so there's no need to stop first.
+        for motor in self._spool_group:
+            motor.force(BACKWARD, self.spool_speed)
+            self._apply(motor)
 
-        for motor in spool_motors:
-            motor.state = BACKWARD
-            motor.motor.setSpeed(self.spool_speed)
-            motor.motor.run(BACKWARD)
+        self._flush()
 
     # END SPOOL MOTOR FUNCTIONS #
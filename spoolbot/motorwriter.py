@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+
+# Dedicated thread for sending motor commands.
+# Version info found in constants file.
+
+# I2C writes block until the bus is done with them. The writer thread owns the motor controller, so the input side
+# only drops its newest command into a one slot mailbox and goes straight back to sampling. Every command holds the
+# whole wanted state, so when several arrive before the writer gets to them, only the newest one needs to be applied.
+
+from . import constants
+from . import latency
+import threading
+from time import monotonic
+
+
+class MotorWriter:
+    """Thread that owns a MotorController and applies the newest command sent to it."""
+
+    def __init__(self, motor_controller, period=1.0 / constants.LOOP_RATE):
+        """'period' is how often ramps are stepped while no new commands come in."""
+
+        self._motor_controller = motor_controller
+        self.period = period
+        self._mailbox = threading.Condition()
+        self._pending = None
+        self._busy = False
+        self._running = False
+        self._thread = None
+
+        # Counters. 'depth' is how many commands have been sent since the writer last took one.
+        self.submitted = 0
+        self.applied = 0
+        self.coalesced = 0
+        self.depth = 0
+        self.max_depth = 0
+
+        # time.monotonic() stamp of when the command being applied was started, or 'None' when idle. A watchdog
+        # reads it to tell when a command is stuck.
+        self.busy_since = None
+
+        # Time spent applying each command, including the bus writes.
+        self.timing = latency.LatencyHistogram()
+
+    def start(self):
+        """Starts the writer thread."""
+
+        if self._thread is not None:
+            return
+
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="motor writer", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stops the writer thread. A command that hasn't been applied yet is dropped."""
+
+        if self._thread is None:
+            return
+
+        with self._mailbox:
+            self._running = False
+            self._mailbox.notify_all()
+
+        self._thread.join()
+        self._thread = None
+
+    def submit(self, spool_action, drive_vector, input_time=None):
+        """Hands the writer a new command without waiting. 'spool_action' is the spool method to call, 'drive_vector'
+           goes to MotorController.apply_vector(), and 'input_time' is the stamp of the input behind the command.
+
+           Any command still waiting is replaced. Its input stamp is kept if it's older, so the latency of skipped
+           input is still measured."""
+
+        with self._mailbox:
+            if self._pending is not None:
+                self.coalesced += 1
+                if self._pending[2] is not None:
+                    input_time = self._pending[2]
+
+            self._pending = (spool_action, drive_vector, input_time)
+            self.submitted += 1
+            self.depth += 1
+            if self.depth > self.max_depth:
+                self.max_depth = self.depth
+
+            self._mailbox.notify_all()
+
+    def wait_until_idle(self, timeout=None):
+        """Blocks until every command sent so far has been applied. Returns 'False' if 'timeout' seconds pass first."""
+
+        with self._mailbox:
+            return self._mailbox.wait_for(lambda: self._pending is None and not self._busy, timeout)
+
+    def _run(self):
+        """Applies commands as they come in. While a motor is ramping, wakes up every period to step the ramp."""
+
+        motor_controller = self._motor_controller
+
+        while True:
+            with self._mailbox:
+                if self._pending is None and self._running:
+                    self._mailbox.wait(self.period if motor_controller.is_ramping() else None)
+
+                if not self._running:
+                    return
+
+                command = self._pending
+                self._pending = None
+                self.depth = 0
+                self._busy = True
+
+            start = monotonic()
+            self.busy_since = start
+            estops = motor_controller.estops
+            try:
+                self._apply(command)
+                if motor_controller.estops != estops:
+                    # An emergency stop landed in the middle of the command, so anything it wrote after that is undone.
+                    motor_controller.emergency_stop()
+            finally:
+                self.busy_since = None
+                with self._mailbox:
+                    self._busy = False
+                    self._mailbox.notify_all()
+
+            if command is not None:
+                self.timing.record(monotonic() - start)
+
+    def _apply(self, command):
+        """Applies a command, or just steps any ramps when 'command' is 'None'."""
+
+        motor_controller = self._motor_controller
+
+        if command is not None:
+            spool_action, drive_vector, input_time = command
+            if input_time is not None:
+                motor_controller.begin_input(input_time)
+
+            spool_action()
+            motor_controller.apply_vector(drive_vector)
+            motor_controller.end_input()
+            self.applied += 1
+
+        motor_controller.update()
+
+    def get_stats(self):
+        """Returns the writer's counters as a dictionary."""
+
+        return {"submitted": self.submitted, "applied": self.applied, "coalesced": self.coalesced,
+                "depth": self.depth, "max_depth": self.max_depth}
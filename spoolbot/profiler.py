@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+
+# Per-phase timing for the control loop.
+# Version info found in constants file.
+
+# A PhaseProfiler times methods by putting a timed wrapper in front of them on one object. The remotes and the motor
+# controller list their loop phases and commands in PROFILED_PHASES. Nothing is wrapped until attach() is called, so
+# with profiling off the loop runs exactly the code it always did and costs nothing extra.
+#
+# A phase's time includes any other phase it calls. run_movement() includes determine_direction() and the motor
+# controller's commands, and those include the I2C writes in _apply() and _flush().
+
+from . import latency
+from time import perf_counter
+
+RESOLUTION = 0.0000001  # Seconds. Small phases only take a microsecond or two
+
+
+class PhaseProfiler:
+    """Keeps a duration histogram for every timed phase."""
+
+    def __init__(self, clock=perf_counter):
+        self._clock = clock
+        self.phases = {}
+
+    def histogram(self, phase):
+        """Returns the histogram for a phase, making it if it's new."""
+
+        histogram = self.phases.get(phase)
+        if histogram is None:
+            histogram = latency.LatencyHistogram(resolution=RESOLUTION)
+            self.phases[phase] = histogram
+
+        return histogram
+
+    def attach(self, target, prefix, names=None):
+        """Times methods of 'target', reporting them as 'prefix.name'. 'names' defaults to the target's
+           PROFILED_PHASES. Bound methods that were saved before this, like a DispatchTable's spool actions, aren't
+           timed, so attach to a motor controller before handing it to a remote."""
+
+        names = names if names is not None else target.PROFILED_PHASES
+        for name in names:
+            setattr(target, name, self._timed(prefix + "." + name, getattr(target, name)))
+
+    def detach(self, target, names=None):
+        """Stops timing methods of 'target'."""
+
+        names = names if names is not None else target.PROFILED_PHASES
+        for name in names:
+            if name in vars(target):
+                delattr(target, name)
+
+    def _timed(self, phase, method):
+        """Returns a wrapper that runs 'method' and records how long it took."""
+
+        record = self.histogram(phase).record
+        clock = self._clock
+
+        def timed(*args, **kwargs):
+            start = clock()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                record(clock() - start)
+
+        return timed
+
+    def reset(self):
+        """Clears every phase's timings."""
+
+        for histogram in self.phases.values():
+            histogram.reset()
+
+    def report(self):
+        """Returns a printable table of each phase's call count and min, mean, p99 and max times. Phases that never
+           ran are left out."""
+
+        width = max([len(phase) for phase in self.phases] + [5])
+        lines = ["{:<{}}{:>9}{:>10}{:>10}{:>10}{:>10}".format("Phase", width + 2, "calls", "min us", "mean us",
+                                                            "p99 us", "max us")]
+
+        for phase, histogram in self.phases.items():
+            if histogram.total == 0:
+                continue
+            lines.append("  {:<{}}{:>9}{:>10.2f}{:>10.2f}{:>10.2f}{:>10.2f}".format(
+                phase, width, histogram.total, histogram.minimum() * 1000000, histogram.mean() * 1000000,
+                histogram.percentile(99.0) * 1000000, histogram.percentile(100.0) * 1000000))
+
+        return "\n".join(lines)
@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+
+# Real-time tuning for the control loop.
+# Version info found in constants file.
+
+# On a busy Pi, the worst frames come from the kernel running something else on the loop's CPU and from garbage
+# collection pauses, not from the control code. RealtimeMode pins the control thread to one CPU and asks for SCHED_FIFO,
+# so ordinary processes can't preempt it. It also freezes everything allocated during startup, so the collector never
+# scans it again. Young collections are put off until a pass finishes with time to spare before its deadline, and the
+# automatic collector only steps in once garbage has piled up far past that.
+#
+# Threads started after enter() inherit its CPU and priority. That's wanted for the motor writer and the watchdog, which
+# are part of getting commands to the motors on time. Anything else, like the telemetry view's redraws, has to call
+# release_thread() when it starts, or a FIFO thread drawing the console would hold off the control loop on its CPU.
+# Anything the system doesn't allow, like SCHED_FIFO without root, is skipped and noted.
+#
+# Run with: python3 -m spoolbot.realtime [--seconds N] [--load N]
+# It drives the control pipeline on the emulated MotorHAT with and without the mode, and compares how late each pass
+# woke up.
+
+from . import constants
+from . import latency
+from . import scheduler
+import argparse
+import gc
+import os
+import subprocess
+import sys
+import threading
+from time import monotonic
+
+# How much of a loaded process the benchmark stands in for. The real robot has pygame, numpy and the Adafruit
+# libraries loaded, so a full collection has a lot more to look through than the control code alone.
+BENCH_HEAP = 200000  # Long lived objects kept while the benchmark runs
+BENCH_CHURN = 200  # Garbage reference cycles made every tick, like the telemetry view and other threads would
+
+
+class RealtimeMode:
+    """Puts the control thread into real-time mode, and takes it back out."""
+
+    def __init__(self, cpu=constants.RT_CPU, priority=constants.RT_PRIORITY, gc_threshold=constants.RT_GC_THRESHOLD,
+                 gc_slack=constants.RT_GC_SLACK):
+        """'cpu' is the CPU to pin to, or 'None' for the last one. 'priority' is the SCHED_FIFO priority. A young
+           collection is run once 'gc_threshold' objects have been allocated, in a pass that has at least 'gc_slack'
+           seconds to spare."""
+
+        self.cpu = cpu
+        self.priority = priority
+        self.gc_threshold = gc_threshold
+        self.gc_slack = gc_slack
+
+        self.active = False
+        self.notes = []
+        self.frozen = 0
+        self.collections = 0
+
+        # What enter() changed, so leave() can put it back
+        self._affinity = None
+        self._policy = None
+        self._threshold = None
+
+    def enter(self):
+        """Pins the calling thread, raises its priority and freezes the heap. Returns notes on what took effect."""
+
+        self.notes = []
+
+        try:
+            cpus = os.sched_getaffinity(0)
+            cpu = self.cpu if self.cpu is not None else max(cpus)
+            os.sched_setaffinity(0, {cpu})
+            self._affinity = cpus
+            self.notes.append("pinned to CPU " + str(cpu))
+        except AttributeError:
+            self.notes.append("not pinned, CPU affinity isn't supported here")
+        except OSError as error:
+            self.notes.append("not pinned, " + str(error.strerror).lower())
+
+        try:
+            policy = (os.sched_getscheduler(0), os.sched_getparam(0))
+            os.sched_setscheduler(0, os.SCHED_FIFO, os.sched_param(self.priority))
+            self._policy = policy
+            self.notes.append("SCHED_FIFO priority " + str(self.priority))
+        except AttributeError:
+            self.notes.append("no SCHED_FIFO, it isn't supported here")
+        except OSError as error:
+            self.notes.append("no SCHED_FIFO, " + str(error.strerror).lower())
+
+        # Everything made during startup lives as long as the robot does, so it's moved out of the collector's sight.
+        gc.collect()
+        if hasattr(gc, "freeze"):
+            gc.freeze()
+            self.frozen = gc.get_freeze_count()
+            self.notes.append("froze " + str(self.frozen) + " objects")
+        else:
+            self.notes.append("nothing frozen, gc.freeze() needs Python 3.7")
+        self._threshold = gc.get_threshold()
+        gc.set_threshold(self.gc_threshold * 10, *self._threshold[1:])
+
+        self.active = True
+        return self.notes
+
+    def leave(self):
+        """Puts back everything enter() changed."""
+
+        if not self.active:
+            return
+
+        gc.set_threshold(*self._threshold)
+        if hasattr(gc, "unfreeze"):
+            gc.unfreeze()
+
+        if self._policy is not None:
+            os.sched_setscheduler(0, self._policy[0], self._policy[1])
+            self._policy = None
+        if self._affinity is not None:
+            os.sched_setaffinity(0, self._affinity)
+            self._affinity = None
+
+        self.active = False
+
+    def release_thread(self):
+        """Moves the calling thread back to the priority and CPUs the control thread had before enter(). Helper
+           threads started after enter() call this, so only the control path runs in real-time mode."""
+
+        if not self.active:
+            return
+
+        if self._policy is not None:
+            os.sched_setscheduler(0, self._policy[0], self._policy[1])
+        if self._affinity is not None:
+            os.sched_setaffinity(0, self._affinity)
+
+    def attach(self, loop_scheduler):
+        """Runs the put-off collections in a LoopScheduler's spare time."""
+
+        loop_scheduler.idle_task = self.idle
+
+    def idle(self, time_left):
+        """Runs a young collection if one is due and 'time_left' before the next deadline leaves room for it. Older
+           generations are collected along with it when their own thresholds say so, like the automatic collector
+           would."""
+
+        if not self.active or time_left < self.gc_slack:
+            return
+
+        counts = gc.get_count()
+        if counts[0] < self.gc_threshold:
+            return
+
+        generation = 0
+        if counts[1] >= self._threshold[1]:
+            generation = 1
+            if counts[2] >= self._threshold[2]:
+                generation = 2
+
+        gc.collect(generation)
+        self.collections += 1
+
+    def report(self):
+        """Returns a one line summary of what's in effect."""
+
+        return ("Real-time mode: " + ", ".join(self.notes) + ", " + str(self.collections) +
+                " collections run in spare time")
+
+
+def make_churn(stop, cycles):
+    """Makes 'cycles' garbage reference cycles every loop period until 'stop' is set."""
+
+    period = 1.0 / constants.LOOP_RATE
+    while not stop.wait(period):
+        for i in range(cycles):
+            node = {}
+            node["self"] = node
+
+
+def run_pipeline(seconds, mode=None):
+    """Drives the control pipeline on the emulated MotorHAT in real time for 'seconds'. Returns the loop scheduler,
+       with a histogram of how late each pass woke up."""
+
+    from . import emulator
+    from . import journal
+
+    mc = emulator.make_controller()
+
+    # Drive forward and back, and flip the spool now and then.
+    events = []
+    for step in range(int(seconds * 4)):
+        events.append((step * 0.25, "hat", 0, constants.BTN_UP if step % 4 < 2 else constants.BTN_DWN))
+        if step % 8 == 0:
+            events.append((step * 0.25, "button_down", constants.BTN_CW, 1))
+            events.append((step * 0.25 + 0.1, "button_up", constants.BTN_CW, 0))
+    events.sort(key=lambda event: event[0])
+
+    header = {"source": "ds4", "controller": True, "buttons": 13, "hats": 1}
+    source = journal.ReplaySource(events, header)
+    loop_scheduler = scheduler.LoopScheduler()
+    loop_scheduler.jitter_histogram = latency.LatencyHistogram(resolution=0.000001)
+    remote = journal.make_remote(header, mc, source, loop_scheduler, monotonic)
+
+    stop = threading.Event()
+    # Started before the mode is entered, so it stays an ordinary thread on any CPU, like the robot's other threads.
+    churn = threading.Thread(target=make_churn, args=(stop, BENCH_CHURN), name="churn", daemon=True)
+    churn.start()
+    if mode is not None:
+        mode.enter()
+        mode.attach(loop_scheduler)
+
+    try:
+        journal.replay(remote, mc, source, loop_scheduler)
+    finally:
+        stop.set()
+        churn.join()
+        if mode is not None:
+            mode.leave()
+        mc.release_all()
+
+    return loop_scheduler
+
+
+def parse_args(args=None):
+    """Reads the command line options."""
+
+    parser = argparse.ArgumentParser(prog="spoolbot.realtime",
+                                     description="Compares control loop jitter with and without real-time mode.")
+    parser.add_argument("--seconds", type=float, default=10.0, help="how long each run lasts (default: %(default)s)")
+    parser.add_argument("--load", type=int, default=0, metavar="N",
+                        help="keep N busy processes running alongside, like a loaded Pi (default: %(default)s)")
+    parser.add_argument("--cpu", type=int, default=constants.RT_CPU, help="CPU to pin to (default: the last one)")
+    parser.add_argument("--priority", type=int, default=constants.RT_PRIORITY,
+                        help="SCHED_FIFO priority (default: %(default)s)")
+
+    return parser.parse_args(args)
+
+
+def main(args=None):
+    """Runs the jitter benchmark."""
+
+    options = parse_args(args)
+
+    heap = [[i] for i in range(BENCH_HEAP)]
+    load = [subprocess.Popen([sys.executable, "-c", "while True: pass"]) for i in range(options.load)]
+    try:
+        normal = run_pipeline(options.seconds)
+        mode = RealtimeMode(cpu=options.cpu, priority=options.priority)
+        tuned = run_pipeline(options.seconds, mode)
+    finally:
+        for process in load:
+            process.kill()
+            process.wait()
+    del heap
+
+    print("{:<12}{:>8}{:>8}{:>10}{:>10}{:>10}".format("Mode", "passes", "late", "p50 us", "p99 us", "max us"))
+    for name, loop_scheduler in (("normal", normal), ("real-time", tuned)):
+        jitter = loop_scheduler.jitter_histogram
+        print("{:<12}{:>8}{:>8}{:>10.0f}{:>10.0f}{:>10.0f}".format(
+            name, loop_scheduler.ticks, loop_scheduler.overruns, jitter.percentile(50.0) * 1000000,
+            jitter.percentile(99.0) * 1000000, jitter.percentile(100.0) * 1000000))
+    print(mode.report())
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+
+# Flight recorder that keeps the last few minutes of control ticks in a memory-mapped file.
+# Version info found in constants file.
+
+# Every tick writes one fixed-size binary record into a ring of records in a file that's mapped into memory, followed by
+# the number of ticks written so far in the file's header. Nothing is flushed by hand. The pages belong to the
+# operating system, so whatever was written is still in the file if the robot's process dies.
+#
+# Run 'python3 -m spoolbot.recorder FILE [OUT.npz]' to turn a recording into NumPy arrays.
+
+from . import constants
+import mmap
+import os
+import struct
+import sys
+
+MAGIC = b"SPOOLFR1"
+VERSION = 1
+AXES = 4  # Axis values kept per tick
+CHANNELS = 4  # MotorHAT channels
+
+# Header: magic, version, record size, capacity, ticks written so far
+_HEADER = struct.Struct("<8sIIQQ")
+_TICKS_OFFSET = 24
+HEADER_SIZE = 64
+
+# Record: time, tick number, input bits, axis values, (direction, speed) for each channel, loop duration
+_RECORD = struct.Struct("<dQH" + str(AXES) + "f" + str(CHANNELS * 2) + "Bf")
+RECORD_SIZE = _RECORD.size
+
+
+class FlightRecorder:
+    """Writes one record per control tick into a ring in a memory-mapped file."""
+
+    def __init__(self, path, capacity=constants.RECORDER_CAPACITY):
+        """Creates, or starts over, the recording at 'path'. The file is sized for 'capacity' records up front, and
+           once it's full the oldest records are written over."""
+
+        self.path = path
+        self.capacity = capacity
+        self.ticks = 0
+
+        size = HEADER_SIZE + capacity * RECORD_SIZE
+        self._file = open(path, "w+b")
+        self._file.truncate(size)
+        self._map = mmap.mmap(self._file.fileno(), size)
+        _HEADER.pack_into(self._map, 0, MAGIC, VERSION, RECORD_SIZE, capacity, 0)
+
+        # Reused every tick, so recording doesn't build any lists.
+        self._axes = [0.0] * AXES
+        self._channels = [0] * (CHANNELS * 2)
+
+    def record(self, timestamp, bits, axes, motor_controller, duration):
+        """Writes a record for one tick. 'axes' is a {axis number: value} dictionary, or 'None', and the direction and
+           speed of each channel is read from 'motor_controller'."""
+
+        values = self._axes
+        for axis in range(AXES):
+            values[axis] = axes.get(axis, 0.0) if axes else 0.0
+
+        channels = self._channels
+        for index, motor in motor_controller.motors.items():
+            slot = (index - 1) * 2
+            if motor is None:
+                channels[slot] = 0
+                channels[slot + 1] = 0
+            else:
+                channels[slot] = motor.state
+                channels[slot + 1] = motor.speed if motor.speed <= 255 else 255
+
+        tick = self.ticks
+        offset = HEADER_SIZE + (tick % self.capacity) * RECORD_SIZE
+        _RECORD.pack_into(self._map, offset, timestamp, tick, bits, *values, *channels, duration)
+
+        # The tick count goes in last, so it never covers a record that's only half written.
+        self.ticks = tick + 1
+        struct.pack_into("<Q", self._map, _TICKS_OFFSET, self.ticks)
+
+    def close(self):
+        """Writes everything out to disk and closes the file."""
+
+        if self._map is None:
+            return
+
+        self._map.flush()
+        self._map.close()
+        self._file.close()
+        self._map = None
+
+
+def record_dtype():
+    """Returns the NumPy dtype of one record."""
+
+    import numpy
+
+    return numpy.dtype([("time", "<f8"), ("tick", "<u8"), ("bits", "<u2"), ("axes", "<f4", (AXES,)),
+                        ("channels", "u1", (CHANNELS, 2)), ("duration", "<f4")])
+
+
+def load(path):
+    """Reads a recording into a NumPy structured array, oldest record first."""
+
+    import numpy
+
+    with open(path, "rb") as file:
+        data = file.read()
+
+    magic, version, record_size, capacity, ticks = _HEADER.unpack_from(data, 0)
+    if magic != MAGIC or version != VERSION or record_size != RECORD_SIZE:
+        raise ValueError(path + " isn't a version " + str(VERSION) + " flight recording")
+
+    records = numpy.frombuffer(data, dtype=record_dtype(), count=capacity, offset=HEADER_SIZE)
+    if ticks <= capacity:
+        return records[:ticks].copy()
+
+    oldest = ticks % capacity
+    return numpy.concatenate((records[oldest:], records[:oldest]))
+
+
+def to_arrays(records):
+    """Splits a recording into a dictionary of plain arrays. Channel columns are named like 'state_1' and
+       'speed_1'."""
+
+    arrays = {"time": records["time"], "tick": records["tick"], "bits": records["bits"],
+              "duration": records["duration"]}
+
+    for axis in range(AXES):
+        arrays["axis_" + str(axis)] = records["axes"][:, axis]
+
+    for channel in range(CHANNELS):
+        arrays["state_" + str(channel + 1)] = records["channels"][:, channel, 0]
+        arrays["speed_" + str(channel + 1)] = records["channels"][:, channel, 1]
+
+    return arrays
+
+
+def main(args=None):
+    """Converts a recording to a .npz file of arrays and prints a short summary."""
+
+    import numpy
+
+    args = sys.argv[1:] if args is None else args
+    if not 1 <= len(args) <= 2:
+        print("Usage: python3 -m spoolbot.recorder FILE [OUT.npz]")
+        return 2
+
+    records = load(args[0])
+    out = args[1] if len(args) == 2 else os.path.splitext(args[0])[0] + ".npz"
+    numpy.savez(out, **to_arrays(records))
+
+    print(str(len(records)) + " ticks written to " + out)
+    if len(records) > 0:
+        durations = records["duration"] * 1000
+        print("Covers {:.1f} s. Tick duration: mean {:.3f} ms, max {:.3f} ms".format(
+            records["time"][-1] - records["time"][0], durations.mean(), durations.max()))
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
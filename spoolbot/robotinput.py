@@ -7,15 +7,24 @@
 # 4 buttons control robot movement. Input from these 4 buttons can be combined to control more advanced movement such as
 # turning left or right while also moving forward or backward.
 
-import constants
-import RPi.GPIO as GPIO
-from time import sleep
+from . import constants
+from . import debounce
+from . import dispatch
+from . import scheduler
+import threading
+from time import monotonic
+
+try:
+    import RPi.GPIO as GPIO
+except (ImportError, RuntimeError):
+    # Not running on a Pi. A GPIO module such as fakegpio has to be passed to RemoteControl instead.
+    GPIO = None
 
 
 class Button:
     """Base class for a tactile switch button."""
 
-    def __init__(self, pin_num, name="button"):
+    def __init__(self, pin_num, name="button", gpio=None):
         """Sets up a basic button."""
 
         self._pin_num = pin_num
@@ -23,7 +32,8 @@ class Button:
         self._pressed = False
 
         # Set up button in GPIO
-        GPIO.setup(pin_num, GPIO.IN, pull_up_down=GPIO.PUD_DOWN)
+        gpio = gpio if gpio is not None else GPIO
+        gpio.setup(pin_num, gpio.IN, pull_up_down=gpio.PUD_DOWN)
 
     def get_name(self):
         """Returns the button's name."""
@@ -57,10 +67,10 @@ class Button:
 class SpoolButton(Button):
     """Class for buttons that control spool rotation."""
 
-    def __init__(self, pin_num, name="spool button", direction="cw"):
+    def __init__(self, pin_num, name="spool button", direction="cw", gpio=None):
         """Sets up a spool rotation control button."""
 
-        super().__init__(pin_num, name=name)
+        super().__init__(pin_num, name=name, gpio=gpio)
         self._direction = direction
 
     def get_direction(self):
@@ -77,10 +87,10 @@ class MoveButton(Button):
     # then I have consistency with the SpoolButton class. If it can't, then motor control must be manipulated in the
     # RemoteControl class, a new class, or helper functions.
 
-    def __init__(self, pin_num, direction, name="move button"):
+    def __init__(self, pin_num, direction, name="move button", gpio=None):
         """Sets up robot movement control button."""
 
-        super().__init__(pin_num, name=name)
+        super().__init__(pin_num, name=name, gpio=gpio)
         self._direction = direction
 
     def get_direction(self):
@@ -91,18 +101,60 @@ class MoveButton(Button):
 class RemoteControl:
     """A class for managing the 6-button controller for the robot."""
 
-    def __init__(self, motor_control):
-        """Creates the remote control object, sets up the GPIO interface, and maps pin numbers to button names."""
-
+    # Loop phases a profiler.PhaseProfiler can time
+    PROFILED_PHASES = ("scan_buttons", "determine_spin", "move_spool", "determine_direction", "run_movement", "decide",
+                       "record_tick")
+
+    def __init__(self, motor_control, loop_scheduler=None, gpio=None, edge_triggered=False, motor_writer=None,
+                 clock=monotonic, settle=constants.BUTTON_SETTLE, verbose=True):
+        """Creates the remote control object, sets up the GPIO interface, and maps pin numbers to button names.
+           'gpio' replaces the RPi.GPIO module. With 'edge_triggered' on, the pins aren't polled. Instead, GPIO
+           callbacks record every change and wake the control loop. With a started MotorWriter as 'motor_writer',
+           main_control_loop() hands it the motor commands instead of writing them itself. 'clock' stands in for
+           time.monotonic() when button changes are stamped. A button has to hold a new level for 'settle' seconds
+           before it counts. Turning 'verbose' off silences the button and direction messages, for when the telemetry
+           view is showing them."""
+
+        self.verbose = verbose
         self.spool_is_active = False
+        self._scheduler = loop_scheduler if loop_scheduler is not None else scheduler.LoopScheduler()
+        self._gpio = gpio if gpio is not None else GPIO
+        self._edge_triggered = edge_triggered
+        self._clock = clock
+
+        # Each pin gets its button's dispatch bit. In edge triggered mode, _pin_states holds the bits of the held
+        # buttons. Only the GPIO callback thread writes it, so the control loop can read it without a lock.
+        self._pin_masks = {}
+        self._pin_states = 0
+        self._input_bits = 0
+        self._input_changed = threading.Event()
+
+        # Turns the raw pin bits into debounced '_input_bits'. Set its 'windows' to give buttons their own settle time.
+        self.debouncer = debounce.Debouncer(settle)
+        # The bits the spool decision last saw, for telling when a spool button goes down
+        self._spin_bits = 0
+        self.edges_seen = 0
+
+        # time.monotonic() stamp of the oldest button change that hasn't been acted on yet.
+        self._input_time = None
         self._active_buttons = []
         self._motor_controller = motor_control
+        self._motor_writer = motor_writer
+
+        # A recorder.FlightRecorder that gets a record every tick, when one is set.
+        self.recorder = None
+        # A journal.JournalWriter that gets every pin change, when one is set.
+        self.journal = None
+        # A watchdog.Watchdog that's told about every input sample and finished pass, when one is set.
+        self.watchdog = None
         self._move_buttons = []
         self._spool_buttons = []
         self._spool_spin = "stop" # Options: stop, cw, ccw
         self._direction = "stop"  # Options: stop, fwd, bwd, fwd_left, fwd_right, bwd_left, bwd_right, left, right
+        self._dispatch = dispatch.DispatchTable(motor_control)
+        self._drive_vector = ()
 
-        GPIO.setmode(GPIO.BCM)  # Set pin numbering scheme
+        self._gpio.setmode(self._gpio.BCM)  # Set pin numbering scheme
 
         # Create the button objects and add them to the active buttons list.
         for pin in constants.BTN_PINS:
@@ -139,162 +191,262 @@ class RemoteControl:
 
             # Add new button to list of active buttons based on the button's style.
             if style == "spool":
-                self._active_buttons.append(SpoolButton(pin, name=name, direction=direction))
+                self._active_buttons.append(SpoolButton(pin, name=name, direction=direction, gpio=self._gpio))
             elif style == "move":
-                self._active_buttons.append(MoveButton(pin, name=name, direction=direction))
+                self._active_buttons.append(MoveButton(pin, name=name, direction=direction, gpio=self._gpio))
+            else:
+                continue
+
+            self._pin_masks[pin] = dispatch.BUTTON_BITS[name]
 
         # Copy the move buttons and spool buttons to their own lists
         for button in self._active_buttons:
             if "cw" not in button.get_name():
                 self._move_buttons.append(button)
-                print("Move Buttons: " + str(self._move_buttons))
+                if self.verbose:
+                    print("Move Buttons: " + str(self._move_buttons))
             else:
                 self._spool_buttons.append(button)
-                print("Spool Buttons: " + str(self._spool_buttons))
+                if self.verbose:
+                    print("Spool Buttons: " + str(self._spool_buttons))
+
+        if self._edge_triggered:
+            self.enable_edge_detection()
+
+    def enable_edge_detection(self):
+        """Registers a both-edge callback on every button pin and reads in their starting levels."""
+
+        for button in self._active_buttons:
+            pin = button.get_pin()
+            self._gpio.add_event_detect(pin, self._gpio.BOTH, callback=self._on_edge)
+            self._on_edge(pin)
+
+        self._edge_triggered = True
+
+    def _on_edge(self, pin):
+        """GPIO callback. Records the pin's new level in the state word and wakes the control loop."""
+
+        received = self._clock()
+        if self._input_time is None:
+            self._input_time = received
+
+        mask = self._pin_masks[pin]
+        level = self._gpio.input(pin)
+        if level:
+            self._pin_states |= mask
+        else:
+            self._pin_states &= ~mask
+
+        if self.journal is not None:
+            self.journal.write(received, "pin", pin, 1 if level else 0)
+
+        self.edges_seen += 1
+        self._input_changed.set()
+
+    def wait_for_input(self, timeout=None):
+        """Blocks until a button changes or 'timeout' seconds pass. Returns 'True' if a button changed."""
+
+        changed = self._input_changed.wait(timeout)
+        # Clear before the state word is read, so a change that comes in after this still wakes the next wait.
+        self._input_changed.clear()
+        return changed
 
     def scan_buttons(self):
         """Updates the states of all of the buttons in the remote."""
 
+        if self._edge_triggered:
+            states = self._pin_states
+            for button in self._active_buttons:
+                button.set_pressed(bool(states & self._pin_masks[button.get_pin()]))
+            now = self._clock()
+            self._input_bits = self.debouncer.update(states, now)
+            if self.watchdog is not None:
+                self.watchdog.feed_input(now)
+            return
+
+        bits = 0
         for button in self._active_buttons:
             pin = button.get_pin()
-            is_pressed = GPIO.input(pin)  # this should return 'True' if the button is being pressed.
-
+            is_pressed = self._gpio.input(pin)  # this should return 'True' if the button is being pressed.
+
+            if bool(is_pressed) != bool(button.get_pressed()):
+                received = self._clock()
+                if self._input_time is None:
+                    self._input_time = received
+                if self.journal is not None:
+                    self.journal.write(received, "pin", pin, 1 if is_pressed else 0)
             button.set_pressed(is_pressed)
+            if is_pressed:
+                bits |= self._pin_masks[pin]
+
+        now = self._clock()
+        self._input_bits = self.debouncer.update(bits, now)
+        if self.watchdog is not None:
+            self.watchdog.feed_input(now)
+
+    def poll_events(self):
+        """Reads the buttons. Returns 'True' if any of them changed since the last poll."""
+
+        previous = self._input_bits
+        self.scan_buttons()
+
+        return self._input_bits != previous
+
+    def input_bits(self):
+        """Returns the held buttons packed into one integer of dispatch bits."""
+
+        return self._input_bits
+
+    def input_state(self):
+        """Returns a snapshot of everything the decisions read. For the buttons, that's the held buttons' bits."""
+
+        return self._input_bits
+
+    def take_input_time(self):
+        """Returns the stamp of the oldest button change that hasn't been acted on, or 'None', and clears it."""
+
+        input_time = self._input_time
+        self._input_time = None
+        return input_time
+
+    def decide(self, bits):
+        """Runs the spool and movement decisions for a set of input bits. Returns the spool method to call and the
+           drive command vector for MotorController.apply_vector()."""
+
+        self._spool_spin = self.next_spin(bits)
+        self._direction, self._drive_vector = self._dispatch.lookup(bits)
+
+        return self._dispatch.spool_actions[self._spool_spin], self._drive_vector
+
+    def record_tick(self, start, bits):
+        """Writes the tick that began at 'start' to the flight recorder."""
+
+        self.recorder.record(start, bits, None, self._motor_controller, self._clock() - start)
+
+    def journal_header(self):
+        """Returns what a journal needs to know about this remote to replay its pin changes."""
+
+        return {"source": "gpio", "pins": sorted(self._pin_masks)}
+
+    def telemetry_snapshot(self):
+        """Returns a copy of the current input state for the telemetry view."""
+
+        return {"direction": self._direction, "spool": self._spool_spin,
+                "buttons": {button.get_name(): bool(button.get_pressed()) for button in self._active_buttons}}
 
     # SPOOL MOVEMENT SECTION BEGIN
 
     def determine_spin(self):
         """Determines the direction the spool should be moving based on button presses."""
 
-        pressed_btns = []
-        for button in self._spool_buttons:
-            if button.get_pressed():
-                pressed_btns.append(button)
+        self._spool_spin = self.next_spin(self._input_bits)
 
-        if len(pressed_btns) == 1:
-            # One button is being pressed.
-
-            button = pressed_btns[0]
-            if self._spool_spin is "stop":
-                # Spool can be spun in either direction.
-                self._spool_spin = button.get_direction()
-            else:
-                # Spool needs to be stopped first.
-                self._spool_spin = "stop"
+    def next_spin(self, bits):
+        """Returns the new spool direction for a set of input bits. Only a spool button that went down since the last
+           decision changes it."""
 
-        elif len(pressed_btns) == 2:
-            # Two buttons are being pressed.
-            # Stop the spool
-            self._spool_spin = "stop"
+        pressed = bits & ~self._spin_bits
+        self._spin_bits = bits
+        return dispatch.next_spin(self._spool_spin, bits, pressed)
 
     def move_spool(self):
         """Rotates the spool based on the direction determined by which button was activated."""
 
         self.determine_spin()
 
-        spool_dir = self._spool_spin
-
-        if spool_dir is "stop":
-            # Stop movement
-            self._motor_controller.spool_stop()
-        elif spool_dir is "cw":
-            # Move spool clockwise.
-            self._motor_controller.spool_clockwise()
-        elif spool_dir is "ccw":
-            # Move spool counter-clockwise
-            self._motor_controller.spool_counterclockwise()
+        self._dispatch.spool_actions[self._spool_spin]()
 
     # SPOOL MOVEMENT SECTION END
 
     # GROUND MOVEMENT SECTION BEGIN
 
     def determine_direction(self):
-        """Sets the direction based on which buttons are being held."""
-        # Valid Inputs:
-        # forward = fwd
-        # backward = bwd
-        # left = left
-        # right = right
-        # forward + left = fwd_left
-        # forward + right = fwd_right
-        # backward + left = bwd_left
-        # backward + right = bwd_right
-
-        # Make a list of which buttons are being pressed.
-        pressed_btns = []
-        for button in self._move_buttons:
-            if button.get_pressed():
-                pressed_btns.append(button)
-
-        # If a valid input combo is pressed, set the appropriate direction.
-        if len(pressed_btns) == 1:
-            # The button directions and the move directions are the same, so they can be used.
-            self._direction = pressed_btns[0].get_direction()
-        elif len(pressed_btns) == 2:
-            # The button values must be combined to get the correct direction.
-            self._direction = "stop"
-            direction_0 = pressed_btns[0].get_direction()
-            direction_1 = pressed_btns[1].get_direction()
-
-            if direction_0 == "fwd" or direction_0 == "bwd":
-                # Apply fwd or bwd to the direction, first.
-                self._direction = direction_0
-
-            # Append direction_1 to the direction, second.
-            self._direction += "_" + direction_1
+        """Sets the direction, and the motor commands that go with it, based on which buttons are being held."""
 
-        else:
-            # No buttons are pressed, or an incorrect number are pressed, so the robot stops.
-            self._direction = "stop"
+        direction, self._drive_vector = self._dispatch.lookup(self._input_bits)
 
-        print("Current direction: " + self._direction)
+        if direction != self._direction and self.verbose:
+            print("Current direction: " + direction)
+        self._direction = direction
 
     def run_movement(self):
         """Uses determine_direction to begin with and applies the correct settings to the motor controller."""
 
         self.determine_direction()
 
-        # Use current direction info to determine movement.
-        # This is going to be a long-ass if statement, and I can't do much about that. :(
-
-        if self._direction is "fwd":
-            # Move forward
-            self._motor_controller.drive_forward()
-        elif self._direction is "bwd":
-            # Move backward
-            self._motor_controller.drive_backward()
-        elif self._direction is "left":
-            # Pivot left
-            self._motor_controller.drive_pivot_left()
-        elif self._direction is "right":
-            # Pivot right
-            self._motor_controller.drive_pivot_right()
-        elif self._direction is "fwd_left" or self._direction is "bwd_left":
-            # Do a moving left turn.
-            self._motor_controller.drive_turn_left()
-        elif self._direction is "fwd_right" or self._direction is "fwd_right":
-            # Do a moving right turn
-            self._motor_controller.drive_turn_right()
-        else:
-            # Stop movement
-            self._motor_controller.drive_stop()
+        self._motor_controller.apply_vector(self._drive_vector)
 
     # GROUND MOVEMENT SECTION END
 
     def main_control_loop(self):
         """Loops through all control functions needed for operation."""
 
+        last_state = None
+
         while True:
+            start = self._clock()
+
             # First, check to see which buttons have been pressed.
             self.scan_buttons()
 
-            # Second, handle the spool buttons
+            # Pass the input's stamp along, so the motor controller can tell when it gets acted on. It's taken even
+            # when nothing changed, so it doesn't get pinned on a later change.
+            input_time = self.take_input_time()
+
+            # Only decide again when a button changed. Otherwise the motors already have their commands, and only a
+            # ramp needs stepping.
+            state = self.input_state()
+            changed = state != last_state
+            last_state = state
+
+            if self._motor_writer is not None:
+                # The writer thread does the bus writes and steps the ramps.
+                if changed:
+                    spool_action, drive_vector = self.decide(self._input_bits)
+                    self._motor_writer.submit(spool_action, drive_vector, input_time)
+            elif changed:
+                if input_time is not None:
+                    self._motor_controller.begin_input(input_time)
+
+                # Second, handle the spool buttons
+
+                self.move_spool()
 
-            self.move_spool()
+                # Last, deal with ground movement
+                self.run_movement()
 
-            # Last, deal with ground movement
-            self.run_movement()
+                self._motor_controller.end_input()
 
-            # Wait a bit for the next loop. This doesn't need to run more than 120 times per second, and the delay will
-            # assist with debouncing the input.
-            sleep(constants.CYCLE_WAIT)
+                # Let any motors that are slowing down take their next step.
+                self._motor_controller.update()
+            elif self._motor_controller.is_ramping():
+                self._motor_controller.update()
+
+            if self.recorder is not None:
+                self.record_tick(start, self._input_bits)
+
+            if self.watchdog is not None:
+                self.watchdog.feed_tick(self._clock())
+
+            if self._edge_triggered:
+                # Sleep until a button changes. While a motor is still ramping, wake up in time for its next step too,
+                # unless the writer thread is taking care of that.
+                ramping = self._motor_writer is None and self._motor_controller.is_ramping()
+                timeout = self._scheduler.period if ramping else None
+
+                # A button that's still settling has to be looked at again once it has.
+                settle_at = self.debouncer.next_settle()
+                if settle_at is not None:
+                    settle_in = max(settle_at - self._clock(), 0.0)
+                    timeout = settle_in if timeout is None else min(timeout, settle_in)
+
+                # The watchdog needs to see a pass, and a sample, well inside its deadlines even with no buttons used.
+                if self.watchdog is not None:
+                    deadline = min(self.watchdog.tick_timeout, self.watchdog.input_timeout) / 2
+                    timeout = deadline if timeout is None else min(timeout, deadline)
+
+                self.wait_for_input(timeout)
+            else:
+                # Wait for the next frame. The scheduler takes the time this pass took out of the wait, and the delay
+                # will assist with debouncing the input.
+                self._scheduler.wait()
@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+
+# asyncio runtime that runs input, control, motor output and telemetry as separate tasks.
+# Version info found in constants file.
+
+# The tasks are joined by channels that only hold the newest value. A stage that falls behind skips straight to the
+# latest value instead of working through a backlog, and the stages in front of it never wait on it. Motor writes and
+# console drawing block, so motor output runs on the MotorWriter thread and drawing runs on its own worker thread, while
+# the event loop keeps sampling input.
+
+from . import latency
+from . import motorwriter
+from . import scheduler
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from time import monotonic
+
+TASKS = ["input", "control", "motor", "telemetry"]
+
+
+def run(main):
+    """Runs the coroutine 'main' on a new event loop until it finishes, and returns what it returned. Does the same as
+       asyncio.run(), which needs Python 3.7."""
+
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    try:
+        return loop.run_until_complete(main)
+    finally:
+        asyncio.set_event_loop(None)
+        loop.close()
+
+
+def keep_oldest_stamp(old, new):
+    """Combines two channel values whose last item is an input stamp. The new value wins, but the oldest stamp is kept,
+       so the latency of an input that got skipped over is still measured."""
+
+    if old[-1] is not None:
+        return new[:-1] + (old[-1],)
+
+    return new
+
+
+class LatestValue:
+    """One slot channel between two tasks. Putting a value replaces any value that hasn't been taken yet."""
+
+    def __init__(self, combine=None):
+        """'combine' is called with the waiting value and the new one when a value gets replaced, and returns the value
+           to keep. Without it, the new value wins."""
+
+        self._combine = combine
+        self._value = None
+        self._ready = asyncio.Event()
+        self.puts = 0
+        self.overwritten = 0
+
+    def put(self, value):
+        """Hands over a value without waiting."""
+
+        if self._ready.is_set():
+            self.overwritten += 1
+            if self._combine is not None:
+                value = self._combine(self._value, value)
+
+        self._value = value
+        self.puts += 1
+        self._ready.set()
+
+    async def get(self, timeout=None):
+        """Waits for a value and takes it. Returns 'None' if 'timeout' seconds pass first."""
+
+        if timeout is None:
+            await self._ready.wait()
+        else:
+            try:
+                await asyncio.wait_for(self._ready.wait(), timeout)
+            except asyncio.TimeoutError:
+                return None
+
+        value = self._value
+        self._value = None
+        self._ready.clear()
+        return value
+
+
+class Runtime:
+    """Runs a remote and a motor controller as asyncio tasks.
+
+       The remote is a DS4Controller or a RemoteControl. The input task polls it at a fixed rate, the control task turns
+       its input into motor commands for the motor writer thread, which sends them and steps ramps, and the telemetry
+       task redraws the telemetry view."""
+
+    def __init__(self, remote, motor_controller, telemetry=None, loop_scheduler=None, motor_writer=None):
+        """'telemetry' is an optional TelemetryView. It's redrawn by the runtime, so it shouldn't be started.
+           'motor_writer' is the MotorWriter for 'motor_controller'. One is made if it isn't given."""
+
+        self._remote = remote
+        self._motor_controller = motor_controller
+        self._telemetry = telemetry
+        self._scheduler = loop_scheduler if loop_scheduler is not None else scheduler.LoopScheduler()
+        self._writer = motor_writer if motor_writer is not None else motorwriter.MotorWriter(motor_controller)
+        self._stop_requested = threading.Event()
+        self._inputs = None
+        # Wakes the input task when it's waiting on a file descriptor, so it sees a stop straight away
+        self._wake_input = None
+
+        # Time each task spends on one step, not counting time spent waiting for its input. The motor writer keeps its
+        # own.
+        self.timings = {}
+        for name in TASKS:
+            self.timings[name] = latency.LatencyHistogram()
+        self.timings["motor"] = self._writer.timing
+
+    def run(self):
+        """Runs every task until stop() is called or a task fails. Blocks until then."""
+
+        run(self.main())
+
+    def stop(self):
+        """Asks the runtime to stop. Safe to call from any thread."""
+
+        self._stop_requested.set()
+        wake_input = self._wake_input
+        if wake_input is not None:
+            wake_input()
+
+    async def main(self):
+        """Starts the tasks and waits for them to finish."""
+
+        self._inputs = LatestValue(combine=keep_oldest_stamp)
+        telemetry_worker = ThreadPoolExecutor(max_workers=1)
+
+        self._writer.start()
+        if self._telemetry is not None:
+            self._telemetry.start(background=False)
+
+        tasks = [asyncio.ensure_future(self._input_task()), asyncio.ensure_future(self._control_task())]
+        if self._telemetry is not None:
+            tasks.append(asyncio.ensure_future(self._telemetry_task(telemetry_worker)))
+
+        try:
+            # The input task returns when a stop is asked for. Any other task only finishes by failing.
+            done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                task.result()
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+            self._writer.stop()
+            telemetry_worker.shutdown(wait=True)
+            if self._telemetry is not None:
+                self._telemetry.stop()
+            self._stop_requested.clear()
+
+    async def _input_task(self):
+        """Samples the remote once a frame, records the tick, and hands the input to the control task whenever it
+           changes. The motor writer steps ramps by itself, so unchanged input needs nothing done. A remote that has a
+           file descriptor for its input is only sampled when that turns readable, or when the remote asks to be woken
+           up."""
+
+        remote = self._remote
+        if hasattr(remote, "start_scanning"):
+            remote.start_scanning()
+        last_state = None
+
+        loop = asyncio.get_event_loop()
+        fileno = remote.input_fileno() if hasattr(remote, "input_fileno") else None
+        readable = None
+        if fileno is not None:
+            readable = asyncio.Event()
+            loop.add_reader(fileno, readable.set)
+            self._wake_input = lambda: loop.call_soon_threadsafe(readable.set)
+
+        try:
+            while not self._stop_requested.is_set():
+                start = monotonic()
+                remote.poll_events()
+                input_time = remote.take_input_time()
+                state = remote.input_state()
+                if state != last_state:
+                    last_state = state
+                    self._inputs.put((remote.input_bits(), input_time))
+                # The flight recorder gets every tick, like in the remote's own loop, not only the ones that changed.
+                if remote.recorder is not None:
+                    remote.record_tick(start, remote.input_bits())
+                if remote.watchdog is not None:
+                    remote.watchdog.feed_tick(monotonic())
+                self.timings["input"].record(monotonic() - start)
+
+                if readable is not None and remote.input_fileno() is None:
+                    # The device went away. Go back to sampling once a frame.
+                    loop.remove_reader(fileno)
+                    readable = None
+
+                if readable is not None:
+                    try:
+                        await asyncio.wait_for(readable.wait(), remote.wait_timeout())
+                    except asyncio.TimeoutError:
+                        pass
+                    readable.clear()
+                else:
+                    await self._scheduler.wait_async()
+        finally:
+            self._wake_input = None
+            if readable is not None:
+                loop.remove_reader(fileno)
+
+    async def _control_task(self):
+        """Turns input into motor commands."""
+
+        while True:
+            bits, input_time = await self._inputs.get()
+
+            start = monotonic()
+            spool_action, drive_vector = self._remote.decide(bits)
+            self._writer.submit(spool_action, drive_vector, input_time)
+            if self._telemetry is not None:
+                self._telemetry.publish(self._remote.telemetry_snapshot())
+            self.timings["control"].record(monotonic() - start)
+
+    async def _telemetry_task(self, worker):
+        """Redraws the telemetry view on the telemetry worker thread at the view's rate."""
+
+        loop = asyncio.get_event_loop()
+        period = self._telemetry.period
+
+        # The drawing thread steps out of real-time mode, so it never holds off the loop. The worker only has the one
+        # thread, so this covers every redraw.
+        if self._telemetry.realtime is not None:
+            await loop.run_in_executor(worker, self._telemetry.realtime.release_thread)
+
+        while True:
+            start = monotonic()
+            await loop.run_in_executor(worker, self._telemetry.refresh)
+            elapsed = monotonic() - start
+            self.timings["telemetry"].record(elapsed)
+
+            await asyncio.sleep(max(period - elapsed, 0.0))
+
+    def report(self):
+        """Returns a printable summary of how long each task's steps took and how many values were skipped."""
+
+        lines = []
+        for name in TASKS:
+            lines.append(self.timings[name].report(name.capitalize() + " task step"))
+
+        if self._inputs is not None:
+            lines.append("Skipped input samples: " + str(self._inputs.overwritten))
+
+        stats = self._writer.get_stats()
+        lines.append("Motor commands: " + str(stats["submitted"]) + " sent, " + str(stats["coalesced"]) +
+                     " coalesced, most waiting at once " + str(stats["max_depth"]))
+
+        stats = self._scheduler.get_stats()
+        lines.append("Input frames: " + str(stats["ticks"]) + " run, " + str(stats["overruns"]) + " late, " +
+                     str(stats["dropped"]) + " dropped")
+
+        return "\n".join(lines)
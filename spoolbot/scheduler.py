@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+
+# Fixed-rate scheduler shared by the control loops.
+# Version info found in constants file.
+
+# Instead of sleeping a fixed amount after every pass, the loop sleeps until an absolute deadline. Time spent doing work
+# is taken out of the sleep, so the loop neither drifts nor burns a whole core spinning.
+
+from . import constants
+import asyncio
+from time import monotonic, sleep
+
+
+class LoopScheduler:
+    """Paces a control loop to a fixed rate and keeps track of how well it keeps up."""
+
+    def __init__(self, rate=constants.LOOP_RATE, drop_frames=constants.LOOP_DROP_FRAMES,
+                 max_catch_up=constants.LOOP_MAX_CATCH_UP, clock=monotonic, sleep_func=sleep):
+        """'rate' is in passes per second. When a pass runs long, 'drop_frames' skips ahead to the next deadline that
+           hasn't passed yet. Otherwise, up to 'max_catch_up' late frames are run back to back before giving up."""
+
+        self.period = 1.0 / rate
+        self.drop_frames = drop_frames
+        self.max_catch_up = max_catch_up
+        self._clock = clock
+        self._sleep = sleep_func
+        self._deadline = None
+
+        # Called with the seconds left before each sleep, to get work done in the loop's spare time. See realtime.py.
+        self.idle_task = None
+        # A latency.LatencyHistogram that gets every pass's jitter, when one is set.
+        self.jitter_histogram = None
+
+        self.reset_stats()
+
+    def reset_stats(self):
+        """Clears the timing statistics."""
+
+        self.ticks = 0
+        self.overruns = 0
+        self.dropped = 0
+        self.sleeps = 0
+        self.max_overrun = 0.0
+        self.total_jitter = 0.0
+        self.max_jitter = 0.0
+
+    def time_left(self):
+        """Returns how long it is until the next deadline, or 'None' if the loop hasn't started yet."""
+
+        if self._deadline is None:
+            return None
+
+        return max(self._deadline - self._clock(), 0.0)
+
+    def wait(self):
+        """Sleeps until the next deadline. Call this once at the end of every pass of the loop."""
+
+        delay = self._plan_wait()
+        if delay is not None:
+            if self.idle_task is not None:
+                self.idle_task(delay)
+                delay = self.time_left()
+            self._sleep(delay)
+            self._finish_wait()
+
+    async def wait_async(self):
+        """Same as wait(), but sleeps with asyncio so other tasks keep running."""
+
+        delay = self._plan_wait()
+        if delay is not None:
+            if self.idle_task is not None:
+                self.idle_task(delay)
+                delay = self.time_left()
+            await asyncio.sleep(delay)
+            self._finish_wait()
+
+    def _plan_wait(self):
+        """Moves the deadline along for a pass that just finished. Returns how long to sleep, or 'None' if the next pass
+           should run right away."""
+
+        now = self._clock()
+        if self._deadline is None:
+            self._deadline = now + self.period
+
+        late = now - self._deadline
+        if late > 0:
+            # The pass ran past its deadline.
+            self.overruns += 1
+            if late > self.max_overrun:
+                self.max_overrun = late
+
+            missed = int(late / self.period) + 1
+            if self.drop_frames or missed > self.max_catch_up:
+                # Skip the frames that were missed and line up with the next deadline that's still ahead.
+                self.dropped += missed - 1
+                self._deadline += missed * self.period
+            else:
+                # Run the next pass right away to catch up.
+                self._deadline += self.period
+                self.ticks += 1
+                return None
+
+        return self._deadline - now
+
+    def _finish_wait(self):
+        """Records the jitter of a sleep that just ended and sets up the next deadline."""
+
+        self.sleeps += 1
+
+        # Jitter is how far past the deadline the loop actually woke up.
+        jitter = self._clock() - self._deadline
+        if jitter < 0:
+            jitter = -jitter
+        self.total_jitter += jitter
+        if jitter > self.max_jitter:
+            self.max_jitter = jitter
+        if self.jitter_histogram is not None:
+            self.jitter_histogram.record(jitter)
+
+        self._deadline += self.period
+        self.ticks += 1
+
+    def get_stats(self):
+        """Returns the timing statistics as a dictionary. Times are in seconds."""
+
+        mean_jitter = self.total_jitter / self.sleeps if self.sleeps > 0 else 0.0
+
+        return {"ticks": self.ticks, "overruns": self.overruns, "dropped": self.dropped,
+                "max_overrun": self.max_overrun, "mean_jitter": mean_jitter, "max_jitter": self.max_jitter}
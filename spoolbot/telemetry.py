@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+
+# Terminal dashboard for watching the robot's input and motor state.
+# Version info found in constants file.
+
+# The control loop only hands over a snapshot of its input each frame. Drawing happens on a separate thread at a capped
+# rate, and redraws in place with ANSI escape codes instead of clearing the screen through a shell.
+
+from . import constants
+import sys
+import threading
+from time import monotonic
+
+# ANSI escape codes
+_HOME = "\x1b[H"
+_CLEAR_SCREEN = "\x1b[2J"
+_CLEAR_LINE = "\x1b[K"
+_CLEAR_BELOW = "\x1b[J"
+_HIDE_CURSOR = "\x1b[?25l"
+_SHOW_CURSOR = "\x1b[?25h"
+
+_STATE_NAMES = {constants.FORWARD: "FORWARD", constants.BACKWARD: "BACKWARD", constants.RELEASE: "RELEASE"}
+
+CONTROLS = ["", "\t\tCONTROLS:", "Left = left arrow", "Right = right arrow", "Forward = up arrow",
+            "Backward = down arrow", "Spool clockwise = q", "Spool counter-clockwise = e"]
+
+
+class TelemetryView:
+    """Redraws a summary of the latest input snapshot and motor state on its own thread."""
+
+    def __init__(self, motor_controller=None, rate=constants.TELEMETRY_RATE, stream=None, watchdog=None):
+        """'rate' caps how many times per second the screen is redrawn. With a 'watchdog', its counters are shown."""
+
+        self._motor_controller = motor_controller
+        self._watchdog = watchdog
+        self.period = 1.0 / rate
+        self._stream = stream if stream is not None else sys.stdout
+        self._snapshot = None
+        self._stop = threading.Event()
+        self._thread = None
+        # A realtime.RealtimeMode that the drawing thread steps out of, when one is set
+        self.realtime = None
+        self._started = False
+        self._last_lines = None
+        self.frames_drawn = 0
+
+    def publish(self, snapshot):
+        """Hands the view the latest input snapshot. This only swaps a reference, so it's safe to call every frame."""
+
+        self._snapshot = snapshot
+
+    def start(self, background=True):
+        """Clears the screen and starts redrawing in the background. With 'background' off, no thread is started and
+           the caller is expected to call refresh() once a period."""
+
+        if self._started:
+            return
+
+        self._started = True
+        self._stream.write(_HIDE_CURSOR + _CLEAR_SCREEN)
+        if background:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="telemetry", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Stops redrawing and gives the cursor back."""
+
+        if not self._started:
+            return
+
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+
+        self._started = False
+        self._stream.write(_SHOW_CURSOR)
+        self._stream.flush()
+
+    def _run(self):
+        """Draws a frame every period until stopped."""
+
+        if self.realtime is not None:
+            self.realtime.release_thread()
+
+        next_draw = monotonic()
+        while not self._stop.is_set():
+            self.refresh()
+
+            next_draw += self.period
+            self._stop.wait(max(next_draw - monotonic(), 0.0))
+
+    def refresh(self):
+        """Draws a frame, unless nothing has changed since the last one. Returns 'True' if a frame was drawn."""
+
+        lines = self.render()
+        if lines == self._last_lines:
+            return False
+
+        self.draw(lines)
+        self._last_lines = lines
+        return True
+
+    def render(self):
+        """Builds the lines of the dashboard from the latest snapshot."""
+
+        snapshot = self._snapshot
+        lines = ["SpoolBot " + constants.VERSION]
+
+        if snapshot is None:
+            lines.append("Waiting for input...")
+        else:
+            lines.append("Direction: " + str(snapshot.get("direction")) + "    Spool: " + str(snapshot.get("spool")))
+            lines.append("Buttons:   " + _format_pressed(snapshot.get("buttons")))
+            lines.append("Hats:      " + _format_values(snapshot.get("hats")))
+            lines.append("Axes:      " + _format_values(snapshot.get("axes")))
+            if snapshot.get("keyboard"):
+                lines.append("Keys:      " + ", ".join(snapshot.get("keys", ())))
+
+        if self._motor_controller is not None:
+            lines.append("")
+            for name, state, speed in self._motor_controller.snapshot():
+                lines.append("{:<14}{:<10}{:>4}".format(name, _STATE_NAMES.get(state, str(state)), speed))
+
+            stats = self._motor_controller.get_write_stats()
+            lines.append("Writes: " + str(stats["issued"]) + " issued, " + str(stats["skipped"]) + " skipped")
+
+        if self._watchdog is not None:
+            stats = self._watchdog.get_stats()
+            lines.append("Watchdog: " + str(stats["trips"]) + " stops, " + str(stats["missed_ticks"]) +
+                         " late passes, " + str(stats["missed_inputs"]) + " late input" +
+                         ("    MOTORS CUT" if stats["tripped"] else ""))
+
+        # The keyboard help only applies to sources that take keyboard control.
+        if snapshot is not None and snapshot.get("keyboard"):
+            lines.extend(CONTROLS)
+        return lines
+
+    def draw(self, lines):
+        """Writes the lines over the previous frame."""
+
+        self._stream.write(_HOME + (_CLEAR_LINE + "\n").join(lines) + _CLEAR_LINE + "\n" + _CLEAR_BELOW)
+        self._stream.flush()
+        self.frames_drawn += 1
+
+
+def _format_pressed(values):
+    """Lists the keys of a {button: pressed} dictionary that are pressed."""
+
+    if not values:
+        return "-"
+
+    pressed = [str(button) for button, is_pressed in values.items() if is_pressed]
+    return ", ".join(pressed) if pressed else "-"
+
+
+def _format_values(values):
+    """Formats a dictionary as 'key=value' pairs."""
+
+    if not values:
+        return "-"
+
+    return "  ".join(str(key) + "=" + str(value) for key, value in values.items())
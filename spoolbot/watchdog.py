@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+
+# Deadman watchdog for the control loop.
+# Version info found in constants file.
+
+# The motors keep doing whatever they were last told until they're told something else. If the control loop stalls, or
+# the remote stops delivering input, that last command would stay on forever. The watchdog keeps two timestamps: when
+# the loop last finished a pass, and when the remote last took a fresh input sample. Its own thread checks them a few
+# times per deadline and calls MotorController.emergency_stop() as soon as either one is older than its timeout.
+#
+# A stalled pass or motor command can carry on writing once it gets going again, so the motors are cut once more as
+# soon as it finishes. A stop isn't undone when the stamps start coming in again. The loops only send commands when the
+# input changes, so the motors stay off until the driver lets go and presses a button again.
+
+from . import constants
+import threading
+from time import monotonic
+
+
+class Watchdog:
+    """Cuts every motor when the control loop or its input misses a deadline."""
+
+    def __init__(self, motor_controller, tick_timeout_ms=constants.WATCHDOG_TICK_MS,
+                 input_timeout_ms=constants.WATCHDOG_INPUT_MS, motor_writer=None, clock=monotonic):
+        """'tick_timeout_ms' is how long the loop may go without finishing a pass, and 'input_timeout_ms' how long it
+           may go without a fresh input sample. With a 'motor_writer', a command that keeps the writer thread busy
+           for longer than the tick timeout counts as a missed tick too. 'clock' stands in for time.monotonic(), and
+           has to be left alone when there's a motor writer."""
+
+        self._motor_controller = motor_controller
+        self._motor_writer = motor_writer
+        self._clock = clock
+        self.tick_timeout = tick_timeout_ms / 1000.0
+        self.input_timeout = input_timeout_ms / 1000.0
+        # How often the thread checks. A stop comes at most this long after a deadline passes.
+        self.period = min(self.tick_timeout, self.input_timeout) / 4
+
+        # Stamps of the last finished pass and the last input sample. Nothing is checked until they're set.
+        self._last_tick = None
+        self._last_input = None
+        self._tick_late = False
+        self._writer_late = False
+        self._input_late = False
+
+        # Counters. Each deadline is counted once per lapse, however long it lasts.
+        self.missed_ticks = 0
+        self.missed_inputs = 0
+        self.trips = 0
+        self.tripped = False
+
+        self._stop = threading.Event()
+        self._thread = None
+
+    def arm(self, now=None):
+        """Starts both deadlines from 'now'."""
+
+        now = self._clock() if now is None else now
+        self._last_tick = now
+        self._last_input = now
+
+    def feed_tick(self, now):
+        """Marks a finished pass of the control loop at 'now'."""
+
+        if self._tick_late:
+            # The pass that missed its deadline may have sent commands after the motors were cut.
+            self._motor_controller.emergency_stop()
+
+        self._last_tick = now
+        self._tick_late = False
+        if not self._input_late and not self._writer_late:
+            self.tripped = False
+
+    def feed_input(self, now):
+        """Marks a fresh input sample taken at 'now'."""
+
+        self._last_input = now
+        self._input_late = False
+        if not self._tick_late and not self._writer_late:
+            self.tripped = False
+
+    def check(self, now=None):
+        """Checks both deadlines at 'now', and cuts the motors when either one is first missed. A command that held
+           up the motor writer gets them cut once more when it finally finishes, since it may have written after the
+           cut. Returns 'True' if a deadline has passed."""
+
+        now = self._clock() if now is None else now
+
+        tick_late = self._last_tick is not None and now - self._last_tick > self.tick_timeout
+        writer_late = False
+        if self._motor_writer is not None:
+            busy_since = self._motor_writer.busy_since
+            writer_late = busy_since is not None and now - busy_since > self.tick_timeout
+        input_late = self._last_input is not None and now - self._last_input > self.input_timeout
+
+        if (tick_late or writer_late) and not (self._tick_late or self._writer_late):
+            self.missed_ticks += 1
+        if input_late and not self._input_late:
+            self.missed_inputs += 1
+        writer_done = self._writer_late and not writer_late
+        self._tick_late = tick_late
+        self._writer_late = writer_late
+        self._input_late = input_late
+
+        late = tick_late or writer_late or input_late
+        if late and not self.tripped:
+            self.tripped = True
+            self.trips += 1
+            self._motor_controller.emergency_stop()
+        elif writer_done:
+            self._motor_controller.emergency_stop()
+
+        return late
+
+    def start(self):
+        """Arms the deadlines and starts checking them on a background thread."""
+
+        if self._thread is not None:
+            return
+
+        self.arm()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="watchdog", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stops the background thread."""
+
+        if self._thread is None:
+            return
+
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+
+    def _run(self):
+        """Checks the deadlines every period until stopped."""
+
+        while not self._stop.wait(self.period):
+            self.check()
+
+    def get_stats(self):
+        """Returns the watchdog's counters as a dictionary."""
+
+        return {"missed_ticks": self.missed_ticks, "missed_inputs": self.missed_inputs, "trips": self.trips,
+                "tripped": self.tripped}
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+
+import unittest
+import os
+import random
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from spoolbot import debounce
+from spoolbot import dispatch
+
+SETTLE = 0.02
+
+
+def bounce(at, level, flips, gap=0.001):
+    """Returns the (time, level) transitions of a contact that bounces 'flips' times, 'gap' seconds apart, before it
+       stays at 'level'."""
+
+    transitions = []
+    for i in range(flips):
+        transitions.append((at + i * gap, level if i % 2 == 0 else 1 - level))
+    transitions.append((at + flips * gap, level))
+
+    return transitions
+
+
+def level_at(transitions, t):
+    """Returns the level of a waveform at time 't'. The waveform starts low."""
+
+    level = 0
+    for at, new_level in transitions:
+        if at > t:
+            break
+        level = new_level
+
+    return level
+
+
+def run(debouncer, waveforms, times):
+    """Samples {bit: transitions} waveforms at 'times' and feeds them to 'debouncer'. Returns the (time, bit, "down"
+       or "up") edges that came out."""
+
+    edges = []
+    for t in times:
+        raw = 0
+        for bit, transitions in waveforms.items():
+            if level_at(transitions, t):
+                raw |= bit
+        debouncer.update(raw, t)
+
+        for bit in waveforms:
+            if debouncer.pressed & bit:
+                edges.append((t, bit, "down"))
+            if debouncer.released & bit:
+                edges.append((t, bit, "up"))
+
+    return edges
+
+
+def sample_times(rate, length=1.0):
+    """Returns evenly spaced sample times."""
+
+    return [i / rate for i in range(int(length * rate))]
+
+
+class TestDebouncer(unittest.TestCase):
+    """Feed synthetic bounce waveforms to the debouncer at different sample rates"""
+
+    def setUp(self):
+        # A press at 0.2 s and a release at 0.6 s, each bouncing for 5 ms
+        self.press = bounce(0.2, 1, 6) + bounce(0.6, 0, 6)
+
+    def test_one_edge_per_bouncy_change(self):
+        """Sampled at 1 kHz, a bouncing press and release each give exactly one edge, one settle window after the
+           bouncing stops"""
+
+        edges = run(debounce.Debouncer(SETTLE), {1: self.press}, sample_times(1000))
+
+        self.assertEqual([edge[2] for edge in edges], ["down", "up"])
+        self.assertAlmostEqual(edges[0][0], 0.206 + SETTLE, delta=0.0015)
+        self.assertAlmostEqual(edges[1][0], 0.606 + SETTLE, delta=0.0015)
+
+    def test_any_sample_rate(self):
+        """The same waveform gives the same edges at 60 Hz, 250 Hz and with uneven sample spacing"""
+
+        jitter = random.Random(4)
+        jittery = sorted(jitter.uniform(0.0, 1.0) for i in range(400))
+
+        for times in (sample_times(60), sample_times(250), jittery):
+            edges = run(debounce.Debouncer(SETTLE), {1: self.press}, times)
+            self.assertEqual([edge[2] for edge in edges], ["down", "up"])
+            self.assertGreaterEqual(edges[0][0], 0.206 + SETTLE)
+
+    def test_glitch_is_ignored(self):
+        """A spike shorter than the settle window never shows up"""
+
+        spike = [(0.3, 1), (0.305, 0)]
+        debouncer = debounce.Debouncer(SETTLE)
+
+        self.assertEqual(run(debouncer, {1: spike}, sample_times(1000)), [])
+        self.assertEqual(debouncer.stable, 0)
+
+    def test_buttons_settle_on_their_own(self):
+        """Each bit keeps its own settle window, so one button changing doesn't hold up another"""
+
+        debouncer = debounce.Debouncer(SETTLE, windows={dispatch.BTN_CW: 0.05})
+        waveforms = {dispatch.BTN_FWD: bounce(0.1, 1, 4), dispatch.BTN_CW: bounce(0.1, 1, 4)}
+
+        edges = run(debouncer, waveforms, sample_times(1000))
+
+        self.assertEqual([edge[1] for edge in edges], [dispatch.BTN_FWD, dispatch.BTN_CW])
+        self.assertAlmostEqual(edges[0][0], 0.104 + SETTLE, delta=0.0015)
+        self.assertAlmostEqual(edges[1][0], 0.104 + 0.05, delta=0.0015)
+
+    def test_next_settle(self):
+        """The debouncer says when a waiting change will count"""
+
+        debouncer = debounce.Debouncer(SETTLE)
+        self.assertIsNone(debouncer.next_settle())
+
+        debouncer.update(1, 1.0)
+        self.assertAlmostEqual(debouncer.next_settle(), 1.0 + SETTLE)
+        self.assertEqual(debouncer.update(1, 1.0 + SETTLE), 1)
+        self.assertIsNone(debouncer.next_settle())
+
+    def test_no_window_passes_straight_through(self):
+        """Without a settle window, every change counts on the sample it's seen on"""
+
+        debouncer = debounce.Debouncer()
+        self.assertEqual(debouncer.update(5, 0.0), 5)
+        self.assertEqual(debouncer.pressed, 5)
+        self.assertEqual(debouncer.update(4, 0.0), 4)
+        self.assertEqual(debouncer.released, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
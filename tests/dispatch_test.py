@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+
+import unittest
+import os
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from spoolbot import constants
+from spoolbot import dispatch
+from spoolbot import emulator
+from spoolbot import motorcontrol
+
+
+class TestDispatch(unittest.TestCase):
+    """Test the input bit tables and the precomputed drive commands"""
+
+    def setUp(self):
+        self.mc = motorcontrol.MotorController(motor_hat=emulator.EmulatedMotorHAT(), verbose=False)
+        self.mc.add_drive_motor()
+        self.mc.add_drive_motor(side="right", index=4, trim=5)
+        self.table = dispatch.DispatchTable(self.mc)
+
+    def test_every_combination_has_an_entry(self):
+        """Invalid button combinations stop every drive motor"""
+
+        for bits in range(dispatch.MOVE_MASK + 1):
+            direction, vector = self.table.lookup(bits)
+            self.assertEqual(direction, dispatch.DIRECTIONS.get(bits, "stop"))
+            self.assertEqual(len(vector), 2)
+
+        direction, vector = self.table.lookup(dispatch.BTN_FWD | dispatch.BTN_BWD)
+        self.assertEqual(direction, "stop")
+        self.assertEqual([command[1] for command in vector], [constants.RELEASE, constants.RELEASE])
+
+    def test_trim_is_baked_in(self):
+        """Each motor's trim is added to its speed when the table is built"""
+
+        direction, vector = self.table.lookup(dispatch.BTN_FWD)
+        speeds = {motor.side: speed for motor, state, speed in vector}
+        self.assertEqual(speeds, {"left": self.mc.fwd_speed, "right": self.mc.fwd_speed + 5})
+
+    def test_pivots_match_the_controller(self):
+        """The pivot entries send the same commands as the MotorController's pivot methods"""
+
+        pivots = ((dispatch.BTN_LEFT, self.mc.drive_pivot_left), (dispatch.BTN_RIGHT, self.mc.drive_pivot_right))
+        for bits, pivot in pivots:
+            pivot()
+            direction, vector = self.table.lookup(bits)
+            self.assertEqual([(motor.target_state, motor.target_speed) for motor, state, speed in vector],
+                             [(state, speed) for motor, state, speed in vector], direction)
+
+        # Pivoting left runs the left side backward and the right side forward.
+        direction, vector = self.table.lookup(dispatch.BTN_LEFT)
+        self.assertEqual({motor.side: state for motor, state, speed in vector},
+                         {"left": constants.BACKWARD, "right": constants.FORWARD})
+
+    def test_spool_bits_are_ignored_by_lookup(self):
+        """Holding a spool button doesn't change the drive entry"""
+
+        self.assertEqual(self.table.lookup(dispatch.BTN_LEFT | dispatch.BTN_CW), self.table.lookup(dispatch.BTN_LEFT))
+
+    def test_hat_map_combines_diagonals(self):
+        """D-pad diagonals get both of their direction bits"""
+
+        hat_bits = dispatch.compile_hat_map(constants.BTN_NUMS)
+        self.assertEqual(len(hat_bits), 9)
+        self.assertEqual(hat_bits[(0, 0)], 0)
+        self.assertEqual(dispatch.direction_for(hat_bits[(1, 1)]), "fwd_right")
+        self.assertEqual(dispatch.direction_for(hat_bits[(-1, -1)]), "bwd_left")
+
+    def test_next_spin(self):
+        """Spool buttons start a stopped spool and stop a moving one"""
+
+        self.assertEqual(dispatch.next_spin("stop", dispatch.BTN_CCW), "ccw")
+        self.assertEqual(dispatch.next_spin("cw", dispatch.BTN_CCW), "stop")
+        self.assertEqual(dispatch.next_spin("cw", 0), "cw")
+        self.assertEqual(dispatch.next_spin("stop", dispatch.SPOOL_MASK), "stop")
+
+    def test_next_spin_on_press_only(self):
+        """With the pressed bits given, a held spool button leaves the spool alone"""
+
+        self.assertEqual(dispatch.next_spin("cw", dispatch.BTN_CW, dispatch.BTN_FWD), "cw")
+        self.assertEqual(dispatch.next_spin("cw", dispatch.BTN_CW, dispatch.BTN_CW), "stop")
+        self.assertEqual(dispatch.next_spin("cw", dispatch.SPOOL_MASK, dispatch.BTN_CCW), "stop")
+
+
+if __name__ == '__main__':
+    unittest.main()
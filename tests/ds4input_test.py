@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+
+import unittest
+from helpers import run_python
+
+# Waits for a key press posted from another thread. pygame only runs in a fresh interpreter, so its display and event
+# queue don't leak into other tests.
+WAIT_FOR_PRESS = (
+    "import json, threading, time\n"
+    "from spoolbot import ds4input\n"
+    "source = ds4input.PygameEvents(wait_for_input=True, axes=False)\n"
+    "pygame = ds4input.pygame\n"
+    "pygame.event.clear()\n"
+    "idle = [source.wait(0.0), source.wait(0.01)]\n"
+    "def press():\n"
+    "    time.sleep(0.05)\n"
+    "    pygame.event.post(pygame.event.Event(pygame.KEYDOWN, key=pygame.K_q))\n"
+    "    pygame.event.post(pygame.event.Event(pygame.KEYUP, key=pygame.K_q))\n"
+    "threading.Thread(target=press).start()\n"
+    "start = time.perf_counter()\n"
+    "woke = source.wait(5.0)\n"
+    "elapsed = time.perf_counter() - start\n"
+    "time.sleep(0.05)\n"
+    "print(json.dumps({'idle': idle, 'woke': woke, 'elapsed': elapsed, 'events': source.poll(),\n"
+    "                  'driven': source.event_driven, 'axes': pygame.event.get_blocked(pygame.JOYAXISMOTION),\n"
+    "                  'q': pygame.K_q}))\n")
+
+
+class TestPygameEvents(unittest.TestCase):
+    """Turn pygame's events into plain tuples"""
+
+    def test_controller_removed(self):
+        """A controller going away comes out as a "removed" event on pygame 2"""
+
+        report = run_python(
+            "import json\n"
+            "from spoolbot import ds4input\n"
+            "source = ds4input.PygameEvents()\n"
+            "pygame = ds4input.pygame\n"
+            "pygame.event.clear()\n"
+            "pygame.event.post(pygame.event.Event(pygame.JOYDEVICEREMOVED, instance_id=0))\n"
+            "print(json.dumps({'events': source.poll()}))\n")
+
+        self.assertEqual(report["events"], [["removed", 0, 0]])
+
+    def test_other_events_without_removal(self):
+        """Without pygame 2's JOYDEVICEREMOVED, like on pygame 1, events that aren't input are still skipped"""
+
+        report = run_python(
+            "import json\n"
+            "from spoolbot import ds4input\n"
+            "pygame = ds4input.load_pygame()\n"
+            "del pygame.JOYDEVICEREMOVED\n"
+            "source = ds4input.PygameEvents()\n"
+            "pygame.event.clear()\n"
+            "pygame.event.post(pygame.event.Event(pygame.USEREVENT))\n"
+            "pygame.event.post(pygame.event.Event(pygame.KEYDOWN, key=pygame.K_e))\n"
+            "print(json.dumps({'events': source.poll(), 'e': pygame.K_e}))\n")
+
+        self.assertEqual(report["events"], [["key_down", report["e"], 1]])
+
+    def test_alive_follows_joystick_count(self):
+        """alive() says the controller is gone once pygame no longer counts any joystick"""
+
+        report = run_python(
+            "import json\n"
+            "from spoolbot import ds4input\n"
+            "source = ds4input.PygameEvents()\n"
+            "keyboard_only = source.alive()\n"
+            "# There's no joystick on a test machine, so one that was there at the start has gone.\n"
+            "source.controller_present = True\n"
+            "print(json.dumps({'keyboard_only': keyboard_only, 'lost': source.alive(),\n"
+            "                  'count': ds4input.pygame.joystick.get_count()}))\n")
+
+        self.assertTrue(report["keyboard_only"])
+        self.assertEqual(report["count"], 0)
+        self.assertFalse(report["lost"])
+
+
+class TestPygameWait(unittest.TestCase):
+    """Sleep in PygameEvents.wait() until input comes in"""
+
+    def test_wait_wakes_on_input(self):
+        """wait() hands pygame the timeout, wakes for an event posted from another thread, and the event comes out
+           with the rest of its batch"""
+
+        report = run_python(WAIT_FOR_PRESS)
+        self.assertEqual(report["idle"], [False, False])
+        self.assertTrue(report["woke"])
+        self.assertLess(report["elapsed"], 2.0)
+        self.assertEqual(report["events"], [["key_down", report["q"], 1], ["key_up", report["q"], 0]])
+        self.assertTrue(report["driven"])
+        self.assertTrue(report["axes"])
+
+    def test_waiting_needs_pygame_2(self):
+        """On pygame 1, where event.wait() can't take a timeout, waiting for input is refused up front"""
+
+        report = run_python(
+            "import json\n"
+            "from spoolbot import ds4input\n"
+            "ds4input.load_pygame()\n"
+            "ds4input._WAIT_TIMEOUT = False\n"
+            "try:\n"
+            "    ds4input.PygameEvents(wait_for_input=True)\n"
+            "    error = None\n"
+            "except RuntimeError as refused:\n"
+            "    error = str(refused)\n"
+            "polling = ds4input.PygameEvents().event_driven\n"
+            "print(json.dumps({'error': error, 'polling': polling}))\n")
+
+        self.assertIn("pygame 2", report["error"])
+        self.assertIn("--input pygame", report["error"])
+        self.assertFalse(report["polling"])
+
+
+if __name__ == '__main__':
+    unittest.main()
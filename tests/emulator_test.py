@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+
+import unittest
+import os
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from spoolbot import constants
+from spoolbot import emulator
+
+
+class TestEmulatedPCA9685(unittest.TestCase):
+    """Test the register model of the emulated PWM chip"""
+
+    def setUp(self):
+        self.ticks = 0
+        self.chip = emulator.EmulatedPCA9685(clock=self.clock)
+
+    def clock(self):
+        self.ticks += 1
+        return self.ticks
+
+    def test_block_write_needs_auto_increment(self):
+        """Without auto-increment, every byte of a block lands in the same register"""
+
+        self.chip.writeList(emulator.LED0_ON_L, [1, 2, 3])
+        self.assertEqual(self.chip.registers[emulator.LED0_ON_L], 3)
+
+        self.chip.write8(emulator.MODE1, emulator.MODE1_AI)
+        self.chip.writeList(emulator.LED0_ON_L, [1, 2, 3])
+        self.assertEqual(list(self.chip.registers[emulator.LED0_ON_L:emulator.LED0_ON_L + 3]), [1, 2, 3])
+
+    def test_all_led_broadcast(self):
+        """Writing ALL_LED_OFF_H turns every pin fully off"""
+
+        self.chip.write8(emulator.MODE1, emulator.MODE1_AI)
+        self.chip.writeList(emulator.LED0_ON_L, [0, 0x10, 0, 0] * 16)
+        self.assertEqual(self.chip.pin_duty(5), 4096)
+
+        self.chip.write8(emulator.ALL_LED_ON_L + 3, emulator.FULL_BIT)
+        for pin in range(emulator.PIN_COUNT):
+            self.assertEqual(self.chip.pin_duty(pin), 0)
+
+    def test_log_is_timestamped(self):
+        """Every transaction is logged in order with a timestamp"""
+
+        self.chip.write8(emulator.MODE2, 0)
+        self.chip.readU8(emulator.MODE2)
+
+        self.assertEqual(self.chip.log, [(1, "write", emulator.MODE2, b"\x00"), (2, "read", emulator.MODE2, b"\x00")])
+
+    def test_motor_hat_round_trip(self):
+        """The Adafruit library drives the emulated chip like the real one"""
+
+        hat = emulator.EmulatedMotorHAT()
+        hat.getMotor(2).setSpeed(100)
+        hat.getMotor(2).run(constants.BACKWARD)
+
+        self.assertEqual(hat.chip.motor_state(2), (constants.BACKWARD, 100))
+
+    def test_robot_controller(self):
+        """make_controller() puts the robot's drive and spool motors on an emulated chip"""
+
+        mc = emulator.make_controller()
+        mc.drive_forward()
+        mc.spool_clockwise()
+
+        self.assertEqual([index for index, motor in mc.drive_motors.items() if motor is not None], [1, 4])
+        self.assertEqual([index for index, motor in mc.spool_motors.items() if motor is not None], [3])
+        for index in (1, 4):
+            self.assertEqual(mc._motor_hat.chip.motor_state(index), (constants.FORWARD, mc.fwd_speed))
+        self.assertEqual(mc._motor_hat.chip.motor_state(3), (constants.FORWARD, mc.spool_speed))
+
+
+if __name__ == '__main__':
+    unittest.main()
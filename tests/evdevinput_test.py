@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+
+import unittest
+import os
+import sys
+import threading
+from time import monotonic
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from spoolbot import clock
+from spoolbot import constants
+from spoolbot import ds4input
+from spoolbot import emulator
+from spoolbot import evdevinput as ev
+from spoolbot import scheduler
+from spoolbot import telemetry
+
+
+def pack(event_type, code, value):
+    """Returns one input_event struct."""
+
+    return ev.EVENT.pack(1000, 250, event_type, code, value)
+
+
+def report(*events):
+    """Returns the structs for a report of (type, code, value) events, ended by a SYN_REPORT."""
+
+    return b"".join(pack(*event) for event in events) + pack(ev.EV_SYN, ev.SYN_REPORT, 0)
+
+
+class LoopDone(Exception):
+    """Raised from the test event source's wait to end a control loop."""
+
+
+class ScriptedEvents(ev.EvdevEvents):
+    """Reads from a pipe, and writes the next report into it each time the control loop waits."""
+
+    def __init__(self, read_fd, write_fd, reports):
+        super().__init__(read_fd)
+        self._write_fd = write_fd
+        self._reports = list(reports)
+        self.timeouts = []
+        self.clock = None
+
+    def wait(self, timeout=None):
+        self.timeouts.append(timeout)
+        if not self._reports:
+            raise LoopDone()
+
+        # Stand in for the time passing while asleep.
+        self.clock.sleep(timeout if timeout is not None else 1.0)
+        data = self._reports.pop(0)
+        if data:
+            os.write(self._write_fd, data)
+        return bool(data)
+
+
+class TestEvdevEvents(unittest.TestCase):
+    """Feed input_event structs to EvdevEvents through a pipe"""
+
+    def setUp(self):
+        self.read_fd, self.write_fd = os.pipe()
+        self.source = ev.EvdevEvents(self.read_fd)
+
+    def tearDown(self):
+        self.source.close()
+        if self.write_fd is not None:
+            os.close(self.write_fd)
+
+    def send(self, data):
+        os.write(self.write_fd, data)
+
+    def test_buttons_are_numbered_like_sdl(self):
+        """L1 and R1 come out as buttons 4 and 5, the spool buttons in constants.BTN_NUMS. Key repeats are dropped"""
+
+        self.send(report((ev.EV_KEY, ev.BTN_TL, 1)))
+        self.assertEqual(self.source.poll(), [("button_down", constants.BTN_CW, 1)])
+
+        self.send(report((ev.EV_KEY, ev.BTN_TL, ev.KEY_REPEAT), (ev.EV_KEY, ev.BTN_TR, 1), (ev.EV_KEY, ev.BTN_TL, 0)))
+        self.assertEqual(self.source.poll(), [("button_down", constants.BTN_CCW, 1),
+                                              ("button_up", constants.BTN_CW, 0)])
+        self.assertEqual(self.source.button_count, 13)
+
+    def test_reports_come_out_whole(self):
+        """Nothing comes out until its report ends, even when a struct is split across reads"""
+
+        data = report((ev.EV_KEY, ev.BTN_SOUTH, 1))
+        self.send(data[:ev.EVENT.size + 5])
+        self.assertEqual(self.source.poll(), [])
+
+        self.send(data[ev.EVENT.size + 5:])
+        self.assertEqual(self.source.poll(), [("button_down", 0, 1)])
+
+    def test_hat_matches_pygame(self):
+        """Up is positive like in pygame, and both halves of a diagonal come out as one hat event"""
+
+        self.send(report((ev.EV_ABS, ev.ABS_HAT0Y, -1)))
+        self.assertEqual(self.source.poll(), [("hat", 0, constants.BTN_UP)])
+
+        self.send(report((ev.EV_ABS, ev.ABS_HAT0X, 1), (ev.EV_ABS, ev.ABS_HAT0Y, 0)))
+        self.assertEqual(self.source.poll(), [("hat", 0, constants.BTN_RGT)])
+
+        # A report that doesn't move the hat says nothing about it.
+        self.send(report((ev.EV_KEY, ev.BTN_NORTH, 1)))
+        self.assertEqual(self.source.poll(), [("button_down", 2, 1)])
+
+    def test_axes_are_scaled(self):
+        """Axes come out from -1 to 1, numbered like in pygame"""
+
+        self.send(report((ev.EV_ABS, ev.ABS_X, 0), (ev.EV_ABS, ev.ABS_Y, 255), (ev.EV_ABS, ev.ABS_RX, 128)))
+        events = self.source.poll()
+
+        self.assertEqual([event[:2] for event in events], [("axis", constants.STICK_AXIS_X),
+                                                           ("axis", constants.STICK_AXIS_Y), ("axis", 3)])
+        self.assertAlmostEqual(events[0][2], -1.0)
+        self.assertAlmostEqual(events[1][2], 1.0)
+        self.assertAlmostEqual(events[2][2], 0.0, places=2)
+
+    def test_dropped_events_let_go(self):
+        """When the kernel drops events, everything held is let go"""
+
+        self.send(report((ev.EV_KEY, ev.BTN_TL, 1), (ev.EV_ABS, ev.ABS_HAT0Y, -1)))
+        self.source.poll()
+
+        self.send(pack(ev.EV_KEY, ev.BTN_TR, 1) + pack(ev.EV_SYN, ev.SYN_DROPPED, 0))
+        self.assertEqual(self.source.poll(), [("button_up", constants.BTN_CW, 0), ("hat", 0, (0, 0))])
+
+    def test_device_going_away(self):
+        """The end of the stream is reported once, then the source goes quiet"""
+
+        self.send(report((ev.EV_KEY, ev.BTN_TL, 1)))
+        os.close(self.write_fd)
+        self.write_fd = None
+
+        self.assertEqual(self.source.poll(), [("button_down", constants.BTN_CW, 1), ("removed", 0, 0)])
+        self.assertIsNone(self.source.fileno())
+        # The descriptor was closed along with it.
+        with self.assertRaises(OSError):
+            os.fstat(self.read_fd)
+        self.assertEqual(self.source.poll(), [])
+        self.assertFalse(self.source.wait(0.0))
+
+    def test_wait_after_device_is_gone(self):
+        """Waiting with no timeout on a device that has gone away returns within a frame instead of hanging"""
+
+        os.close(self.write_fd)
+        self.write_fd = None
+        self.source.poll()
+
+        result = []
+        waiter = threading.Thread(target=lambda: result.append(self.source.wait(None)), daemon=True)
+        started = monotonic()
+        waiter.start()
+        waiter.join(2.0)
+
+        self.assertFalse(waiter.is_alive())
+        self.assertEqual(result, [False])
+        self.assertLess(monotonic() - started, 1.0)
+
+    def test_wait_wakes_on_input(self):
+        """wait() times out with nothing to read, and returns as soon as there is"""
+
+        self.assertFalse(self.source.wait(0.01))
+        self.send(report((ev.EV_KEY, ev.BTN_TL, 1)))
+        self.assertTrue(self.source.wait(1.0))
+
+
+class TestDS4OverEvdev(unittest.TestCase):
+    """Drive DS4Controller from an event device"""
+
+    def setUp(self):
+        self.clock = clock.VirtualClock()
+        self.use_controller("stopping")
+        self.scheduler = scheduler.LoopScheduler(clock=self.clock, sleep_func=self.no_polling)
+        self.read_fd, self.write_fd = os.pipe()
+        self.source = None
+
+    def tearDown(self):
+        if self.write_fd is not None:
+            os.close(self.write_fd)
+        # The source closes the read end itself once the device goes away.
+        if self.source is not None:
+            self.source.close()
+        else:
+            os.close(self.read_fd)
+        self.mc.release_all()
+
+    def use_controller(self, motion_profile):
+        """Makes the motor controller on an emulated MotorHAT, with the given motion profile."""
+
+        self.mc = emulator.make_controller(clock=self.clock, motion_profile=motion_profile)
+        self.chip = self.mc._motor_hat.chip
+
+    def no_polling(self, seconds):
+        self.fail("An event-driven loop shouldn't sleep on the scheduler")
+
+    def test_buttons_reach_motors(self):
+        """The D-pad drives and L1 turns the spool, then losing the device lets go of both"""
+
+        source = self.source = ev.EvdevEvents(self.read_fd)
+        remote = ds4input.DS4Controller(self.mc, loop_scheduler=self.scheduler, event_source=source, clock=self.clock)
+        remote.start_scanning()
+
+        os.write(self.write_fd, report((ev.EV_ABS, ev.ABS_HAT0Y, -1), (ev.EV_KEY, ev.BTN_TL, 1)))
+        remote.poll_events()
+        remote.move_spool()
+        remote.run_movement()
+
+        self.assertEqual(self.chip.motor_state(1), (constants.FORWARD, self.mc.fwd_speed))
+        self.assertEqual(self.chip.motor_state(3), (constants.FORWARD, self.mc.spool_speed))
+        self.assertEqual(remote.input_fileno(), self.read_fd)
+
+        # There's no keyboard control on an event device, so the keyboard help isn't shown.
+        view = telemetry.TelemetryView()
+        view.publish(remote.telemetry_snapshot())
+        lines = view.render()
+        self.assertNotIn(telemetry.CONTROLS[1], lines)
+        self.assertFalse([line for line in lines if line.startswith("Keys:")])
+
+        os.close(self.write_fd)
+        self.write_fd = None
+        self.assertTrue(remote.poll_events())
+        remote.determine_direction()
+        self.assertEqual(remote.input_bits(), 0)
+        self.assertIsNone(remote.input_fileno())
+        self.assertEqual(remote.telemetry_snapshot()["direction"], "stop")
+
+    def test_loop_sleeps_until_input(self):
+        """scan_events() waits on the device with no timeout while idle, and wakes every frame while ramping"""
+
+        self.mc.release_all()
+        self.use_controller("trapezoid")
+        source = self.source = ScriptedEvents(self.read_fd, self.write_fd, [
+            report((ev.EV_ABS, ev.ABS_HAT0Y, -1)), b"", report((ev.EV_ABS, ev.ABS_HAT0Y, 0)), b"", b""])
+        source.clock = self.clock
+        remote = ds4input.DS4Controller(self.mc, loop_scheduler=self.scheduler, event_source=source, clock=self.clock)
+
+        with self.assertRaises(LoopDone):
+            remote.scan_events()
+
+        period = self.scheduler.period
+        # Idle, then ramping up to speed, then ramping down after the release, then idle again
+        self.assertEqual(source.timeouts, [None, period, period, period, period, None])
+        self.assertFalse(self.mc.is_ramping())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,20 @@
+# Helpers shared by the test modules.
+
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+
+def run_python(code):
+    """Runs 'code' in a fresh interpreter from the repo root and returns the JSON object it printed."""
+
+    env = dict(os.environ, SDL_VIDEODRIVER="dummy", SDL_AUDIODRIVER="dummy", PYGAME_HIDE_SUPPORT_PROMPT="1")
+    result = subprocess.run([sys.executable, "-c", code], cwd=ROOT, env=env, stdout=subprocess.PIPE,
+                            stderr=subprocess.PIPE, universal_newlines=True, check=True)
+    # The package prints a goodbye message at exit, so look for the line holding the report.
+    for line in result.stdout.splitlines():
+        if line.startswith("{"):
+            return json.loads(line)
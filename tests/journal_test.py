@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+
+import unittest
+import contextlib
+import io
+import os
+import sys
+import tempfile
+from time import perf_counter
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from spoolbot import clock
+from spoolbot import constants
+from spoolbot import ds4input
+from spoolbot import emulator
+from spoolbot import fakegpio
+from spoolbot import journal
+from spoolbot import robotinput
+from spoolbot import scheduler
+from spoolbot import telemetry
+
+
+def make_pipeline(replay_clock):
+    """Returns a motor controller on an emulated MotorHAT and a loop scheduler, both running on 'replay_clock'."""
+
+    mc = emulator.make_controller(clock=replay_clock)
+    return mc, scheduler.LoopScheduler(clock=replay_clock, sleep_func=replay_clock.sleep)
+
+
+class TestGPIOJournal(unittest.TestCase):
+    """Record the button remote's pin changes and replay them on a virtual clock"""
+
+    def setUp(self):
+        fakegpio.cleanup()
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.dir.name, "session.journal")
+
+    def tearDown(self):
+        fakegpio.cleanup()
+        self.dir.cleanup()
+
+    def record_session(self, presses, length):
+        """Polls a fake GPIO remote for 'length' ticks. 'presses' maps a tick to the (pin, level) set on it."""
+
+        virtual = clock.VirtualClock()
+        mc, loop_scheduler = make_pipeline(virtual)
+        remote = robotinput.RemoteControl(mc, loop_scheduler=loop_scheduler, gpio=fakegpio, clock=virtual)
+        remote.journal = journal.JournalWriter(self.path, remote.journal_header(), clock=virtual)
+
+        for tick in range(length):
+            if tick in presses:
+                fakegpio.set_input(*presses[tick])
+            remote.poll_events()
+            loop_scheduler.wait()
+
+        remote.journal.close()
+        mc.release_all()
+
+    def replay_session(self):
+        """Replays the journal. Returns the motor controller, its emulated chip and the number of ticks run."""
+
+        header, events = journal.load(self.path)
+        virtual = clock.VirtualClock()
+        mc, loop_scheduler = make_pipeline(virtual)
+        source = journal.ReplaySource(events, header, clock=virtual)
+        remote = journal.make_remote(header, mc, source, loop_scheduler, virtual)
+        ticks = journal.replay(remote, mc, source, loop_scheduler, virtual)
+
+        return mc, mc._motor_hat.chip, ticks
+
+    def test_pin_changes_are_written_with_times(self):
+        """Only changes are written, stamped relative to the start of the recording"""
+
+        self.record_session({10: (constants.PIN_FWD, 1), 40: (constants.PIN_FWD, 0)}, 60)
+
+        header, events = journal.load(self.path)
+        self.assertEqual(header["source"], "gpio")
+        self.assertEqual([event[1:] for event in events],
+                         [("pin", constants.PIN_FWD, 1), ("pin", constants.PIN_FWD, 0)])
+        self.assertAlmostEqual(events[0][0], 10 / constants.LOOP_RATE)
+        self.assertAlmostEqual(events[1][0], 40 / constants.LOOP_RATE)
+
+    def test_held_button_drives_motors(self):
+        """A button still held at the end of the journal leaves the robot driving forward"""
+
+        self.record_session({5: (constants.PIN_FWD, 1)}, 30)
+
+        mc, chip, ticks = self.replay_session()
+        self.assertEqual(chip.motor_state(1), (constants.FORWARD, mc.fwd_speed))
+        self.assertEqual(chip.motor_state(4), (constants.FORWARD, mc.fwd_speed))
+        mc.release_all()
+
+    def test_replay_is_deterministic(self):
+        """Replaying the same journal twice makes the same bus writes at the same virtual times, and runs until the
+           motors have stopped"""
+
+        self.record_session({10: (constants.PIN_FWD, 1), 40: (constants.PIN_FWD, 0), 50: (constants.PIN_CW, 1),
+                             55: (constants.PIN_CW, 0)}, 60)
+
+        first_mc, first_chip, first_ticks = self.replay_session()
+        second_mc, second_chip, second_ticks = self.replay_session()
+
+        self.assertEqual(first_chip.log, second_chip.log)
+        self.assertEqual(first_ticks, second_ticks)
+        self.assertGreater(first_ticks, 40)
+        self.assertFalse(first_mc.is_ramping())
+        self.assertEqual(first_chip.motor_state(1)[0], constants.RELEASE)
+        self.assertEqual(first_chip.motor_state(3)[0], constants.FORWARD)
+        first_mc.release_all()
+        second_mc.release_all()
+
+
+class TestDS4Journal(unittest.TestCase):
+    """Replay DS4 events through DS4Controller without pygame delivering them"""
+
+    def setUp(self):
+        self.virtual = clock.VirtualClock()
+        self.mc, self.scheduler = make_pipeline(self.virtual)
+
+    def tearDown(self):
+        self.mc.release_all()
+
+    def test_events_pass_through_to_the_journal(self):
+        """Events handed to the controller are journaled as they were received, and load back the same"""
+
+        events = [(0.5, "hat", 0, constants.BTN_UP), (0.5, "button_down", constants.BTN_CW, 1),
+                  (1.0, "hat", 0, (0, 0))]
+        source = journal.ReplaySource(events, {"buttons": 13, "hats": 1}, clock=self.virtual)
+        remote = ds4input.DS4Controller(self.mc, loop_scheduler=self.scheduler, event_source=source,
+                                        clock=self.virtual)
+
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, "ds4.journal")
+            remote.journal = journal.JournalWriter(path, remote.journal_header(), clock=self.virtual)
+            journal.replay(remote, self.mc, source, self.scheduler, self.virtual)
+            remote.journal.close()
+
+            header, recorded = journal.load(path)
+
+        self.assertEqual(header["hats"], 1)
+        self.assertEqual([event[1:] for event in recorded], [event[1:] for event in events])
+        for (expected, *_), (written, *_) in zip(events, recorded):
+            # The controller only looks once a tick, so events come up to one tick late.
+            self.assertGreaterEqual(written, expected)
+            self.assertLess(written, expected + 1.5 / constants.LOOP_RATE)
+
+    def test_dpad_and_keyboard_drive(self):
+        """D-pad and keyboard events from a journal reach the motors"""
+
+        pygame = ds4input.load_pygame()
+        events = [(0.1, "key_down", pygame.K_UP, 1), (0.5, "key_up", pygame.K_UP, 0),
+                  (0.6, "hat", 0, constants.BTN_UP)]
+        source = journal.ReplaySource(events, clock=self.virtual)
+        remote = ds4input.DS4Controller(self.mc, loop_scheduler=self.scheduler, event_source=source,
+                                        clock=self.virtual)
+        remote.start_scanning()
+
+        for tick in range(12):
+            remote.poll_events()
+            remote.move_spool()
+            remote.run_movement()
+            self.scheduler.wait()
+        self.assertEqual(remote.telemetry_snapshot()["keys"], ("up",))
+        view = telemetry.TelemetryView()
+        view.publish(remote.telemetry_snapshot())
+        lines = view.render()
+        self.assertIn("Keys:      up", lines)
+        self.assertEqual(lines[-len(telemetry.CONTROLS):], telemetry.CONTROLS)
+        self.assertEqual(self.mc._motor_hat.chip.motor_state(1), (constants.FORWARD, self.mc.fwd_speed))
+
+        journal.replay(remote, self.mc, source, self.scheduler, self.virtual)
+        self.assertEqual(remote.telemetry_snapshot()["keys"], ())
+        self.assertEqual(remote.telemetry_snapshot()["direction"], "fwd")
+
+
+class TestReplayCommand(unittest.TestCase):
+    """Run the replay command on a long journal"""
+
+    def test_faster_than_real_time(self):
+        """Five minutes of driving replays in a fraction of the time"""
+
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, "long.journal")
+            writer = journal.JournalWriter(path, {"source": "ds4", "controller": True, "buttons": 13, "hats": 1},
+                                           clock=lambda: 0.0)
+            for second in range(300):
+                writer.write(second, "hat", 0, constants.BTN_UP if second % 2 == 0 else (0, 0))
+            writer.close()
+
+            output = io.StringIO()
+            started = perf_counter()
+            with contextlib.redirect_stdout(output):
+                self.assertEqual(journal.main([path, "--profile", "trapezoid"]), 0)
+            elapsed = perf_counter() - started
+
+        print("\nFive minute journal replayed in {:.2f} s".format(elapsed))
+        self.assertIn("300 events replayed", output.getvalue())
+        self.assertLess(elapsed, 60.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
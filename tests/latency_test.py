@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+
+import unittest
+import os
+import sys
+from time import monotonic
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from spoolbot import emulator
+from spoolbot import latency
+from spoolbot import motorcontrol
+
+
+class TestLatencyHistogram(unittest.TestCase):
+    """Test the log-linear latency histogram"""
+
+    def test_percentiles_within_precision(self):
+        """Percentiles land within a bucket's width of the real value"""
+
+        histogram = latency.LatencyHistogram()
+        for i in range(1, 1001):
+            histogram.record(i / 1000000.0 * 100)  # 100 us to 100 ms
+
+        self.assertEqual(histogram.total, 1000)
+        self.assertAlmostEqual(histogram.percentile(50), 0.050, delta=0.050 * 0.07)
+        self.assertAlmostEqual(histogram.percentile(99), 0.099, delta=0.099 * 0.07)
+        self.assertAlmostEqual(histogram.percentile(100), 0.1)
+
+    def test_small_values_are_exact(self):
+        """Values below the first power of two split are kept exactly"""
+
+        histogram = latency.LatencyHistogram()
+        histogram.record(0.000007)
+        self.assertEqual(histogram.percentile(50), 0.000007)
+
+    def test_finer_resolution(self):
+        """A histogram with 100 ns resolution tells apart values a microsecond histogram would round to zero"""
+
+        histogram = latency.LatencyHistogram(resolution=0.0000001)
+        histogram.record(0.0000003)
+        histogram.record(0.0000009)
+        self.assertAlmostEqual(histogram.minimum(), 0.0000003)
+        self.assertAlmostEqual(histogram.percentile(100), 0.0000009)
+        self.assertAlmostEqual(histogram.mean(), 0.0000006)
+
+
+class TestMotorLatency(unittest.TestCase):
+    """Test matching input stamps to motor writes"""
+
+    def setUp(self):
+        self.mc = motorcontrol.MotorController(motor_hat=emulator.EmulatedMotorHAT(), verbose=False)
+        self.mc.add_drive_motor()
+        self.mc.latency = latency.LatencyTracker()
+
+    def test_write_records_latency(self):
+        """The first write after an input records one sample"""
+
+        self.mc.begin_input(monotonic() - 0.01)
+        self.mc.drive_forward()
+        self.mc.drive_forward()
+        self.mc.end_input()
+
+        histogram = self.mc.latency.histogram
+        self.assertEqual(histogram.total, 1)
+        self.assertGreaterEqual(histogram.percentile(100), 0.01)
+
+    def test_input_without_change_is_unmatched(self):
+        """Input that doesn't change a motor isn't matched to a later write"""
+
+        self.mc.begin_input(monotonic())
+        self.mc.drive_stop()
+        self.mc.end_input()
+        self.mc.drive_forward()
+
+        self.assertEqual(self.mc.latency.histogram.total, 0)
+        self.assertEqual(self.mc.latency.unmatched, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
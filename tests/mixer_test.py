@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+
+import unittest
+import os
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from spoolbot import constants
+from spoolbot import dispatch
+from spoolbot import emulator
+from spoolbot import mixer
+from spoolbot import motorcontrol
+
+
+class TestStickMixer(unittest.TestCase):
+    """Test turning stick positions into per-wheel commands"""
+
+    def setUp(self):
+        self.mc = motorcontrol.MotorController(motor_hat=emulator.EmulatedMotorHAT(), verbose=False)
+        self.mc.add_drive_motor()
+        self.mc.add_drive_motor(side="right", index=4, trim=10)
+        self.mixer = mixer.StickMixer(self.mc, deadzone=0.1, expo=0.0)
+
+    def wheels(self, x, y):
+        """Returns {side: (state, speed)} for a stick position."""
+
+        return {motor.side: (state, speed) for motor, state, speed in self.mixer.mix(x, y)}
+
+    def test_centered_stick_gives_nothing(self):
+        """Anything inside the deadzone counts as centered"""
+
+        self.assertIsNone(self.mixer.mix(0.05, -0.09))
+
+    def test_full_forward_is_trimmed(self):
+        """Full stick forward drives both sides at full speed plus their trim"""
+
+        self.assertEqual(self.wheels(0.0, -1.0), {"left": (constants.FORWARD, self.mc.fwd_speed),
+                                                  "right": (constants.FORWARD, self.mc.fwd_speed + 10)})
+
+    def test_full_right_pivots(self):
+        """Full stick right spins the sides in opposite directions"""
+
+        wheels = self.wheels(1.0, 0.0)
+        self.assertEqual(wheels["left"], (constants.FORWARD, self.mc.fwd_speed))
+        self.assertEqual(wheels["right"][0], constants.BACKWARD)
+
+    def test_pivots_match_the_dpad(self):
+        """The stick pushed fully to one side pivots the same way as the D-pad button for that side"""
+
+        table = dispatch.DispatchTable(self.mc)
+        for bits, x in ((dispatch.BTN_LEFT, -1.0), (dispatch.BTN_RIGHT, 1.0)):
+            direction, vector = table.lookup(bits)
+            dpad = {motor.side: state for motor, state, speed in vector}
+            stick = {side: state for side, (state, speed) in self.wheels(x, 0.0).items()}
+            self.assertEqual(stick, dpad, direction)
+
+    def test_speed_is_proportional(self):
+        """Half stick gives about half speed, and moving the stick further gives more speed"""
+
+        half = self.wheels(0.0, -0.55)["left"][1]
+        self.assertAlmostEqual(half, self.mc.fwd_speed / 2, delta=2)
+
+        speeds = [self.wheels(0.0, -value)["left"][1] for value in (0.2, 0.4, 0.6, 0.8, 1.0)]
+        self.assertEqual(speeds, sorted(speeds))
+
+    def test_expo_softens_the_middle(self):
+        """Expo gives less speed for the same small stick movement"""
+
+        soft = mixer.StickMixer(self.mc, deadzone=0.1, expo=0.5)
+        linear_speed = self.wheels(0.0, -0.4)["left"][1]
+        soft_speed = {motor.side: speed for motor, state, speed in soft.mix(0.0, -0.4)}["left"]
+        self.assertLess(soft_speed, linear_speed)
+
+
+if __name__ == '__main__':
+    unittest.main()
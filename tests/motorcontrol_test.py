@@ -1,11 +1,14 @@
 #!/usr/bin/env python3
 
 import unittest
-from spoolbot import motorcontrol as control
 import os
 import sys
-from Adafruit_MotorHAT import Adafruit_MotorHAT
+import tracemalloc
+from time import monotonic
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from spoolbot import motorcontrol as control
+from spoolbot import constants
+from spoolbot import emulator
 
 
 class TestMotorControl(unittest.TestCase):
@@ -14,15 +17,244 @@ class TestMotorControl(unittest.TestCase):
     def setUp(self):
         """Set up the motor controller"""
 
-        self.mc = control.MotorController()
-        self.mc.add_drive_motor()
+        self.mc = emulator.make_controller()
+        self.hat = self.mc._motor_hat
+        self.chip = self.hat.chip
 
     def tearDown(self):
-        self.motorHAT = Adafruit_MotorHAT(addr=0x60)
-        self.motorHAT.getMotor(1).run(Adafruit_MotorHAT.RELEASE)
-        self.motorHAT.getMotor(2).run(Adafruit_MotorHAT.RELEASE)
-        self.motorHAT.getMotor(3).run(Adafruit_MotorHAT.RELEASE)
-        self.motorHAT.getMotor(4).run(Adafruit_MotorHAT.RELEASE)
+        self.mc.release_all()
+        for index in range(1, 5):
+            self.assertEqual(self.chip.motor_state(index)[0], constants.RELEASE)
 
     def test_drive_forward(self):
         """Tests output of calling drive_forward"""
+
+        self.mc.drive_forward()
+
+        self.assertEqual(self.chip.motor_state(1), (constants.FORWARD, self.mc.fwd_speed))
+        self.assertEqual(self.chip.motor_state(4), (constants.FORWARD, self.mc.fwd_speed))
+        self.assertEqual(self.chip.motor_state(3)[0], constants.RELEASE)
+
+    def test_drive_stop_returns_right_away(self):
+        """drive_stop starts a ramp and update() finishes it"""
+
+        self.mc.drive_forward()
+        self.mc.drive_stop()
+
+        state, speed = self.chip.motor_state(1)
+        self.assertEqual(state, constants.FORWARD)
+        self.assertLess(speed, self.mc.fwd_speed)
+        self.assertTrue(self.mc.is_ramping())
+
+        now = monotonic()
+        while self.mc.is_ramping():
+            now += constants.STOPPING_INTERVAL
+            self.mc.update(now)
+
+        self.assertEqual(self.chip.motor_state(1), (constants.RELEASE, 0))
+
+    def test_new_command_cuts_ramp_short(self):
+        """Driving forward again while slowing down goes straight back to full speed"""
+
+        self.mc.drive_forward()
+        self.mc.drive_stop()
+        self.mc.drive_forward()
+
+        self.assertFalse(self.mc.is_ramping())
+        self.assertEqual(self.chip.motor_state(1), (constants.FORWARD, self.mc.fwd_speed))
+
+    def test_repeated_commands_skip_writes(self):
+        """Holding a command only writes to the MotorHAT once"""
+
+        self.mc.spool_clockwise()
+        self.mc.drive_forward()
+        issued = self.mc.writes_issued
+        self.chip.clear_log()
+
+        for _ in range(10):
+            self.mc.spool_clockwise()
+            self.mc.drive_forward()
+
+        self.assertEqual(self.mc.writes_issued, issued)
+        self.assertEqual(self.chip.transactions, 0)
+
+    def test_batched_update_is_one_transaction(self):
+        """All motors change in a single block write"""
+
+        self.chip.clear_log()
+        self.mc.drive_forward()
+
+        self.assertEqual(self.chip.transactions, 1)
+
+    def test_unbatched_matches_batched(self):
+        """The per-register path leaves the chip in the same state as the batched one"""
+
+        mc = emulator.make_controller(batch_writes=False)
+        hat = mc._motor_hat
+
+        for controller in (self.mc, mc):
+            controller.drive_pivot_left()
+            controller.spool_counterclockwise()
+
+        for index in range(1, 5):
+            self.assertEqual(hat.chip.motor_state(index), self.chip.motor_state(index))
+
+    def test_motor_groups(self):
+        """Motors are sorted into groups as they're added, and don't carry an attribute dictionary"""
+
+        self.assertEqual([motor.index for motor in self.mc._left_group], [1])
+        self.assertEqual([motor.index for motor in self.mc._right_group], [4])
+        self.assertEqual([motor.index for motor in self.mc._spool_group], [3])
+        self.assertEqual(self.mc.drive_stop(), self.mc._drive_group)
+        self.assertFalse(hasattr(self.mc.motors[1], "__dict__"))
+
+    def test_steady_tick_builds_nothing(self):
+        """Holding a command makes no lists or dictionaries. All a tick allocates is a few numbers and iterators that
+           are freed straight away"""
+
+        vector = tuple((motor, constants.FORWARD, self.mc.fwd_speed) for motor in self.mc._drive_group)
+
+        def tick():
+            self.mc.spool_stop()
+            self.mc.apply_vector(vector)
+            self.mc.update()
+
+        for i in range(10):
+            tick()
+
+        tracemalloc.start()
+        try:
+            start = tracemalloc.get_traced_memory()[0]
+            tick()
+            peak = tracemalloc.get_traced_memory()[1] - start
+        finally:
+            tracemalloc.stop()
+
+        # A two item list alone takes 72 bytes.
+        self.assertLess(peak, 200)
+
+    def test_emergency_stop(self):
+        """An emergency stop cuts every channel, spool included, in one I2C write"""
+
+        self.mc.drive_forward()
+        self.mc.spool_clockwise()
+        before = self.chip.transactions
+
+        elapsed = self.mc.emergency_stop()
+
+        self.assertEqual(self.chip.transactions - before, 1)
+        for index in range(1, 5):
+            self.assertEqual(self.chip.motor_state(index), (constants.RELEASE, 0))
+        self.assertGreater(elapsed, 0.0)
+        self.assertEqual(self.mc.estop_worst, elapsed)
+        self.assertFalse(self.mc.is_ramping())
+
+    def test_restart_after_emergency_stop(self):
+        """Motors run again when commanded after an emergency stop, and only the commanded ones"""
+
+        unbatched = emulator.make_controller(batch_writes=False)
+        unbatched_hat = unbatched._motor_hat
+
+        for mc, chip in ((self.mc, self.chip), (unbatched, unbatched_hat.chip)):
+            mc.drive_backward()
+            mc.spool_clockwise()
+            mc.emergency_stop()
+
+            mc.drive_forward()
+            self.assertEqual(chip.motor_state(1), (constants.FORWARD, mc.fwd_speed))
+            self.assertEqual(chip.motor_state(4), (constants.FORWARD, mc.fwd_speed))
+            self.assertEqual(chip.motor_state(3), (constants.RELEASE, 0))
+
+            mc.spool_clockwise()
+            self.assertEqual(chip.motor_state(3), (constants.FORWARD, mc.spool_speed))
+
+        unbatched.release_all()
+
+
+class TestMotionProfiles(unittest.TestCase):
+    """Test the acceleration limited motion profiles"""
+
+    def setUp(self):
+        self.hat = emulator.EmulatedMotorHAT()
+        self.interval = 0.01
+
+    def make_motor(self, jerk=None):
+        profile = control.AccelerationProfile(accel=1000.0, jerk=jerk, interval=self.interval)
+        return control.Motor(self.hat, ramp=profile)
+
+    def run_to_target(self, motor, now=0.0, limit=500):
+        """Ticks the motor until it settles. Returns the signed speed after every tick."""
+
+        speeds = []
+        while motor.is_ramping():
+            now += self.interval
+            motor.update(now)
+            speeds.append(control.signed_speed(motor.state, motor.speed))
+            self.assertLess(len(speeds), limit)
+
+        return speeds
+
+    def test_trapezoid_limits_acceleration(self):
+        """Speeding up takes the right number of ticks and never changes faster than the limit"""
+
+        motor = self.make_motor()
+        motor.set_target(constants.FORWARD, 200)
+        speeds = self.run_to_target(motor)
+
+        self.assertEqual(len(speeds), 20)
+        self.assertEqual((motor.state, motor.speed), (constants.FORWARD, 200))
+        for before, after in zip([0.0] + speeds, speeds):
+            self.assertLessEqual(after - before, 10.0)
+
+    def test_direction_change_passes_through_zero(self):
+        """Going from forward to backward doesn't stop and wait in between"""
+
+        motor = self.make_motor()
+        motor.force(constants.FORWARD, 100)
+        motor.set_target(constants.BACKWARD, 100)
+        speeds = self.run_to_target(motor)
+
+        # 20 ticks, plus one for rounding error in the float sums.
+        self.assertLessEqual(len(speeds), 21)
+        self.assertEqual(speeds.count(0.0), 1)
+        self.assertEqual(speeds, sorted(speeds, reverse=True))
+        self.assertEqual((motor.state, motor.speed), (constants.BACKWARD, 100))
+
+    def test_s_curve_eases_in_and_out(self):
+        """With a jerk limit, the speed starts and finishes changing gently and lands on the target"""
+
+        motor = self.make_motor(jerk=20000.0)
+        motor.set_target(constants.FORWARD, 200)
+        speeds = self.run_to_target(motor)
+
+        steps = [after - before for before, after in zip([0.0] + speeds, speeds)]
+        self.assertLess(steps[0], max(steps))
+        self.assertLess(steps[-1], max(steps))
+        self.assertTrue(all(step >= 0 for step in steps))
+        self.assertEqual((motor.state, motor.speed), (constants.FORWARD, 200))
+
+    def test_long_gap_counts_as_one_tick(self):
+        """The first tick after sitting still doesn't jump straight to the target"""
+
+        motor = self.make_motor()
+        motor.set_target(constants.FORWARD, 200)
+        motor.update(100.0)
+
+        self.assertEqual(motor.speed, 10)
+
+    def test_controller_uses_profile(self):
+        """MotorController gives its drive motors the profile it was asked for"""
+
+        mc = control.MotorController(motor_hat=self.hat, verbose=False, motion_profile="trapezoid")
+        mc.add_drive_motor()
+        mc.drive_forward()
+
+        state, speed = self.hat.chip.motor_state(1)
+        self.assertEqual(state, constants.FORWARD)
+        self.assertLess(speed, mc.fwd_speed)
+        self.assertTrue(mc.is_ramping())
+        mc.release_all()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+
+import unittest
+import os
+import sys
+import time
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from spoolbot import constants
+from spoolbot import dispatch
+from spoolbot import emulator
+from spoolbot import latency
+from spoolbot import motorwriter
+
+
+class TestMotorWriter(unittest.TestCase):
+    """Test the motor writer thread and its mailbox"""
+
+    def setUp(self):
+        self.mc = emulator.make_controller()
+        self.hat = self.mc._motor_hat
+        self.chip = self.hat.chip
+        self.table = dispatch.DispatchTable(self.mc)
+        self.writer = motorwriter.MotorWriter(self.mc)
+
+    def tearDown(self):
+        self.writer.stop()
+        self.mc.release_all()
+
+    def submit(self, bits, spin="stop", input_time=None):
+        direction, vector = self.table.lookup(bits)
+        self.writer.submit(self.table.spool_actions[spin], vector, input_time)
+
+    def test_only_newest_command_is_applied(self):
+        """Three commands sent before the writer runs turn into one"""
+
+        self.submit(dispatch.BTN_FWD)
+        self.submit(dispatch.BTN_LEFT)
+        self.submit(dispatch.BTN_BWD, spin="cw")
+        self.assertEqual(self.writer.depth, 3)
+
+        self.writer.start()
+        self.assertTrue(self.writer.wait_until_idle(2))
+
+        stats = self.writer.get_stats()
+        self.assertEqual((stats["submitted"], stats["applied"], stats["coalesced"]), (3, 1, 2))
+        self.assertEqual((stats["depth"], stats["max_depth"]), (0, 3))
+        self.assertEqual(self.chip.motor_state(1), (constants.BACKWARD, self.mc.bwd_speed))
+        self.assertEqual(self.chip.motor_state(3), (constants.FORWARD, self.mc.spool_speed))
+
+    def test_coalesced_command_keeps_oldest_stamp(self):
+        """Latency is measured from the first input behind a coalesced command"""
+
+        self.mc.latency = latency.LatencyTracker()
+        now = time.monotonic()
+        self.submit(dispatch.BTN_FWD, input_time=now - 1.0)
+        self.submit(dispatch.BTN_BWD, input_time=now)
+
+        self.writer.start()
+        self.assertTrue(self.writer.wait_until_idle(2))
+        self.assertEqual(self.mc.latency.histogram.total, 1)
+        self.assertGreaterEqual(self.mc.latency.histogram.min, 1000000)
+
+    def test_ramps_step_without_new_commands(self):
+        """The writer keeps stepping a ramp down while nothing new comes in"""
+
+        self.writer.period = 0.001
+        for motor in self.mc.drive_motors.values():
+            if motor is not None:
+                motor.ramp.interval = 0.002
+
+        self.writer.start()
+        self.submit(dispatch.BTN_FWD)
+        self.assertTrue(self.writer.wait_until_idle(2))
+        self.submit(0)
+        self.assertTrue(self.writer.wait_until_idle(2))
+
+        applied = self.writer.applied
+        give_up = time.monotonic() + 2
+        while self.chip.motor_state(1) != (constants.RELEASE, 0):
+            self.assertLess(time.monotonic(), give_up)
+            time.sleep(0.005)
+
+        self.assertEqual(self.writer.applied, applied)
+
+
+if __name__ == '__main__':
+    unittest.main()
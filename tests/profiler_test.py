@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+
+import unittest
+import os
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from spoolbot import constants
+from spoolbot import emulator
+from spoolbot import fakegpio
+from spoolbot import profiler
+from spoolbot import robotinput
+
+
+class TestPhaseProfiler(unittest.TestCase):
+    """Time the button remote's loop phases and the motor commands they run"""
+
+    def setUp(self):
+        fakegpio.cleanup()
+        self.mc = emulator.make_controller()
+        self.hat = self.mc._motor_hat
+        self.phases = profiler.PhaseProfiler()
+        self.phases.attach(self.mc, "motors")
+        self.remote = robotinput.RemoteControl(self.mc, gpio=fakegpio)
+        self.phases.attach(self.remote, "input")
+
+    def tearDown(self):
+        self.mc.release_all()
+        fakegpio.cleanup()
+
+    def run_passes(self, count):
+        """Runs the same steps as one pass of main_control_loop() without a motor writer."""
+
+        for i in range(count):
+            self.remote.scan_buttons()
+            self.remote.move_spool()
+            self.remote.run_movement()
+            self.mc.update()
+
+    def test_phases_are_counted(self):
+        """Every phase and command that ran is counted once per call, including the I2C writes"""
+
+        fakegpio.set_input(constants.PIN_FWD, 1)
+        fakegpio.set_input(constants.PIN_CW, 1)
+        self.run_passes(5)
+
+        phases = self.phases.phases
+        for name in ["input.scan_buttons", "input.move_spool", "input.determine_spin", "input.run_movement",
+                     "input.determine_direction", "motors.apply_vector", "motors.update", "motors._flush",
+                     "motors.spool_clockwise", "motors.spool_stop"]:
+            self.assertIn(name, phases)
+        self.assertEqual(phases["input.scan_buttons"].total, 5)
+        self.assertEqual(phases["motors.apply_vector"].total, 5)
+        self.assertGreater(phases["motors._apply"].total, 0)
+        self.assertEqual(phases["input.decide"].total, 0)
+
+        # A phase includes the phases it calls.
+        self.assertGreaterEqual(phases["input.run_movement"].mean(), phases["input.determine_direction"].mean())
+
+        report = self.phases.report()
+        self.assertIn("input.scan_buttons", report)
+        self.assertIn("p99 us", report)
+
+    def test_detach_restores_methods(self):
+        """Detaching puts the class's own methods back"""
+
+        self.phases.detach(self.remote)
+        self.phases.detach(self.mc)
+        self.assertNotIn("scan_buttons", vars(self.remote))
+        self.assertNotIn("apply_vector", vars(self.mc))
+
+        self.run_passes(3)
+        self.assertEqual(self.phases.phases["input.scan_buttons"].total, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+
+import unittest
+import contextlib
+import gc
+import io
+import os
+import sys
+import threading
+from time import monotonic, sleep
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from spoolbot import realtime
+from spoolbot import telemetry
+
+
+def make_garbage(count):
+    """Makes 'count' reference cycles for the collector to find."""
+
+    for i in range(count):
+        node = []
+        node.append(node)
+
+
+class TestRealtimeMode(unittest.TestCase):
+    """Enter and leave real-time mode, and run put-off collections"""
+
+    def setUp(self):
+        self.threshold = gc.get_threshold()
+        self.mode = realtime.RealtimeMode(gc_threshold=100, gc_slack=0.004)
+
+    def tearDown(self):
+        self.mode.leave()
+        self.assertEqual(gc.get_threshold(), self.threshold)
+        if hasattr(gc, "get_freeze_count"):
+            self.assertEqual(gc.get_freeze_count(), 0)
+
+    def test_enter_and_leave(self):
+        """Whatever the system allows is turned on, noted, and put back afterwards"""
+
+        affinity = os.sched_getaffinity(0) if hasattr(os, "sched_getaffinity") else None
+        policy = os.sched_getscheduler(0) if hasattr(os, "sched_getscheduler") else None
+
+        notes = self.mode.enter()
+
+        self.assertEqual(len(notes), 3)
+        self.assertEqual(gc.get_threshold()[0], 1000)
+        if hasattr(gc, "freeze"):
+            self.assertGreater(self.mode.frozen, 0)
+            self.assertIn("froze", self.mode.report())
+        else:
+            self.assertIn("nothing frozen", self.mode.report())
+
+        self.mode.leave()
+        if affinity is not None:
+            self.assertEqual(os.sched_getaffinity(0), affinity)
+        if policy is not None:
+            self.assertEqual(os.sched_getscheduler(0), policy)
+
+    @unittest.skipUnless(hasattr(os, "sched_getscheduler") and hasattr(threading.Thread, "native_id"),
+                         "needs Linux scheduling calls and Python 3.8's thread ids")
+    def test_telemetry_thread_steps_out(self):
+        """The telemetry view's thread goes back to the ordinary priority and CPUs, while the control thread and
+           threads meant to inherit its settings keep them"""
+
+        affinity = os.sched_getaffinity(0)
+        policy = os.sched_getscheduler(0)
+        notes = self.mode.enter()
+
+        inherited = []
+        helper = threading.Thread(target=lambda: inherited.append((os.sched_getscheduler(0), os.sched_getaffinity(0))))
+        helper.start()
+        helper.join()
+
+        view = telemetry.TelemetryView(stream=io.StringIO())
+        view.realtime = self.mode
+        view.start()
+        try:
+            started = monotonic()
+            while view.frames_drawn == 0 and monotonic() - started < 2.0:
+                sleep(0.01)
+            drawing = view._thread.native_id
+            drawing_policy = (os.sched_getscheduler(drawing), os.sched_getaffinity(drawing))
+        finally:
+            view.stop()
+
+        self.assertEqual(drawing_policy, (policy, affinity))
+        control = (os.sched_getscheduler(0), os.sched_getaffinity(0))
+        self.assertEqual(inherited, [control])
+        if any(note.startswith("SCHED_FIFO") for note in notes):
+            self.assertEqual(control[0], os.SCHED_FIFO)
+
+    def test_collects_only_with_time_to_spare(self):
+        """A due collection waits for a pass with enough time left before its deadline"""
+
+        self.mode.enter()
+        make_garbage(200)
+
+        self.mode.idle(0.001)
+        self.assertEqual(self.mode.collections, 0)
+
+        self.mode.idle(0.01)
+        self.assertEqual(self.mode.collections, 1)
+        self.assertLess(gc.get_count()[0], 100)
+
+        # Nothing more is due.
+        self.mode.idle(0.01)
+        self.assertEqual(self.mode.collections, 1)
+
+    def test_idle_does_nothing_outside_the_mode(self):
+        """Without entering the mode, the automatic collector is left to it"""
+
+        make_garbage(200)
+        self.mode.idle(1.0)
+        self.assertEqual(self.mode.collections, 0)
+
+
+class TestJitterBenchmark(unittest.TestCase):
+    """Run the jitter benchmark briefly"""
+
+    def test_reports_both_modes(self):
+        """Both runs show up in the table"""
+
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            self.assertEqual(realtime.main(["--seconds", "0.5"]), 0)
+
+        lines = output.getvalue().splitlines()
+        self.assertTrue(any(line.startswith("normal") for line in lines))
+        self.assertTrue(any(line.startswith("real-time") for line in lines))
+        self.assertTrue(lines[-1].startswith("Real-time mode: "))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+
+import unittest
+import os
+import subprocess
+import sys
+import tempfile
+from time import perf_counter
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from spoolbot import constants
+from spoolbot import emulator
+from spoolbot import recorder
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+
+class TestFlightRecorder(unittest.TestCase):
+    """Test writing and reading back flight recordings"""
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.dir.name, "flight.bin")
+        self.mc = emulator.make_controller()
+
+    def tearDown(self):
+        self.mc.release_all()
+        self.dir.cleanup()
+
+    def test_round_trip(self):
+        """Records come back with the values they were written with"""
+
+        flight = recorder.FlightRecorder(self.path, capacity=10)
+        self.mc.drive_forward()
+        flight.record(1.5, 5, {0: 0.25, 1: -1.0}, self.mc, 0.002)
+        flight.close()
+
+        records = recorder.load(self.path)
+        self.assertEqual(len(records), 1)
+        self.assertEqual(records["time"][0], 1.5)
+        self.assertEqual(records["bits"][0], 5)
+        self.assertEqual(list(records["axes"][0]), [0.25, -1.0, 0.0, 0.0])
+        self.assertEqual(list(records["channels"][0][0]), [constants.FORWARD, self.mc.fwd_speed])
+        self.assertEqual(list(records["channels"][0][1]), [0, 0])
+        self.assertAlmostEqual(records["duration"][0], 0.002)
+
+        arrays = recorder.to_arrays(records)
+        self.assertEqual(arrays["speed_4"][0], self.mc.fwd_speed)
+
+    def test_ring_keeps_newest_in_order(self):
+        """Once the ring is full, the oldest records are written over"""
+
+        flight = recorder.FlightRecorder(self.path, capacity=8)
+        for tick in range(20):
+            flight.record(float(tick), tick, None, self.mc, 0.0)
+        flight.close()
+
+        records = recorder.load(self.path)
+        self.assertEqual(list(records["tick"]), list(range(12, 20)))
+
+    def test_recording_survives_crash(self):
+        """Records written by a process that dies without closing the file are still there"""
+
+        code = ("import os\n"
+                "from spoolbot import emulator, motorcontrol, recorder\n"
+                "mc = motorcontrol.MotorController(motor_hat=emulator.EmulatedMotorHAT(), verbose=False)\n"
+                "flight = recorder.FlightRecorder(%r, capacity=100)\n"
+                "for tick in range(42):\n"
+                "    flight.record(float(tick), 1, None, mc, 0.0)\n"
+                "os._exit(1)\n" % self.path)
+        subprocess.run([sys.executable, "-c", code], cwd=ROOT, stdout=subprocess.DEVNULL)
+
+        self.assertEqual(len(recorder.load(self.path)), 42)
+
+    def test_recording_is_cheap(self):
+        """Writing a record takes a tiny part of a frame"""
+
+        flight = recorder.FlightRecorder(self.path, capacity=1000)
+        axes = {0: 0.1, 1: 0.2}
+        runs = 5000
+
+        start = perf_counter()
+        for tick in range(runs):
+            flight.record(0.0, 3, axes, self.mc, 0.001)
+        per_record = (perf_counter() - start) / runs
+        flight.close()
+
+        self.assertLess(per_record, 0.01 / constants.LOOP_RATE)
+
+    def test_tool_writes_npz(self):
+        """The command line tool turns a recording into a .npz file"""
+
+        flight = recorder.FlightRecorder(self.path, capacity=10)
+        flight.record(0.0, 1, None, self.mc, 0.001)
+        flight.record(0.5, 2, None, self.mc, 0.003)
+        flight.close()
+
+        out = os.path.join(self.dir.name, "flight.npz")
+        self.assertEqual(recorder.main([self.path, out]), 0)
+
+        import numpy
+        with numpy.load(out) as arrays:
+            self.assertEqual(list(arrays["bits"]), [1, 2])
+
+
+if __name__ == '__main__':
+    unittest.main()
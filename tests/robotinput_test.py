@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+
+import unittest
+import contextlib
+import io
+import os
+import sys
+import threading
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from spoolbot import clock
+from spoolbot import constants
+from spoolbot import emulator
+from spoolbot import fakegpio
+from spoolbot import profiler
+from spoolbot import robotinput
+from spoolbot import scheduler
+
+
+class TestEdgeTriggeredRemote(unittest.TestCase):
+    """Test the interrupt driven input mode of RemoteControl using the fake GPIO module"""
+
+    def setUp(self):
+        fakegpio.cleanup()
+        self.mc = emulator.make_controller()
+        self.hat = self.mc._motor_hat
+        self.chip = self.hat.chip
+        # No settle time, so every edge counts on the next scan.
+        self.remote = robotinput.RemoteControl(self.mc, gpio=fakegpio, edge_triggered=True, settle=0)
+
+    def tearDown(self):
+        self.mc.release_all()
+        fakegpio.cleanup()
+
+    def test_edges_update_state_word(self):
+        """A press and a release each land in the state word without polling"""
+
+        fakegpio.set_input(constants.PIN_FWD, 1)
+        self.remote.scan_buttons()
+        self.remote.run_movement()
+        self.assertEqual(self.chip.motor_state(1), (constants.FORWARD, self.mc.fwd_speed))
+
+        fakegpio.set_input(constants.PIN_FWD, 0)
+        self.remote.scan_buttons()
+        self.remote.run_movement()
+        self.assertTrue(self.mc.is_ramping())
+
+    def test_quiet_when_not_verbose(self):
+        """With 'verbose' off, neither setting up nor changing direction prints anything"""
+
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            remote = robotinput.RemoteControl(self.mc, gpio=fakegpio, settle=0, verbose=False)
+            fakegpio.set_input(constants.PIN_FWD, 1)
+            remote.scan_buttons()
+            remote.run_movement()
+
+        self.assertEqual(remote.telemetry_snapshot()["direction"], "fwd")
+        self.assertEqual(output.getvalue(), "")
+
+    def test_combined_buttons_turn(self):
+        """Backward and right together do a backward right turn, with the left side on the outside"""
+
+        fakegpio.set_input(constants.PIN_BWD, 1)
+        fakegpio.set_input(constants.PIN_RIGHT, 1)
+        self.remote.scan_buttons()
+        self.remote.run_movement()
+
+        self.assertEqual(self.chip.motor_state(1), (constants.BACKWARD, self.mc.fwd_speed))
+        self.assertEqual(self.chip.motor_state(4), (constants.BACKWARD, self.mc.bwd_speed))
+
+    def test_spool_button_toggles(self):
+        """A spool button starts a stopped spool, holding it changes nothing, and pressing it again stops it"""
+
+        fakegpio.set_input(constants.PIN_CW, 1)
+        self.remote.scan_buttons()
+        self.remote.move_spool()
+        self.assertEqual(self.chip.motor_state(3)[0], constants.FORWARD)
+
+        self.remote.scan_buttons()
+        self.remote.move_spool()
+        self.assertEqual(self.chip.motor_state(3)[0], constants.FORWARD)
+
+        fakegpio.set_input(constants.PIN_CW, 0)
+        self.remote.scan_buttons()
+        self.remote.move_spool()
+        fakegpio.set_input(constants.PIN_CW, 1)
+        self.remote.scan_buttons()
+        self.remote.move_spool()
+        self.assertEqual(self.chip.motor_state(3)[0], constants.RELEASE)
+
+    def test_scan_does_not_poll_pins(self):
+        """scan_buttons reads the state word instead of calling GPIO.input"""
+
+        calls = []
+        original = fakegpio.input
+        fakegpio.input = lambda pin: calls.append(pin) or original(pin)
+        try:
+            self.remote.scan_buttons()
+        finally:
+            fakegpio.input = original
+
+        self.assertEqual(calls, [])
+
+    def test_edge_wakes_waiting_loop(self):
+        """A button change from another thread wakes wait_for_input right away"""
+
+        self.remote.wait_for_input(0)  # Clear the wake-up from reading the starting levels
+        timer = threading.Timer(0.01, fakegpio.set_input, args=(constants.PIN_CW, 1))
+        timer.start()
+        self.assertTrue(self.remote.wait_for_input(5))
+        timer.join()
+
+    def test_wait_times_out_when_idle(self):
+        """Without any edges, wait_for_input sleeps for the whole timeout"""
+
+        self.remote.wait_for_input(0)
+        self.assertFalse(self.remote.wait_for_input(0.01))
+
+
+
+class LoopDone(Exception):
+    """Raised from the test scheduler's sleep to end a control loop."""
+
+
+class TestChangeDrivenLoop(unittest.TestCase):
+    """Run the polling control loop on a virtual clock and count how often it decides"""
+
+    def setUp(self):
+        fakegpio.cleanup()
+        self.clock = clock.VirtualClock()
+        self.mc = emulator.make_controller(clock=self.clock)
+        self.loop_scheduler = scheduler.LoopScheduler(clock=self.clock, sleep_func=self.sleep)
+        self.remote = robotinput.RemoteControl(self.mc, loop_scheduler=self.loop_scheduler, gpio=fakegpio,
+                                               clock=self.clock)
+        self.phases = profiler.PhaseProfiler()
+        self.phases.attach(self.remote, "input", ["move_spool", "run_movement"])
+        self.phases.attach(self.mc, "motors", ["update"])
+        self.ticks = 0
+        self.presses = {}
+        self.last_tick = 0
+
+    def tearDown(self):
+        self.mc.release_all()
+        fakegpio.cleanup()
+
+    def sleep(self, seconds):
+        """Moves the virtual clock along, sets the pins planned for the next tick, and ends the loop when it's run
+           long enough."""
+
+        self.clock.sleep(seconds)
+        self.ticks += 1
+        if self.ticks >= self.last_tick:
+            raise LoopDone()
+        for pin, level in self.presses.get(self.ticks, ()):
+            fakegpio.set_input(pin, level)
+
+    def run_loop(self, presses, ticks):
+        """Runs main_control_loop() for 'ticks' ticks. 'presses' maps a tick to the (pin, level) pairs set on it."""
+
+        self.presses = presses
+        self.last_tick = ticks
+        with self.assertRaises(LoopDone):
+            self.remote.main_control_loop()
+
+    def test_steady_input_skips_decisions(self):
+        """Holding a button decides once. Motors are only stepped while they ramp down after the release"""
+
+        self.run_loop({10: [(constants.PIN_FWD, 1)], 100: [(constants.PIN_FWD, 0)]}, 300)
+
+        # The first tick, the press and the release
+        self.assertEqual(self.phases.phases["input.run_movement"].total, 3)
+        self.assertEqual(self.phases.phases["input.move_spool"].total, 3)
+        # Nothing is stepped during the 90 ticks the button is held.
+        updates = self.phases.phases["motors.update"].total
+        self.assertGreater(updates, 3)
+        self.assertLessEqual(updates, self.ticks - 90)
+        self.assertEqual(self.mc._motor_hat.chip.motor_state(1)[0], constants.RELEASE)
+
+    def test_held_spool_button_toggles_once(self):
+        """A spool button held for many ticks starts the spool once instead of flipping it every tick"""
+
+        self.run_loop({5: [(constants.PIN_CW, 1)], 51: [(constants.PIN_CW, 0)]}, 60)
+
+        self.assertEqual(self.mc._motor_hat.chip.motor_state(3)[0], constants.FORWARD)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+
+import unittest
+import io
+import os
+import sys
+import tempfile
+import threading
+import time
+import types
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from spoolbot import constants
+from spoolbot import emulator
+from spoolbot import fakegpio
+from spoolbot import recorder
+from spoolbot import robotinput
+from spoolbot import runtime
+from spoolbot import telemetry
+
+
+class SlowTelemetryView(telemetry.TelemetryView):
+    """A telemetry view that takes far longer than a frame to refresh, whether it redraws or not."""
+
+    drawn_on = None
+
+    def refresh(self):
+        self.drawn_on = threading.get_ident()
+        time.sleep(0.1)
+        return super().refresh()
+
+
+class TestLatestValue(unittest.TestCase):
+    """Test the one slot channel"""
+
+    def test_new_value_replaces_waiting_one(self):
+        """Only the newest value is taken, and the replaced one is counted"""
+
+        async def exchange():
+            channel = runtime.LatestValue()
+            channel.put(1)
+            channel.put(2)
+            return await channel.get(), await channel.get(0.01), channel.overwritten
+
+        self.assertEqual(runtime.run(exchange()), (2, None, 1))
+
+    def test_oldest_stamp_is_kept(self):
+        """Replacing a sample keeps the newest bits with the oldest input stamp"""
+
+        async def exchange():
+            channel = runtime.LatestValue(combine=runtime.keep_oldest_stamp)
+            channel.put((1, 10.0))
+            channel.put((3, None))
+            channel.put((2, 12.0))
+            return await channel.get()
+
+        self.assertEqual(runtime.run(exchange()), (2, 10.0))
+
+
+class TestRuntime(unittest.TestCase):
+    """Run the button remote through the asyncio runtime"""
+
+    def setUp(self):
+        fakegpio.cleanup()
+        self.mc = emulator.make_controller()
+        self.hat = self.mc._motor_hat
+        self.chip = self.hat.chip
+        self.remote = robotinput.RemoteControl(self.mc, gpio=fakegpio)
+        self.view = SlowTelemetryView(self.mc, stream=io.StringIO())
+        self.runtime = runtime.Runtime(self.remote, self.mc, telemetry=self.view)
+        self.thread = threading.Thread(target=self.runtime.run)
+        self.thread.start()
+
+    def tearDown(self):
+        self.runtime.stop()
+        self.thread.join()
+        self.mc.release_all()
+        fakegpio.cleanup()
+
+    def wait_for(self, condition, timeout=2.0):
+        """Waits until 'condition' returns 'True'."""
+
+        give_up = time.monotonic() + timeout
+        while not condition():
+            self.assertLess(time.monotonic(), give_up)
+            time.sleep(0.005)
+
+    def test_button_reaches_motors(self):
+        """A button press goes through every task and out to the motors, and the ramp down keeps stepping after the
+           button is let go"""
+
+        fakegpio.set_input(constants.PIN_FWD, 1)
+        self.wait_for(lambda: self.chip.motor_state(1) == (constants.FORWARD, self.mc.fwd_speed))
+
+        fakegpio.set_input(constants.PIN_FWD, 0)
+        second_step = int(self.mc.fwd_speed * constants.STOPPING_FACTOR * constants.STOPPING_FACTOR)
+        self.wait_for(lambda: self.chip.motor_state(1)[1] <= second_step)
+
+    def test_slow_telemetry_does_not_stall_input(self):
+        """Input keeps being sampled at the loop rate while the console takes 100 ms a frame"""
+
+        self.wait_for(lambda: self.runtime.timings["telemetry"].total >= 3)
+
+        self.assertGreater(self.runtime.timings["input"].total, 15)
+        # Nothing was pressed, so the control task only ran for the first sample.
+        self.assertEqual(self.runtime.timings["control"].total, 1)
+        self.assertGreaterEqual(self.runtime.timings["telemetry"].percentile(50), 0.1)
+        self.assertIn("Telemetry task step", self.runtime.report())
+
+    def test_drawing_steps_out_of_realtime(self):
+        """The thread the telemetry view draws on steps out of real-time mode once, before it draws anything"""
+
+        self.runtime.stop()
+        self.thread.join()
+        released = []
+        self.view.realtime = types.SimpleNamespace(release_thread=lambda: released.append(threading.get_ident()))
+        self.thread = threading.Thread(target=self.runtime.run)
+        self.thread.start()
+
+        self.wait_for(lambda: self.runtime.timings["telemetry"].total >= 2)
+        self.assertEqual(len(released), 1)
+        self.assertEqual(released[0], self.view.drawn_on)
+        self.assertNotEqual(released[0], self.thread.ident)
+
+    def test_idle_ticks_are_recorded(self):
+        """The flight recorder gets a record every tick while the remote sits idle, not only when the input changes"""
+
+        with tempfile.TemporaryDirectory() as folder:
+            self.remote.recorder = recorder.FlightRecorder(os.path.join(folder, "idle.rec"))
+            try:
+                self.wait_for(lambda: self.runtime.timings["input"].total >= 20)
+                ticks = self.runtime.timings["input"].total
+                recorded = self.remote.recorder.ticks
+            finally:
+                self.runtime.stop()
+                self.thread.join()
+                self.remote.recorder.close()
+
+        # The recorder was set while the runtime was already going, so the first tick or so can be missed.
+        self.assertGreaterEqual(recorded, ticks - 2)
+        self.assertEqual(self.runtime.timings["control"].total, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+
+import unittest
+import os
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from spoolbot import latency
+from spoolbot import scheduler
+
+
+class FakeClock:
+    """A clock that only moves when told to."""
+
+    def __init__(self):
+        self.now = 100.0
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class TestLoopScheduler(unittest.TestCase):
+    """Test the pacing and statistics of LoopScheduler"""
+
+    def setUp(self):
+        self.clock = FakeClock()
+
+    def make_scheduler(self, **kwargs):
+        return scheduler.LoopScheduler(rate=10, clock=self.clock.time, sleep_func=self.clock.sleep, **kwargs)
+
+    def test_sleeps_to_absolute_deadlines(self):
+        """Work done during a pass is taken out of the sleep, so the loop doesn't drift"""
+
+        loop = self.make_scheduler()
+        start = self.clock.now
+        for _ in range(5):
+            self.clock.now += 0.03  # Pretend the pass did some work
+            loop.wait()
+
+        # The first pass starts the clock, so only the last four are paced.
+        self.assertAlmostEqual(self.clock.now, start + 0.03 + 0.5)
+        self.assertEqual(loop.ticks, 5)
+        self.assertEqual(loop.overruns, 0)
+
+    def test_drops_missed_frames(self):
+        """A long pass skips the deadlines it missed"""
+
+        loop = self.make_scheduler(drop_frames=True)
+        loop.wait()
+        self.clock.now += 0.35
+        loop.wait()
+
+        stats = loop.get_stats()
+        self.assertEqual(stats["overruns"], 1)
+        self.assertEqual(stats["dropped"], 2)
+        self.assertAlmostEqual(stats["max_overrun"], 0.25)
+        self.assertAlmostEqual(loop.time_left(), 0.1)
+
+    def test_catches_up_on_short_overruns(self):
+        """Without dropping frames, late passes run back to back until the loop is on time again"""
+
+        loop = self.make_scheduler(drop_frames=False, max_catch_up=3)
+        loop.wait()
+        self.clock.now += 0.25
+        slept_at = self.clock.now
+        loop.wait()
+        loop.wait()
+
+        self.assertEqual(self.clock.now, slept_at)
+        self.assertEqual(loop.overruns, 2)
+        self.assertEqual(loop.dropped, 0)
+
+    def test_idle_task_uses_spare_time(self):
+        """The idle task is told how much of the pass is left, and the time it takes comes out of the sleep"""
+
+        loop = self.make_scheduler()
+        loop.jitter_histogram = latency.LatencyHistogram()
+        spare = []
+
+        def idle_task(time_left):
+            spare.append(time_left)
+            self.clock.now += 0.02
+
+        loop.idle_task = idle_task
+        start = self.clock.now
+        self.clock.now += 0.03
+        loop.wait()
+        self.clock.now += 0.03
+        loop.wait()
+
+        # The first deadline is set by the first wait.
+        self.assertAlmostEqual(spare[0], 0.1)
+        self.assertAlmostEqual(spare[1], 0.07)
+        self.assertAlmostEqual(self.clock.now - start, 0.23)
+        self.assertEqual(loop.jitter_histogram.total, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
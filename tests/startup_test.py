@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+
+import unittest
+import os
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from spoolbot import constants
+from helpers import run_python
+
+# Most time importing the robot's entry point may take, in seconds. Generous, so a slow test machine doesn't fail it.
+IMPORT_BUDGET = 0.5
+
+HARDWARE_MODULES = ["Adafruit_MotorHAT", "Adafruit_GPIO", "pygame", "RPi"]
+
+
+class TestStartup(unittest.TestCase):
+    """Benchmark startup and check that nothing hardware related is loaded before it's needed"""
+
+    def test_import_is_fast_and_hardware_free(self):
+        """Importing the entry point doesn't load any hardware libraries"""
+
+        report = run_python(
+            "import json, sys, time\n"
+            "start = time.perf_counter()\n"
+            "import spoolbot.__main__\n"
+            "elapsed = time.perf_counter() - start\n"
+            "loaded = [name for name in %r if name in sys.modules]\n"
+            "print(json.dumps({'elapsed': elapsed, 'loaded': loaded}))\n" % HARDWARE_MODULES)
+
+        print("\nspoolbot.__main__ import: {:.1f} ms".format(report["elapsed"] * 1000))
+        self.assertEqual(report["loaded"], [])
+        self.assertLess(report["elapsed"], IMPORT_BUDGET)
+
+    def test_motor_commands_match_adafruit(self):
+        """The copied motor commands agree with the Adafruit library"""
+
+        from Adafruit_MotorHAT import Adafruit_MotorHAT
+
+        self.assertEqual(constants.FORWARD, Adafruit_MotorHAT.FORWARD)
+        self.assertEqual(constants.BACKWARD, Adafruit_MotorHAT.BACKWARD)
+        self.assertEqual(constants.BRAKE, Adafruit_MotorHAT.BRAKE)
+        self.assertEqual(constants.RELEASE, Adafruit_MotorHAT.RELEASE)
+
+    def test_ds4_starts_only_needed_subsystems(self):
+        """Making a DS4Controller starts the display and joystick, but not audio or fonts"""
+
+        report = run_python(
+            "import json, time\n"
+            "from spoolbot import ds4input, emulator, motorcontrol\n"
+            "mc = motorcontrol.MotorController(motor_hat=emulator.EmulatedMotorHAT(), verbose=False)\n"
+            "start = time.perf_counter()\n"
+            "ds4input.DS4Controller(mc)\n"
+            "elapsed = time.perf_counter() - start\n"
+            "pygame = ds4input.pygame\n"
+            "print(json.dumps({'elapsed': elapsed, 'display': pygame.display.get_init(),\n"
+            "                  'joystick': pygame.joystick.get_init(), 'mixer': pygame.mixer.get_init() is not None,\n"
+            "                  'font': pygame.font.get_init()}))\n")
+
+        print("\nDS4Controller setup: {:.1f} ms".format(report["elapsed"] * 1000))
+        self.assertTrue(report["display"])
+        self.assertTrue(report["joystick"])
+        self.assertFalse(report["mixer"])
+        self.assertFalse(report["font"])
+
+
+if __name__ == '__main__':
+    unittest.main()
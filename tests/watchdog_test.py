@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+
+import unittest
+import os
+import sys
+import threading
+import types
+from time import monotonic, sleep
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from spoolbot import clock
+from spoolbot import constants
+from spoolbot import ds4input
+from spoolbot import emulator
+from spoolbot import fakegpio
+from spoolbot import journal
+from spoolbot import motorwriter
+from spoolbot import robotinput
+from spoolbot import scheduler
+from spoolbot import watchdog
+
+
+def make_controller(motor_clock=monotonic):
+    """Returns a motor controller on an emulated MotorHAT, and its chip."""
+
+    mc = emulator.make_controller(clock=motor_clock)
+    return mc, mc._motor_hat.chip
+
+
+class TestDeadlines(unittest.TestCase):
+    """Step the watchdog's deadlines on a virtual clock"""
+
+    def setUp(self):
+        self.virtual = clock.VirtualClock()
+        self.mc, self.chip = make_controller(self.virtual)
+        self.dog = watchdog.Watchdog(self.mc, tick_timeout_ms=100, input_timeout_ms=250, clock=self.virtual)
+
+    def tearDown(self):
+        self.mc.release_all()
+
+    def test_nothing_checked_until_armed(self):
+        """A watchdog that was never fed or armed never stops anything"""
+
+        self.mc.drive_forward()
+        self.virtual.sleep(10.0)
+
+        self.assertFalse(self.dog.check())
+        self.assertEqual(self.chip.motor_state(1), (constants.FORWARD, self.mc.fwd_speed))
+
+    def test_missed_tick_cuts_motors(self):
+        """A stalled loop cuts every motor, spool included, and the lapse is counted once"""
+
+        self.dog.arm()
+        self.mc.drive_forward()
+        self.mc.spool_clockwise()
+
+        self.virtual.sleep(0.05)
+        self.dog.feed_input(self.virtual())
+        self.assertFalse(self.dog.check())
+        self.assertEqual(self.chip.motor_state(3), (constants.FORWARD, self.mc.spool_speed))
+
+        self.virtual.sleep(0.06)
+        self.assertTrue(self.dog.check())
+        for index in range(1, 5):
+            self.assertEqual(self.chip.motor_state(index), (constants.RELEASE, 0))
+
+        # Still late, but the motors are already off, so nothing more is written.
+        self.chip.clear_log()
+        self.virtual.sleep(0.05)
+        self.assertTrue(self.dog.check())
+        self.assertEqual(self.chip.transactions, 0)
+        self.assertEqual(self.dog.get_stats(), {"missed_ticks": 1, "missed_inputs": 0, "trips": 1, "tripped": True})
+
+        # The loop catches up, then stalls again.
+        self.dog.feed_tick(self.virtual())
+        self.assertFalse(self.dog.tripped)
+        self.virtual.sleep(0.15)
+        self.dog.check()
+        self.assertEqual(self.dog.missed_ticks, 2)
+        self.assertEqual(self.dog.trips, 2)
+
+    def test_missed_input_cuts_motors(self):
+        """A loop that keeps running without fresh input still gets stopped"""
+
+        self.dog.arm()
+        self.mc.drive_backward()
+
+        for tick in range(20):
+            self.virtual.sleep(0.02)
+            self.dog.feed_tick(self.virtual())
+            self.dog.check()
+
+        self.assertEqual(self.chip.motor_state(1), (constants.RELEASE, 0))
+        self.assertEqual(self.dog.missed_inputs, 1)
+        self.assertEqual(self.dog.missed_ticks, 0)
+        self.assertEqual(self.mc.estops, 1)
+
+    def test_stuck_writer_is_cut_again_when_it_finishes(self):
+        """A command stuck in the writer cuts the motors once, then once more when it finally finishes"""
+
+        writer = types.SimpleNamespace(busy_since=None)
+        dog = watchdog.Watchdog(self.mc, tick_timeout_ms=100, input_timeout_ms=250, motor_writer=writer,
+                                clock=self.virtual)
+        dog.arm()
+        self.mc.drive_forward()
+        writer.busy_since = self.virtual()
+
+        for tick in range(10):
+            self.virtual.sleep(0.02)
+            dog.feed_tick(self.virtual())
+            dog.feed_input(self.virtual())
+            dog.check()
+        self.assertTrue(dog.tripped)
+        self.assertEqual((dog.missed_ticks, self.mc.estops), (1, 1))
+
+        # The stuck command gets through after all, then the writer goes idle.
+        self.mc.drive_forward()
+        writer.busy_since = None
+        dog.check()
+        self.assertEqual(self.mc.estops, 2)
+        self.assertEqual(self.chip.motor_state(1), (constants.RELEASE, 0))
+
+        dog.feed_tick(self.virtual())
+        self.assertFalse(dog.tripped)
+        dog.check()
+        self.assertEqual(self.mc.estops, 2)
+
+
+class SilentSource(journal.ReplaySource):
+    """A replay whose controller drops out at 'lost_at' without a "removed" event, the way pygame 1 loses one."""
+
+    def __init__(self, events, header, clock, lost_at):
+        super().__init__(events, header, clock=clock)
+        self.lost_at = lost_at
+
+    def alive(self):
+        return self._clock() < self.lost_at
+
+
+class TestLostController(unittest.TestCase):
+    """Lose the DS4 while driving"""
+
+    def setUp(self):
+        self.virtual = clock.VirtualClock()
+        self.mc, self.chip = make_controller(self.virtual)
+        self.scheduler = scheduler.LoopScheduler(clock=self.virtual, sleep_func=self.virtual.sleep)
+        self.dog = watchdog.Watchdog(self.mc, clock=self.virtual)
+
+    def tearDown(self):
+        self.mc.release_all()
+
+    def drive(self, source):
+        """Runs the control loop on 'source' until the watchdog trips or two seconds pass. Returns the remote, when
+           the watchdog tripped, and the left motor's speed after every pass."""
+
+        remote = ds4input.DS4Controller(self.mc, loop_scheduler=self.scheduler, event_source=source,
+                                        clock=self.virtual)
+        remote.watchdog = self.dog
+        remote.start_scanning()
+        self.dog.arm()
+
+        speeds = []
+        tripped_at = None
+        while tripped_at is None and self.virtual() < 2.0:
+            remote.poll_events()
+            remote.move_spool()
+            remote.run_movement()
+            self.mc.update()
+            self.dog.feed_tick(self.virtual())
+            if self.dog.check():
+                tripped_at = self.virtual()
+            speeds.append(self.chip.motor_state(1)[1])
+            self.scheduler.wait()
+
+        return remote, tripped_at, speeds
+
+    def test_stop_is_faster_than_the_ramp(self):
+        """Once the controller is gone, the motors are cut at the input deadline instead of ramping down"""
+
+        events = [(0.0, "hat", 0, constants.BTN_UP), (0.5, "removed", 0, 0), (0.6, "hat", 0, constants.BTN_UP)]
+        source = journal.ReplaySource(events, {"buttons": 13, "hats": 1}, clock=self.virtual)
+        remote, tripped_at, speeds = self.drive(source)
+
+        self.assertEqual(remote.telemetry_snapshot()["direction"], "stop")
+        self.assertGreater(tripped_at, 0.5 + self.dog.input_timeout)
+        self.assertLess(tripped_at, 0.5 + self.dog.input_timeout + 2.0 / constants.LOOP_RATE)
+        # Still ramping down the tick before, and cut on the tick it tripped.
+        self.assertGreater(speeds[-2], 0)
+        self.assertEqual(self.chip.motor_state(1), (constants.RELEASE, 0))
+        self.assertEqual(self.dog.missed_inputs, 1)
+        self.assertEqual(self.dog.missed_ticks, 0)
+
+
+    def test_silent_disconnect(self):
+        """A controller that goes away without a "removed" event is still caught at the input deadline, and holding
+           a button without sending anything until then doesn't trip it"""
+
+        source = SilentSource([(0.0, "hat", 0, constants.BTN_UP)], {"buttons": 13, "hats": 1}, self.virtual, 0.5)
+        remote, tripped_at, speeds = self.drive(source)
+
+        self.assertIsNotNone(tripped_at)
+        self.assertGreater(tripped_at, 0.5 + self.dog.input_timeout)
+        self.assertLess(tripped_at, 0.5 + self.dog.input_timeout + 2.0 / constants.LOOP_RATE)
+        self.assertEqual(self.chip.motor_state(1), (constants.RELEASE, 0))
+        self.assertEqual(self.dog.missed_inputs, 1)
+
+
+class TestRemoteFeeds(unittest.TestCase):
+    """The button remote tells the watchdog about its samples"""
+
+    def setUp(self):
+        fakegpio.cleanup()
+
+    def tearDown(self):
+        fakegpio.cleanup()
+
+    def test_poll_feeds_input(self):
+        """Every poll of the pins counts as a fresh input sample"""
+
+        virtual = clock.VirtualClock()
+        mc, chip = make_controller(virtual)
+        remote = robotinput.RemoteControl(mc, gpio=fakegpio, clock=virtual)
+        dog = watchdog.Watchdog(mc, clock=virtual)
+        remote.watchdog = dog
+
+        virtual.sleep(3.0)
+        remote.poll_events()
+        self.assertEqual(dog._last_input, 3.0)
+        mc.release_all()
+
+
+class TestStuckWriter(unittest.TestCase):
+    """Stall the motor writer thread in the middle of a command"""
+
+    def test_stuck_command_is_cut(self):
+        """A command that keeps the writer busy past the tick deadline cuts the motors, even though the loop itself is
+           still running"""
+
+        mc, chip = make_controller()
+        writer = motorwriter.MotorWriter(mc)
+        dog = watchdog.Watchdog(mc, tick_timeout_ms=30, input_timeout_ms=1000, motor_writer=writer)
+        forward = tuple((motor, constants.FORWARD, mc.fwd_speed) for motor in mc._drive_group)
+        release = threading.Event()
+
+        writer.start()
+        try:
+            writer.submit(mc.spool_clockwise, forward)
+            writer.wait_until_idle()
+            writer.submit(lambda: release.wait(5.0), forward)
+
+            dog.start()
+            started = monotonic()
+            while not dog.tripped and monotonic() - started < 2.0:
+                dog.feed_tick(monotonic())
+                dog.feed_input(monotonic())
+                sleep(0.005)
+        finally:
+            release.set()
+            dog.stop()
+            writer.stop()
+
+        self.assertTrue(dog.tripped)
+        self.assertEqual(dog.missed_ticks, 1)
+        for index in range(1, 5):
+            self.assertEqual(chip.motor_state(index)[0], constants.RELEASE)
+        mc.release_all()
+
+
+if __name__ == '__main__':
+    unittest.main()